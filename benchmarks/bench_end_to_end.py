@@ -0,0 +1,83 @@
+"""Runs the flow of main.py end to end, from a synthetic roster to the
+emails received by the in-process SMTP stand-in, and reports throughput.
+
+    python -m benchmarks.bench_end_to_end --players 100,1000 --connections 1,8 --latencies 0,5 --tls
+
+Each configuration makes a dry run, which solves the draw and caches it,
+then the real run, which reuses the cached draw, journals it and sends
+every email: solve_s times the former and send_s the latter, which
+messages_per_second is based on. connections=1 is the plain serial Mailer. Latencies are
+in milliseconds per SMTP reply. With --spool, emails are written to an
+mbox file instead of being sent.
+"""
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from itertools import product
+from optparse import OptionParser
+
+from benchmarks.results import timed, write_results
+from benchmarks.rosters import synthetic_roster
+from main import main
+from secret_santa.assignment_cache import AssignmentCache
+from secret_santa.delivery_journal import DeliveryJournal
+from secret_santa.local_smtp import HAS_OPENSSL, LocalSMTPServer
+from secret_santa.mailer import Contact, MailerSettings
+
+SENDER = Contact("Santa", "santa@example.com")
+SUBJECT = "Secret Santa Assignment"
+TEMPLATE = "Dear {santa},\n\nYour mission is to find the perfect gift for {recipient}.\n"
+
+
+def bench_config(players: int, connections: int, latency_ms: float, tls: bool, spool: bool) -> dict:
+    roster = synthetic_roster(players, seed=players)
+    with LocalSMTPServer(tls=tls, latency=latency_ms / 1000) as server, tempfile.TemporaryDirectory() as directory:
+        settings = MailerSettings(server.host, server.port, "santa", "secret", use_ssl=tls, ssl_cafile=server.certfile)
+        cache = AssignmentCache(os.path.join(directory, "cache"))
+        spool_path = os.path.join(directory, "out.mbox") if spool else None
+
+        def run(dry: bool, journal: DeliveryJournal = None) -> bool:
+            return main(roster.players, roster.incompatibilities, roster.gift_number, settings, SUBJECT, TEMPLATE,
+                        SENDER, dry, None, roster.groups, connections=connections, cache=cache, journal=journal,
+                        spool=spool_path)
+
+        with DeliveryJournal(os.path.join(directory, "draw.journal")) as journal, redirect_stdout(io.StringIO()):
+            _, solve_elapsed = timed(lambda: run(True))
+            all_sent, send_elapsed = timed(lambda: run(False, journal))
+        delivered = len(server.messages) if not spool else players
+    return {"players": players, "connections": connections, "latency_ms": latency_ms, "tls": tls, "spool": spool,
+            "all_sent": all_sent, "delivered": delivered, "solve_s": solve_elapsed, "send_s": send_elapsed,
+            "messages_per_second": delivered / send_elapsed}
+
+
+def _parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",")]
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--players", dest="players", default="100,1000", help="Comma separated player counts")
+    parser.add_option("--connections", dest="connections", default="1,4",
+                      help="Comma separated connection counts, 1 for the serial Mailer")
+    parser.add_option("--latencies", dest="latencies", default="0",
+                      help="Comma separated latencies of the server, in milliseconds per reply")
+    parser.add_option("--tls", dest="tls", action="store_true", default=False,
+                      help="Serve implicit TLS with a self-signed certificate, which needs openssl")
+    parser.add_option("--spool", dest="spool", action="store_true", default=False,
+                      help="Write the emails to an mbox spool instead of sending them")
+    parser.add_option("-o", "--output", dest="output", default="bench_end_to_end.json", help="Results file")
+    (options, _) = parser.parse_args()
+    if options.tls and not HAS_OPENSSL:
+        parser.error("--tls needs the openssl command")
+
+    results = []
+    grid = product(_parse_list(options.players, int), _parse_list(options.connections, int),
+                   _parse_list(options.latencies, float))
+    for players, connections, latency_ms in grid:
+        result = bench_config(players, connections, latency_ms, options.tls, options.spool)
+        results.append(result)
+        print(f'players={players} connections={connections} latency={latency_ms}ms tls={options.tls} '
+              f'spool={options.spool}: {result["messages_per_second"]:.0f} msg/s'
+              + ('' if result["all_sent"] else f' ({players - result["delivered"]} not delivered)'))
+    write_results(options.output, "end_to_end", results)
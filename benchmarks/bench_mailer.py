@@ -0,0 +1,58 @@
+"""Measures mail throughput against the in-process SMTP stand-in.
+
+    python -m benchmarks.bench_mailer --messages 1000 --connections 1,4,8
+
+connections=0 is the plain serial Mailer, other values go through
+AsyncMailer with that many connections.
+"""
+from itertools import product
+from optparse import OptionParser
+
+from benchmarks.results import timed, write_results
+from secret_santa.async_mailer import AsyncMailer
+from secret_santa.local_smtp import LocalSMTPServer
+from secret_santa.mailer import Mailer, MailerSettings, Contact, OutgoingEmail
+
+SENDER = Contact("Santa", "santa@example.com")
+
+
+def _emails(count: int) -> list[OutgoingEmail]:
+    return [OutgoingEmail(Contact(f"Player{i}", f"player{i}@example.com"), SENDER, "Secret Santa Assignment",
+                          f"Dear Player{i},\n\nYour mission is to find the perfect gift for Player{i + 1}.\n")
+            for i in range(count)]
+
+
+def _send_serially(settings: MailerSettings, emails: list[OutgoingEmail]):
+    with Mailer(settings) as mailer:
+        for email in emails:
+            mailer.send_email(email.dst, email.sender, email.subject, email.body)
+
+
+def bench_config(messages: int, connections: int) -> dict:
+    emails = _emails(messages)
+    with LocalSMTPServer() as server:
+        settings = MailerSettings(server.host, server.port, "santa", "secret", use_ssl=False)
+        if connections:
+            _, elapsed = timed(lambda: AsyncMailer(settings, connections).send_all(emails))
+        else:
+            _, elapsed = timed(lambda: _send_serially(settings, emails))
+        delivered = len(server.messages)
+    return {"messages": messages, "connections": connections, "delivered": delivered,
+            "send_s": elapsed, "messages_per_second": messages / elapsed}
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--messages", dest="messages", default="100,1000", help="Comma separated message counts")
+    parser.add_option("--connections", dest="connections", default="0,1,4,8",
+                      help="Comma separated connection counts, 0 for the serial Mailer")
+    parser.add_option("-o", "--output", dest="output", default="bench_mailer.json", help="Results file")
+    (options, _) = parser.parse_args()
+
+    results = []
+    for messages, connections in product(map(int, options.messages.split(",")),
+                                         map(int, options.connections.split(","))):
+        result = bench_config(messages, connections)
+        results.append(result)
+        print(f'messages={messages} connections={connections}: {result["messages_per_second"]:.0f} msg/s')
+    write_results(options.output, "mailer", results)
@@ -0,0 +1,85 @@
+"""Times the solver phases over a grid of synthetic rosters.
+
+    python -m benchmarks.bench_solver --sizes 10,100,1000 --output solver.json
+
+Each configuration is solved once as a whole, recording the SolverStats
+counters of the solve, then its phases (flow
+graph construction, max flow, 2-cycle repair, verification) are run
+again one by one on the same instance to time them separately.
+"""
+import tracemalloc
+from itertools import product
+from optparse import OptionParser
+
+from benchmarks.results import timed, write_results
+from benchmarks.rosters import synthetic_roster
+from secret_santa.secret_santa.gift_graph import NGiftGraph, GiftAssignmentError
+from secret_santa.stats import SolverStats
+
+
+def _solve(roster, compact: bool, stats: SolverStats = None) -> NGiftGraph:
+    return NGiftGraph(roster.players, roster.incompatibilities, number_of_gifts=roster.gift_number,
+                      allow_2cycles=False, compact=compact, groups=roster.groups, stats=stats)
+
+
+def bench_config(size: int, density: float, group_size: int, gifts: int, compact: bool, track_memory: bool) -> dict:
+    result = {"players": size, "incompatibility_density": density, "group_size": group_size,
+              "number_of_gifts": gifts, "compact": compact}
+    roster = synthetic_roster(size, density, group_size, gifts, seed=size)
+    stats = SolverStats()
+    try:
+        graph, result["total_s"] = timed(lambda: _solve(roster, compact, stats))
+    except GiftAssignmentError as e:
+        result["error"] = str(e)
+        return result
+    # attempts and repairs of the solve; the phases below repair again
+    result.update(stats.counters)
+    graph.stats = None
+
+    build = graph._build_compact_flow_graph if compact else graph._build_flow_graph
+    to_assignments = graph._compact_flow_to_assignments if compact else graph._flow_to_assignments
+    flow_graph, result["build_flow_graph_s"] = timed(build)
+    flow, result["compute_largest_flow_s"] = timed(flow_graph.compute_largest_flow)
+    graph.assignments = to_assignments(flow)
+    _, result["repair_2cycles_s"] = timed(graph._repair_2cycles)
+    _, result["verify_assignments_s"] = timed(graph.verify_assignments)
+
+    if track_memory:
+        tracemalloc.start()
+        _solve(roster, compact)
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def _parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",")]
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--sizes", dest="sizes", default="10,100,1000",
+                      help="Comma separated player counts, e.g. 10,100,1000,5000,20000")
+    parser.add_option("--densities", dest="densities", default="0,0.01,0.05",
+                      help="Comma separated fractions of incompatible player pairs")
+    parser.add_option("--group-sizes", dest="group_sizes", default="0,5",
+                      help="Comma separated exclusion group sizes, 0 for no groups")
+    parser.add_option("--gifts", dest="gifts", default="1,2", help="Comma separated numbers of gifts")
+    parser.add_option("--modes", dest="modes", default="dict,compact",
+                      help="Comma separated flow graph representations: dict, compact")
+    parser.add_option("--memory", dest="memory", action="store_true", default=False,
+                      help="Also record peak memory, which slows every configuration down")
+    parser.add_option("-o", "--output", dest="output", default="bench_solver.json", help="Results file")
+    (options, _) = parser.parse_args()
+
+    results = []
+    grid = product(_parse_list(options.sizes, int), _parse_list(options.densities, float),
+                   _parse_list(options.group_sizes, int), _parse_list(options.gifts, int),
+                   [mode == "compact" for mode in options.modes.split(",")])
+    for size, density, group_size, gifts, compact in grid:
+        result = bench_config(size, density, group_size, gifts, compact, options.memory)
+        results.append(result)
+        summary = result.get("error") or f'{result["total_s"]:.3f}s'
+        print(f'players={size} density={density} groups={group_size} gifts={gifts} '
+              f'{"compact" if compact else "dict"}: {summary}')
+    write_results(options.output, "solver", results)
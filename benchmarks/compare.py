@@ -0,0 +1,51 @@
+"""Compares two benchmark result files, e.g. from two commits.
+
+    python -m benchmarks.compare before.json after.json --threshold 1.2
+
+Exits with status 1 when a timing got slower than the threshold ratio.
+"""
+import json
+import sys
+from optparse import OptionParser
+
+_CONFIG_KEYS = ("players", "incompatibility_density", "group_size", "number_of_gifts", "compact",
+                "messages", "connections", "latency_ms", "tls", "spool")
+
+
+def _config(result: dict) -> tuple:
+    return tuple((key, result[key]) for key in _CONFIG_KEYS if key in result)
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[str]:
+    before_results = {_config(result): result for result in before["results"]}
+    regressions = []
+    for result in after["results"]:
+        previous = before_results.get(_config(result))
+        if previous is None:
+            continue
+        for metric, value in result.items():
+            if not metric.endswith(("_s", "_bytes")) or not previous.get(metric):
+                continue
+            ratio = value / previous[metric]
+            line = f'{dict(_config(result))} {metric}: {previous[metric]:.4g} -> {value:.4g} ({ratio:.2f}x)'
+            print(line)
+            if ratio > threshold:
+                regressions.append(line)
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="usage: %prog [options] before.json after.json")
+    parser.add_option("--threshold", dest="threshold", type="float", default=1.2,
+                      help="Slowdown ratio reported as a regression")
+    (options, [before_file, after_file]) = parser.parse_args()
+    with open(before_file) as f:
+        before = json.load(f)
+    with open(after_file) as f:
+        after = json.load(f)
+
+    regressions = compare(before, after, options.threshold)
+    print(f'{before["commit"]} -> {after["commit"]}: {len(regressions)} regressions')
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    sys.exit(1 if regressions else 0)
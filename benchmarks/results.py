@@ -0,0 +1,34 @@
+import json
+import platform
+import subprocess
+import time
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def timed(fn: Callable[[], T]) -> tuple[T, float]:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(path: str, benchmark: str, results: list[dict]):
+    """Write results with enough context to compare runs across commits."""
+    with open(path, 'w') as f:
+        json.dump({
+            "benchmark": benchmark,
+            "commit": _current_commit(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results
+        }, f, indent=2)
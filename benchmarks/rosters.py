@@ -0,0 +1,37 @@
+from random import Random
+from typing import Union
+
+from secret_santa.roster import Roster
+from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.player import Player
+
+
+def synthetic_roster(
+        player_count: int,
+        incompatibility_density: float = 0.,
+        group_size: int = 0,
+        gift_number: int = 1,
+        seed: Union[int, None] = None
+) -> Roster:
+    """Random roster for benchmarks.
+
+    incompatibility_density is the fraction of all player pairs made
+    incompatible. With a group_size, players are split into consecutive
+    exclusion groups of that size.
+    """
+    rng = Random(seed)
+    players = [Player(f"Player{i}", f"player{i}@example.com") for i in range(player_count)]
+
+    incompatibilities: set[Incompatibility] = set()
+    target = int(incompatibility_density * player_count * (player_count - 1) / 2)
+    while len(incompatibilities) < target:
+        fst, snd = rng.sample(players, 2)
+        incompatibilities.add(Incompatibility(fst, snd))
+
+    groups: list[set[Player]] = []
+    if group_size > 1:
+        shuffled = list(players)
+        rng.shuffle(shuffled)
+        groups = [set(shuffled[i:i + group_size]) for i in range(0, player_count, group_size)]
+
+    return Roster(set(players), incompatibilities, groups, gift_number)
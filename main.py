@@ -1,14 +1,28 @@
 from __future__ import annotations
 
 import json
+import os
+import smtplib
+import sys
 
+from datetime import date
+from email.utils import localtime
 from optparse import OptionParser
-from configobj import ConfigObj
 
-from secret_santa.mailer import Mailer, Contact, MailerSettings
-from secret_santa.secret_santa.gift_graph import NGiftGraph
+from secret_santa.assignment_cache import AssignmentCache, cache_key
+from secret_santa.async_mailer import AsyncMailer
+from secret_santa.batch import find_input_files, solve_groups
+from secret_santa.delivery_journal import DeliveryJournal, JournalError
+from secret_santa.history import HistoryStore
+from secret_santa.mailer import Mailer, Contact, MailerSettings, MessageRenderer, OutgoingEmail
+from secret_santa.roster import load_roster, RosterError
+from secret_santa.secret_santa.gift_graph import NGiftGraph, InfeasibleAssignmentError
 from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.pair_costs import repeat_costs
 from secret_santa.secret_santa.player import Player
+from secret_santa.secret_santa.sampler import DEFAULT_SWEEPS
+from secret_santa.secret_santa.verifier import verify_assignment_file
+from secret_santa.spool import SPOOL_FORMATS, write_spool
 
 
 def format_recipient_names(recipients: set[Player], and_word="and") -> str:
@@ -20,37 +34,228 @@ def format_recipient_names(recipients: set[Player], and_word="and") -> str:
         recipient_names = [r.name for r in recipients]
         return f'{", ".join(recipient_names[:-1])} {and_word} {recipient_names[-1]}'
 
-def main(players: set[Player], incompatibilities: set[Incompatibility], giftNumber: int, mailer_settings: MailerSettings,
-         email_subject: str, email_body_template: str, src_contact: Contact, dry: bool, logfile: str | None):
+def format_assignment_lines(assignments: dict[Player, set[Player]], structured: bool = False) -> list[str]:
+    """Log lines of a draw, one per santa. Structured lines are JSON
+    objects, which unlike plain ones can always be read back."""
+    if structured:
+        return [json.dumps({"santa": santa.name, "recipients": [dst.name for dst in dsts]}, ensure_ascii=False) + '\n'
+                for santa, dsts in assignments.items()]
+    return [f'{santa.name} {format_recipient_names(dsts)}\n' for santa, dsts in assignments.items()]
+
+def is_structured_log(logfile: str | None) -> bool:
+    return logfile is not None and logfile.endswith('.jsonl')
+
+def render_emails(assignments: dict[Player, set[Player]], email_subject: str, email_body_template: str,
+                  src_contact: Contact) -> list[OutgoingEmail]:
+    return [OutgoingEmail(Contact(src.name, src.email),
+                          src_contact,
+                          email_subject,
+                          email_body_template.format(santa=src.name, recipient=format_recipient_names(dsts)))
+            for src, dsts in assignments.items()]
+
+def send_emails(emails: list[OutgoingEmail], mailer_settings: MailerSettings, dry: bool,
+                connections: int = 1, max_rate: float | None = None, journal: DeliveryJournal | None = None) -> bool:
+    """Print or send the emails, recording each delivery in the journal if
+    given. Returns whether all of them went out."""
+    if dry:
+        for email in emails:
+            print(f'Mail to {email.dst.name} ({email.dst.email}):')
+            print(email.body)
+        return True
+    if connections <= 1 and not max_rate:
+        with Mailer(mailer_settings) as mailer:
+            for email in emails:
+                try:
+                    mailer.send_email(email.dst, email.sender, email.subject, email.body)
+                except (smtplib.SMTPException, OSError) as e:
+                    if journal is not None:
+                        journal.record_failed(email.dst, f"{type(e).__name__}: {e}")
+                    raise
+                if journal is not None:
+                    journal.record_sent(email.dst)
+        return True
+
+    def record(result):
+        if result.sent:
+            journal.record_sent(result.email.dst)
+        else:
+            journal.record_failed(result.email.dst, result.error)
+
+    results = AsyncMailer(mailer_settings, connections, max_rate).send_all(emails, record if journal else None)
+    failures = [result for result in results if not result.sent]
+    for result in failures:
+        print(f'[failed] mail to {result.email.dst.name} ({result.email.dst.email}) '
+              f'after {result.attempts} attempts: {result.error}')
+    return not failures
+
+def spool_emails(emails: list[OutgoingEmail], spool: str, spool_format: str) -> bool:
+    """Render the emails in one batch and write them to a local spool
+    instead of printing or sending them."""
+    written = write_spool(MessageRenderer(date=localtime()).render_all(emails), spool, spool_format)
+    print(f'Wrote {written} emails to {spool} ({spool_format})')
+    return True
+
+def solve_draw(players: set[Player], incompatibilities: set[Incompatibility], giftNumber: int,
+               groups: list[set[Player]] | None, single_cycle: bool, pair_costs: dict, key: str,
+               cache: AssignmentCache | None, resolve: bool, shard_size: int = 0,
+               processes: int | None = None) -> NGiftGraph:
+    cached = cache.get(key) if cache is not None and not resolve else None
     #graph = GiftGraph(players, incompatibilities)
     graph = NGiftGraph(
          players=players,
          incompatibilities=incompatibilities,
          number_of_gifts=giftNumber,
-         allow_2cycles=False)
+         allow_2cycles=False,
+         groups=groups or [],
+         single_cycle=single_cycle,
+         pair_costs=pair_costs,
+         shard_size=shard_size,
+         shard_processes=processes,
+         # Without mixing, everyone would only give within their shard
+         mixing_steps=DEFAULT_SWEEPS * len(players) * giftNumber if shard_size else 0,
+         initial_assignments=cached)
     graph.verify_assignments()
+    if cached is not None and graph.attempts == 0:
+        print("Reusing the draw cached for this input, pass --resolve for a new one")
+    elif cache is not None:
+        cache.put(key, graph.assignments)
     print("Graph is correct!")
-    mailer = Mailer(mailer_settings)
+    return graph
+
+def main(players: set[Player], incompatibilities: set[Incompatibility], giftNumber: int, mailer_settings: MailerSettings,
+         email_subject: str, email_body_template: str, src_contact: Contact, dry: bool, logfile: str | None,
+         groups: list[set[Player]] | None = None, draws: int = 1, processes: int | None = None,
+         connections: int = 1, max_rate: float | None = None, single_cycle: bool = False,
+         history: HistoryStore | None = None, history_group: str = "", year: int | None = None,
+         history_years: int = 3, cache: AssignmentCache | None = None, resolve: bool = False,
+         journal: DeliveryJournal | None = None, resume: bool = False, spool: str | None = None,
+         spool_format: str = "mbox", shard_size: int = 0) -> bool:
+    # Past pairings are avoided where possible, not forbidden
+    year = year if year is not None else date.today().year
+    pair_costs = dict()
+    if history is not None:
+        pair_costs = repeat_costs(history.past_draws(players, history_years, history_group, year))
+    # The same input gets the same draw, so a dry run shows what will be sent.
+    # Sharding only changes how it is solved, not what a valid draw is
+    key = cache_key(players, incompatibilities, giftNumber, False, groups or [], pair_costs,
+                    single_cycle=single_cycle, year=year)
+
+    resumed = journal.last_draw() if journal is not None and resume else None
+    if resume and resumed is None:
+        # A new draw would send everyone a second email
+        raise JournalError("Nothing to resume")
+    if resumed is not None:
+        if resumed.key != key:
+            raise JournalError("The last draw of the journal was made for another input")
+        print(f"Resuming the journaled draw: {resumed.pending} of {len(resumed.assignments)} emails left to send")
+        assignments = resumed.assignments
+    else:
+        graph = solve_draw(players, incompatibilities, giftNumber, groups, single_cycle, pair_costs, key, cache, resolve,
+                           shard_size, processes)
+        if draws > 1:
+            # Alternatives for the organizers to pick from, nothing is sent
+            lines = []
+            for draw_index, draw in enumerate(graph.generate_many(draws, processes), 1):
+                lines.append(f'# Draw {draw_index}\n')
+                lines.extend(format_assignment_lines(draw, is_structured_log(logfile)))
+            if logfile:
+                with open(logfile, 'w') as l:
+                    l.writelines(lines)
+            else:
+                print(''.join(lines), end='')
+            return True
+        assignments = graph.assignments
+
     if logfile:
         with open(logfile, 'w') as l:
-            lines = [ f'{santa.name} {format_recipient_names(dsts)}\n' for santa, dsts in graph.assignments.items()]
-            l.writelines(lines)
-    for src, dsts in graph.assignments.items():
-        message_body = email_body_template.format(santa=src.name, recipient=format_recipient_names(dsts))
-        if dry:
-            print(f'Mail to {src.name} ({src.email}):')
-            print(message_body)
+            l.writelines(format_assignment_lines(assignments, is_structured_log(logfile)))
+    emails = render_emails(assignments, email_subject, email_body_template, src_contact)
+    if resumed is not None:
+        emails = [email for email in emails if not resumed.is_sent(email.dst)]
+    elif journal is not None and not dry and spool is None:
+        journal.start_draw(key, assignments)
+    if spool is not None:
+        all_sent = spool_emails(emails, spool, spool_format)
+    else:
+        all_sent = send_emails(emails, mailer_settings, dry, connections, max_rate, None if dry else journal)
+    # Only draws everyone got count as past pairings: a partly sent draw is
+    # recorded by the resume that completes it, a spooled one not at all
+    if history is not None and not dry and spool is None and all_sent \
+            and not (resumed is not None and resumed.recorded):
+        history.record_draw(assignments, history_group, year)
+        if journal is not None:
+            journal.record_history()
+    return all_sent
+
+def main_batch(input_files: list[str], mailer_settings: MailerSettings, email_subject: str, email_body_template: str,
+               src_contact: Contact, dry: bool, logfile: str | None, processes: int | None = None,
+               connections: int = 1, max_rate: float | None = None, spool: str | None = None,
+               spool_format: str = "mbox") -> bool:
+    """Solve every group concurrently, then log and send the successful ones.
+    Returns whether all groups succeeded and all their emails went out."""
+    indexed_results = []
+    for index, result in solve_groups(input_files, processes):
+        if result.succeeded:
+            print(f'[ok] {result.input_file}: {len(result.assignments)} players in {result.elapsed:.2f}s')
         else:
-            dst_contact = Contact(src.name, src.email)
-            mailer.send_email(dst_contact,
-                            src_contact,
-                            email_subject,
-                            message_body)
+            print(f'[failed] {result.input_file}: {result.error}')
+        indexed_results.append((index, result))
+
+    # Report in input order, whatever order the groups completed in
+    results = [result for _, result in sorted(indexed_results, key=lambda indexed: indexed[0])]
+    succeeded = [result for result in results if result.succeeded]
+    if logfile:
+        with open(logfile, 'w') as l:
+            for result in succeeded:
+                l.write(f'# {result.input_file}\n')
+                l.writelines(format_assignment_lines(result.assignments, is_structured_log(logfile)))
+
+    emails = [email for result in succeeded
+              for email in render_emails(result.assignments, email_subject, email_body_template, src_contact)]
+    if spool is not None:
+        all_sent = spool_emails(emails, spool, spool_format)
+    else:
+        all_sent = send_emails(emails, mailer_settings, dry, connections, max_rate)
+
+    print(f'{len(succeeded)}/{len(results)} groups solved')
+    return all_sent and len(succeeded) == len(results)
+
+def verify_main(args: list[str]) -> bool:
+    """The verify command: check the draws of a log against their roster
+    and print every violation. Returns whether all of them are valid."""
+    parser = OptionParser(usage="usage: %prog verify [options] input_file assignment_log (.jsonl or plain)")
+    parser.add_option("--single-cycle", dest="single_cycle", action="store_true", default=False,
+                      help="Also check that the draw is one loop through every player")
+    parser.add_option("--allow-2cycles", dest="allow_2cycles", action="store_true", default=False,
+                      help="Accept players giving to each other")
+    parser.add_option("--max-listed", dest="max_listed", action="store", type="int", default=20,
+                      help="Number of violations listed, the others are only counted")
+    (options, positional) = parser.parse_args(args)
+    if len(positional) != 2:
+        parser.error("Expected an input file and an assignment log")
+    input_file, assignment_log = positional
+    try:
+        roster = load_roster(input_file)
+    except RosterError as e:
+        parser.error(str(e))
+    try:
+        reports = verify_assignment_file(assignment_log, roster.players, roster.incompatibilities,
+                                         roster.gift_number, options.allow_2cycles, roster.groups,
+                                         options.single_cycle)
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    print("\n".join(report.format(options.max_listed) for report in reports))
+    return all(report.ok for report in reports)
 
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ["verify"]:
+        sys.exit(0 if verify_main(sys.argv[2:]) else 1)
+
+    # Only the command line reads a config file
+    from configobj import ConfigObj
 
-    usage = "usage: %prog [options] input_file"
+    usage = "usage: %prog [options] input_file (.json or .jsonl)\n       %prog [options] --batch input_directory_or_manifest\n       %prog verify [options] input_file assignment_log"
     parser = OptionParser(usage=usage)
     parser.add_option("-d", "--dry", dest="dry_run", action="store_true", default=False,
                       help="Dry run - do not send emails")
@@ -59,12 +264,58 @@ if __name__ == '__main__':
     parser.add_option("-c", "--config", dest="config_file", action="store", default="config.ini",
                       help="path to configuration file")
     parser.add_option("--logfile", dest="logfile", action="store", default=None, help="path to log file")
+    parser.add_option("--draws", dest="draws", action="store", type="int", default=1,
+                      help="Output this many alternative draws instead of sending emails")
+    parser.add_option("--processes", dest="processes", action="store", type="int", default=None,
+                      help="Number of worker processes used to compute draws or shards")
+    parser.add_option("--connections", dest="connections", action="store", type="int", default=1,
+                      help="Number of concurrent SMTP connections used to send emails")
+    parser.add_option("--max-rate", dest="max_rate", action="store", type="float", default=None,
+                      help="Maximum number of emails sent per second")
+    parser.add_option("--single-cycle", dest="single_cycle", action="store_true", default=False,
+                      help="Draw one loop through every player, so gifts can be handed over in one round")
+    parser.add_option("--shard-size", dest="shard_size", action="store", type="int", default=0,
+                      help="Solve very large rosters in random shards of about this many players, in parallel, "
+                           "then mix gifts across shards")
+    parser.add_option("--history", dest="history", action="store", default=None,
+                      help="SQLite file of past draws: repeats of recent years are avoided and sent draws recorded")
+    parser.add_option("--year", dest="year", action="store", type="int", default=date.today().year,
+                      help="Year of the draw in the history, defaults to the current year")
+    parser.add_option("--history-group", dest="history_group", action="store", default=None,
+                      help="Name of the group in the history, defaults to the input file name")
+    parser.add_option("--history-years", dest="history_years", action="store", type="int", default=3,
+                      help="Number of past years whose pairings are avoided")
+    parser.add_option("--cache-dir", dest="cache_dir", action="store",
+                      default=os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                                           "secret_santa"),
+                      help="Directory of cached draws, reused by later runs on the same input")
+    parser.add_option("--resolve", dest="resolve", action="store_true", default=False,
+                      help="Solve a new draw even if one is cached for this input")
+    parser.add_option("--journal", dest="journal", action="store", default=None,
+                      help="Delivery journal of sent emails, defaults to the input file name with .journal appended")
+    parser.add_option("--resume", dest="resume", action="store_true", default=False,
+                      help="Send only the emails of the journaled draw that did not go out yet")
+    parser.add_option("--spool", dest="spool", action="store", default=None,
+                      help="Write the emails to this local spool for a relay to pick up, instead of printing or "
+                           "sending them")
+    parser.add_option("--spool-format", dest="spool_format", action="store", type="choice", choices=SPOOL_FORMATS,
+                      default="mbox", help=f"Format of the spool: {', '.join(SPOOL_FORMATS)} (default: mbox)")
+    parser.add_option("--batch", dest="batch", action="store_true", default=False,
+                      help="Solve every input file of a directory, or listed in a manifest file, concurrently")
 
     (options, [inputfile]) = parser.parse_args()
     if options.login and not options.password:
         parser.error("Got a login but no password for SMTP server")
     if not options.login and options.password:
         parser.error("Got a password but no login for SMTP server")
+    if options.history and (options.batch or options.single_cycle):
+        parser.error("--history cannot be combined with --batch or --single-cycle")
+    if options.resume and (options.batch or options.draws > 1):
+        parser.error("--resume cannot be combined with --batch or --draws")
+    if options.resume and options.spool:
+        parser.error("--resume cannot be combined with --spool, which sends nothing")
+    if options.shard_size and (options.history or options.single_cycle):
+        parser.error("--shard-size cannot be combined with --history or --single-cycle")
 
     dry = options.dry_run
     logfile = options.logfile
@@ -75,7 +326,8 @@ if __name__ == '__main__':
         server_fqdn=config["SMTP Server"]["domain"],
         server_port=config["SMTP Server"]["port"],
         login=options.login,
-        password=options.password
+        password=options.password,
+        max_messages_per_connection=int(config["SMTP Server"].get("max messages per connection", 100))
     )
 
     src_contact = Contact(name=config["Email Template"]["sender name"],
@@ -83,15 +335,45 @@ if __name__ == '__main__':
     email_subject = config["Email Template"]["subject"]
     email_body_template = config["Email Template"]["email template"]
 
-    input_data = json.load(open(inputfile))
+    if options.batch:
+        all_succeeded = main_batch(find_input_files(inputfile), mailer_settings, email_subject,
+                                   email_body_template, src_contact, dry, logfile, options.processes,
+                                   options.connections, options.max_rate, options.spool, options.spool_format)
+        sys.exit(0 if all_succeeded else 1)
 
-    giftNumber: int = 1 if not "giftNumber" in input_data else input_data["giftNumber"]
-    input_players = set(map(lambda x: Player(**x), input_data["players"]))
-    players_by_name = {p.name: p for p in input_players}
-    input_incompatibilities = set(map(
-        lambda inc: Incompatibility(players_by_name[inc["fst"]],
-                                    players_by_name[inc["snd"]]),
-        input_data["incompatibilities"]))
+    try:
+        roster = load_roster(inputfile)
+    except RosterError as e:
+        parser.error(str(e))
+    if options.single_cycle and roster.gift_number != 1:
+        parser.error(f"--single-cycle gives exactly one gift per player, the roster asks for {roster.gift_number}")
 
-    main(input_players, input_incompatibilities, giftNumber, mailer_settings,
-         email_subject, email_body_template, src_contact,  dry, logfile)
+    history = HistoryStore(options.history) if options.history else None
+    history_group = options.history_group or os.path.splitext(os.path.basename(inputfile))[0]
+    is_sending = not dry and not options.spool
+    journal = DeliveryJournal(options.journal or f"{inputfile}.journal") if is_sending or options.resume else None
+    try:
+        all_sent = main(roster.players, roster.incompatibilities, roster.gift_number, mailer_settings,
+                        email_subject, email_body_template, src_contact,  dry, logfile, roster.groups,
+                        options.draws, options.processes, options.connections, options.max_rate,
+                        options.single_cycle, history, history_group, options.year, options.history_years,
+                        AssignmentCache(options.cache_dir), options.resolve, journal, options.resume,
+                        options.spool, options.spool_format, options.shard_size)
+    except InfeasibleAssignmentError as e:
+        print(f'No valid draw exists:\n{e}', file=sys.stderr)
+        sys.exit(1)
+    except JournalError as e:
+        print(f'Cannot resume: {e}', file=sys.stderr)
+        sys.exit(1)
+    except (smtplib.SMTPException, OSError) as e:
+        print(f'Sending failed: {e}\nRun again with --resume to send the emails that did not go out',
+              file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if history is not None:
+            history.close()
+        if journal is not None:
+            journal.close()
+    if not all_sent and journal is not None:
+        print('Run again with --resume to send the emails that did not go out', file=sys.stderr)
+    sys.exit(0 if all_sent else 1)
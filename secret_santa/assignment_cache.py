@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Mapping, Union
+
+from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.player import Player
+
+
+def _player_key(player: Player) -> list[str]:
+    return [player.name, player.email]
+
+
+def cache_key(
+        players: Iterable[Player],
+        incompatibilities: Iterable[Incompatibility],
+        number_of_gifts: int,
+        allow_2cycles: bool,
+        groups: Iterable[Iterable[Player]] = (),
+        pair_costs: Union[Mapping[tuple[Player, Player], int], None] = None,
+        **options: Any
+) -> str:
+    """SHA-256 of a canonical description of a draw's input: the same
+    players and constraints give the same key whatever their order.
+    options holds any other JSON-serializable setting the draw depends on."""
+    description = {
+        "players": sorted(_player_key(player) for player in players),
+        "incompatibilities": sorted(sorted([_player_key(incompatibility.fst), _player_key(incompatibility.snd)])
+                                    for incompatibility in incompatibilities),
+        "groups": sorted(sorted(_player_key(player) for player in group) for group in groups),
+        "number_of_gifts": number_of_gifts,
+        "allow_2cycles": allow_2cycles,
+        "pair_costs": sorted([_player_key(src), _player_key(dst), cost]
+                             for (src, dst), cost in (pair_costs or {}).items() if cost),
+        "options": options,
+    }
+    encoded = json.dumps(description, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class AssignmentCache:
+    """Solved draws, one JSON file per cache_key in directory.
+
+    Entries older than max_age seconds are dropped, then the least
+    recently used ones beyond max_entries. Reading an entry counts as a
+    use.
+    """
+    directory: str
+    max_entries: int = field(default=100)
+    max_age: float = field(default=30 * 24 * 3600)
+
+    def get(self, key: str) -> Union[dict[Player, set[Player]], None]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)["assignments"]
+            # Entries of the wrong shape are misses too
+            assignments = {Player(*src): {Player(*dst) for dst in dsts} for src, dsts in entries}
+            os.utime(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return assignments
+
+    def put(self, key: str, assignments: Mapping[Player, Iterable[Player]]):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = [[_player_key(src), [_player_key(dst) for dst in dsts]] for src, dsts in assignments.items()]
+        # Written aside then renamed, so readers never see half an entry
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"assignments": entries}, f, ensure_ascii=False)
+            os.replace(temporary_path, self._path(key))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                modified = os.path.getmtime(path)
+                if now - modified > self.max_age:
+                    os.remove(path)
+                else:
+                    entries.append((modified, path))
+            except OSError:
+                # Removed concurrently
+                continue
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
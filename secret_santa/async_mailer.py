@@ -0,0 +1,93 @@
+import asyncio
+import smtplib
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Union
+
+from secret_santa.mailer import Mailer, MailerSettings, OutgoingEmail
+
+
+@dataclass
+class DeliveryResult:
+    email: OutgoingEmail
+    sent: bool
+    attempts: int
+    error: Union[str, None] = field(default=None)
+
+
+class _RateLimiter:
+    """Spaces out acquisitions to at most rate per second."""
+
+    def __init__(self, rate: Union[float, None]):
+        self.interval = 1. / rate if rate else 0.
+        self._next_slot = 0.
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+@dataclass
+class AsyncMailer:
+    """Sends emails over several SMTP connections at once.
+
+    Each connection is a Mailer driven from a worker thread, so sends
+    overlap on network round trips. Transient 4xx replies are retried
+    with exponential backoff; other failures are reported right away.
+    """
+    settings: MailerSettings
+    connections: int = field(default=4)
+    max_messages_per_second: Union[float, None] = field(default=None)
+    max_attempts: int = field(default=3)
+    # Delay before the first retry, doubled for each later one
+    retry_delay: float = field(default=1.)
+    mailer_factory: Callable[[MailerSettings], Mailer] = field(default=Mailer, repr=False)
+
+    def send_all(self, emails: Iterable[OutgoingEmail],
+                 on_result: Union[Callable[[DeliveryResult], None], None] = None) -> list[DeliveryResult]:
+        return asyncio.run(self.dispatch(emails, on_result))
+
+    async def dispatch(self, emails: Iterable[OutgoingEmail],
+                       on_result: Union[Callable[[DeliveryResult], None], None] = None) -> list[DeliveryResult]:
+        """Send every email, returning one result per email in input order.
+        on_result is also called with each result as soon as it is known."""
+        queue: asyncio.Queue[tuple[int, OutgoingEmail]] = asyncio.Queue()
+        for index, email in enumerate(emails):
+            queue.put_nowait((index, email))
+        results: list[Union[DeliveryResult, None]] = [None] * queue.qsize()
+        limiter = _RateLimiter(self.max_messages_per_second)
+        workers = min(self.connections, queue.qsize())
+        await asyncio.gather(*(self._worker(queue, limiter, results, on_result) for _ in range(workers)))
+        return results
+
+    async def _worker(self, queue: asyncio.Queue, limiter: _RateLimiter, results: list,
+                      on_result: Union[Callable[[DeliveryResult], None], None]):
+        mailer = self.mailer_factory(self.settings)
+        try:
+            while not queue.empty():
+                index, email = queue.get_nowait()
+                results[index] = await self._deliver(mailer, email, limiter)
+                if on_result is not None:
+                    on_result(results[index])
+        finally:
+            await asyncio.to_thread(mailer.close)
+
+    async def _deliver(self, mailer: Mailer, email: OutgoingEmail, limiter: _RateLimiter) -> DeliveryResult:
+        delay = self.retry_delay
+        for attempt in range(1, self.max_attempts + 1):
+            await limiter.acquire()
+            try:
+                await asyncio.to_thread(mailer.send_email, email.dst, email.sender, email.subject, email.body)
+                return DeliveryResult(email, True, attempt)
+            except smtplib.SMTPResponseException as e:
+                is_transient = 400 <= e.smtp_code < 500
+                if not is_transient or attempt == self.max_attempts:
+                    return DeliveryResult(email, False, attempt, f"{e.smtp_code} {e.smtp_error!r}")
+            except (smtplib.SMTPException, OSError) as e:
+                return DeliveryResult(email, False, attempt, f"{type(e).__name__}: {e}")
+            await asyncio.sleep(delay)
+            delay *= 2
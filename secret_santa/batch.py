@@ -0,0 +1,62 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Iterator, Union
+
+from secret_santa.roster import load_roster
+from secret_santa.secret_santa.gift_graph import NGiftGraph
+from secret_santa.secret_santa.player import Player
+from secret_santa.secret_santa.sharding import seed_worker
+
+
+@dataclass
+class GroupResult:
+    input_file: str
+    assignments: dict[Player, set[Player]] = field(default_factory=dict)
+    error: Union[str, None] = field(default=None)
+    elapsed: float = field(default=0.)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+def find_input_files(path: str) -> list[str]:
+    """Input files of a batch: the .json and .jsonl files of a directory, or the
+    files listed one per line in a manifest, relative to the manifest."""
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith((".json", ".jsonl")))
+
+    manifest_dir = os.path.dirname(path)
+    with open(path) as manifest:
+        lines = (line.strip() for line in manifest)
+        return [os.path.join(manifest_dir, line) for line in lines if line and not line.startswith("#")]
+
+
+def solve_group(input_file: str, allow_2cycles: bool = False) -> GroupResult:
+    start = time.perf_counter()
+    try:
+        roster = load_roster(input_file)
+        graph = NGiftGraph(
+            players=roster.players,
+            incompatibilities=roster.incompatibilities,
+            number_of_gifts=roster.gift_number,
+            allow_2cycles=allow_2cycles,
+            groups=roster.groups)
+        graph.verify_assignments()
+    except Exception as e:
+        # One broken group must not take the rest of the batch down
+        return GroupResult(input_file, error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - start)
+    return GroupResult(input_file, dict(graph.assignments), elapsed=time.perf_counter() - start)
+
+
+def solve_groups(input_files: list[str], processes: Union[int, None] = None,
+                 allow_2cycles: bool = False) -> Iterator[tuple[int, GroupResult]]:
+    """Solve independent groups concurrently, yielding results as they
+    complete, each with the position of its file in input_files."""
+    with ProcessPoolExecutor(processes, initializer=seed_worker) as executor:
+        futures = {executor.submit(solve_group, input_file, allow_2cycles): index
+                   for index, input_file in enumerate(input_files)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
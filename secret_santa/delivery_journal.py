@@ -0,0 +1,144 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import IO, Any, Iterable, Mapping, Union
+
+from secret_santa.mailer import Contact
+from secret_santa.secret_santa.player import Player
+
+
+class JournalError(Exception):
+    pass
+
+
+def _contact_key(contact: Union[Contact, Player]) -> tuple[str, str]:
+    return contact.name, contact.email
+
+
+@dataclass
+class JournalDraw:
+    """The state of a journaled draw: its assignments, in sending order,
+    and what became of each email. Emails are keyed by the (name, email)
+    of the player they are sent to."""
+    number: int
+    key: str
+    assignments: dict[Player, set[Player]] = field(default_factory=dict)
+    sent: set[tuple[str, str]] = field(default_factory=set)
+    failed: dict[tuple[str, str], str] = field(default_factory=dict)
+    # Whether the draw was recorded in the history
+    recorded: bool = field(default=False)
+
+    def is_sent(self, contact: Union[Contact, Player]) -> bool:
+        return _contact_key(contact) in self.sent
+
+    @property
+    def pending(self) -> int:
+        return len(self.assignments) - len(self.sent)
+
+
+@dataclass
+class DeliveryJournal:
+    """Append-only log of the emails of each draw, one JSON object per
+    line: the draw, then every email as queued with the assignment it
+    carries, then as sent or failed as delivery goes.
+
+    The queued entries are synced to disk before any email goes out, so a
+    draw is never lost once sending has started. Later entries are synced
+    in batches of sync_every entries or sync_interval seconds: a crash
+    loses at most one batch, whose emails are sent again on resume.
+
+    Use as a context manager, or call close.
+    """
+    path: str
+    sync_every: int = field(default=100)
+    sync_interval: float = field(default=1.)
+    _file: IO[str] = field(init=False, repr=False)
+    _draw: int = field(init=False, repr=False, default=0)
+    _unsynced: int = field(init=False, repr=False, default=0)
+    _last_sync: float = field(init=False, repr=False, default=0.)
+
+    def __post_init__(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._file.tell() > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                is_torn = f.read(1) != b"\n"
+            if is_torn:
+                # Finish a line torn by a crash, so the next entry starts clean
+                self._file.write("\n")
+                self.sync()
+        self.last_draw()
+        self._last_sync = time.monotonic()
+
+    def __enter__(self) -> 'DeliveryJournal':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def last_draw(self) -> Union[JournalDraw, None]:
+        """The latest draw of the journal, or None if there is none. Its
+        entries are followed by the ones appended from now on."""
+        self._file.flush()
+        draw = None
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn by a crash while being written
+                    continue
+                if entry["event"] == "draw":
+                    draw = JournalDraw(entry["draw"], entry["key"])
+                elif draw is None or entry["draw"] != draw.number:
+                    continue
+                elif entry["event"] == "queued":
+                    draw.assignments[Player(*entry["to"])] = {Player(*giftee) for giftee in entry["giftees"]}
+                elif entry["event"] == "sent":
+                    draw.sent.add(tuple(entry["to"]))
+                    draw.failed.pop(tuple(entry["to"]), None)
+                elif entry["event"] == "failed":
+                    draw.failed[tuple(entry["to"])] = entry["error"]
+                elif entry["event"] == "recorded":
+                    draw.recorded = True
+        if draw is not None:
+            self._draw = draw.number
+        return draw
+
+    def start_draw(self, key: str, assignments: Mapping[Player, Iterable[Player]]):
+        """Journal a new draw, made for the input of cache_key key, with
+        all its emails queued. Synced before returning."""
+        self._draw += 1
+        self._append({"event": "draw", "draw": self._draw, "key": key})
+        for src, dsts in assignments.items():
+            self._append({"event": "queued", "draw": self._draw, "to": _contact_key(src),
+                          "giftees": [_contact_key(dst) for dst in dsts]})
+        self.sync()
+
+    def record_sent(self, contact: Contact):
+        self._append({"event": "sent", "draw": self._draw, "to": _contact_key(contact)})
+
+    def record_failed(self, contact: Contact, error: str):
+        self._append({"event": "failed", "draw": self._draw, "to": _contact_key(contact), "error": error})
+
+    def record_history(self):
+        self._append({"event": "recorded", "draw": self._draw})
+        self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _append(self, entry: dict[str, Any]):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
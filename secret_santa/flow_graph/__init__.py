@@ -1 +1,2 @@
-from .flow_graph import FlowGraph, FlowEdge, _ResidualFlow
\ No newline at end of file
+from .flow_graph import FlowGraph, FlowEdge, FlowAlgorithm, _ResidualFlow
+from .compact_flow_graph import CompactFlowGraph
@@ -0,0 +1,185 @@
+from array import array
+from dataclasses import dataclass, field
+from random import randrange
+from typing import Sequence, Union
+
+from .flow_graph import Flow
+from secret_santa.stats import SolverStats, measure
+
+# Typecodes: arc indices can exceed 2**31 on very large graphs, node ids
+# and capacities cannot.
+_ARC = 'q'
+_NODE = 'i'
+_CAPACITY = 'i'
+
+
+@dataclass
+class CompactFlowGraph:
+    """Residual graph over dense integer node ids, stored as CSR arrays.
+
+    Arcs leaving node ``u`` are ``offsets[u]`` to ``offsets[u + 1]``. Every
+    edge is stored as a forward arc holding its capacity and a reverse arc
+    of capacity 0; ``reverse`` maps each arc to its pair.
+    """
+    offsets: array
+    targets: array
+    reverse: array
+    capacities: array
+    source: int
+    sink: int
+    stats: Union[SolverStats, None] = field(default=None)
+    residuals: array = field(init=False, repr=False)
+    # Search effort of the last compute_largest_flow, reported to stats
+    _bfs_passes: int = field(init=False, default=0, repr=False)
+    _bfs_nodes: int = field(init=False, default=0, repr=False)
+    _augmenting_paths: int = field(init=False, default=0, repr=False)
+
+    def __post_init__(self):
+        self.residuals = array(_CAPACITY, self.capacities)
+
+    @classmethod
+    def from_edges(
+            cls,
+            node_count: int,
+            sources: Sequence[int],
+            targets: Sequence[int],
+            capacities: Sequence[int],
+            source: int,
+            sink: int
+    ) -> 'CompactFlowGraph':
+        arc_count = 2 * len(sources)
+        offsets = array(_ARC, bytes(8 * (node_count + 1)))
+        for src, dst in zip(sources, targets):
+            offsets[src + 1] += 1
+            offsets[dst + 1] += 1
+        for node in range(node_count):
+            offsets[node + 1] += offsets[node]
+
+        cursor = array(_ARC, offsets)
+        arc_targets = array(_NODE, bytes(4 * arc_count))
+        arc_reverse = array(_ARC, bytes(8 * arc_count))
+        arc_capacities = array(_CAPACITY, bytes(4 * arc_count))
+        for src, dst, capacity in zip(sources, targets, capacities):
+            forward = cursor[src]
+            cursor[src] += 1
+            backward = cursor[dst]
+            cursor[dst] += 1
+            arc_targets[forward] = dst
+            arc_capacities[forward] = capacity
+            arc_reverse[forward] = backward
+            arc_targets[backward] = src
+            arc_reverse[backward] = forward
+        return cls(offsets, arc_targets, arc_reverse, arc_capacities, source, sink)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def reset(self):
+        self.residuals = array(_CAPACITY, self.capacities)
+
+    def compute_largest_flow(self) -> Flow:
+        with measure(self.stats, "max_flow"):
+            self._bfs_passes = 0
+            self._bfs_nodes = 0
+            self._augmenting_paths = 0
+            value = 0
+            while (level := self._build_levels()) is not None:
+                value += self._push_blocking_flow(level)
+            flow = Flow(value, self._flow_graph())
+        if self.stats is not None:
+            self.stats.increment("bfs_passes", self._bfs_passes)
+            self.stats.increment("bfs_nodes", self._bfs_nodes)
+            self.stats.increment("augmenting_paths", self._augmenting_paths)
+            self.stats.increment("flow_value", flow.value)
+        return flow
+
+    def min_cut_source_side(self) -> set[int]:
+        """Nodes still reachable from the source in the residual graph.
+        After a max flow, arcs leaving this set form a minimum cut."""
+        offsets, targets, residuals = self.offsets, self.targets, self.residuals
+        reachable = {self.source}
+        to_visit = [self.source]
+        while to_visit:
+            cur_node = to_visit.pop()
+            for arc in range(offsets[cur_node], offsets[cur_node + 1]):
+                node = targets[arc]
+                if residuals[arc] > 0 and node not in reachable:
+                    reachable.add(node)
+                    to_visit.append(node)
+        return reachable
+
+    def _build_levels(self) -> Union[array, None]:
+        offsets, targets, residuals = self.offsets, self.targets, self.residuals
+        level = array(_NODE, [-1]) * self.node_count
+        level[self.source] = 0
+        to_visit = [self.source]
+        head = 0
+        while head < len(to_visit):
+            cur_node = to_visit[head]
+            head += 1
+            next_level = level[cur_node] + 1
+            for arc in range(offsets[cur_node], offsets[cur_node + 1]):
+                node = targets[arc]
+                if residuals[arc] > 0 and level[node] < 0:
+                    level[node] = next_level
+                    to_visit.append(node)
+        self._bfs_passes += 1
+        self._bfs_nodes += head
+        return level if level[self.sink] >= 0 else None
+
+    def _push_blocking_flow(self, level: array) -> int:
+        offsets, targets, reverse, residuals = self.offsets, self.targets, self.reverse, self.residuals
+        source, sink = self.source, self.sink
+        # Each node scans its arcs from a random starting point so that
+        # equivalent solutions are picked at random
+        rotation = array(_ARC, (randrange(offsets[node + 1] - offsets[node]) if offsets[node + 1] > offsets[node] else 0
+                                for node in range(self.node_count)))
+        scanned = array(_ARC, bytes(8 * self.node_count))
+        path: list[int] = []
+        pushed = 0
+        cur_node = source
+        while True:
+            if cur_node == sink:
+                rate = min(residuals[arc] for arc in path)
+                for arc in path:
+                    residuals[arc] -= rate
+                    residuals[reverse[arc]] += rate
+                pushed += rate
+                self._augmenting_paths += 1
+                path.clear()
+                cur_node = source
+                continue
+
+            first_arc = offsets[cur_node]
+            degree = offsets[cur_node + 1] - first_arc
+            next_level = level[cur_node] + 1
+            advanced = False
+            while scanned[cur_node] < degree:
+                arc = first_arc + (rotation[cur_node] + scanned[cur_node]) % degree
+                if residuals[arc] > 0 and level[targets[arc]] == next_level:
+                    path.append(arc)
+                    cur_node = targets[arc]
+                    advanced = True
+                    break
+                scanned[cur_node] += 1
+
+            if not advanced:
+                if cur_node == source:
+                    return pushed
+                # Dead end: step back and skip the arc that led here
+                arc = path.pop()
+                cur_node = targets[reverse[arc]]
+                scanned[cur_node] += 1
+
+    def _flow_graph(self) -> dict[int, dict[int, int]]:
+        offsets, targets, capacities, residuals = self.offsets, self.targets, self.capacities, self.residuals
+        flow: dict[int, dict[int, int]] = dict()
+        for node in range(self.node_count):
+            for arc in range(offsets[node], offsets[node + 1]):
+                capacity = capacities[arc]
+                if capacity > 0:
+                    node_flow = flow.setdefault(node, dict())
+                    if residuals[arc] < capacity:
+                        node_flow[targets[arc]] = capacity - residuals[arc]
+        return flow
@@ -1,11 +1,29 @@
 from collections import defaultdict, deque
 from dataclasses import dataclass, field
+from enum import Enum
+from heapq import heappop, heappush
+from itertools import count
 from random import shuffle
 from sys import maxsize
-from typing import Hashable, List, Tuple, Union
+from typing import Callable, Hashable, List, Tuple, Union
+
+from secret_santa.stats import SolverStats, measure
 
 Node = Hashable
 Graph = defaultdict[Node, dict[Node, int]]
+LevelGraph = dict[Node, List[Node]]
+
+
+class FlowAlgorithm(Enum):
+    # One BFS and one augmenting path per iteration
+    EDMONDS_KARP = 0
+    # One BFS per phase, then a blocking flow over the level graph.
+    # On unit-capacity bipartite graphs this is Hopcroft-Karp.
+    DINIC = 1
+    # Successive shortest paths: Dijkstra on costs reduced by node
+    # potentials, then a blocking flow over the zero reduced cost edges.
+    # Gives the max flow of lowest total cost.
+    MIN_COST = 2
 
 
 @dataclass
@@ -13,6 +31,8 @@ class FlowEdge:
     src: Node
     dst: Node
     capacity: int
+    # Cost per unit of flow, only used by FlowAlgorithm.MIN_COST
+    cost: int = field(default=0)
 
 
 @dataclass
@@ -29,6 +49,7 @@ class _ResidualFlow:
 class Flow:
     value: int
     graph: Graph
+    cost: int = field(default=0)
 
 
 @dataclass
@@ -36,28 +57,77 @@ class FlowGraph:
     edges: List[FlowEdge]
     source: Node
     sink: Node
+    algorithm: FlowAlgorithm = field(default=FlowAlgorithm.EDMONDS_KARP)
+    stats: Union[SolverStats, None] = field(default=None)
     internal_graph: Graph = field(
         init=False,
         default_factory=lambda: defaultdict(dict))
+    # Edge costs, negated on reverse edges
+    internal_costs: Graph = field(
+        init=False,
+        repr=False,
+        default_factory=lambda: defaultdict(dict))
+    # Search effort of the last compute_largest_flow, reported to stats
+    _bfs_passes: int = field(init=False, default=0, repr=False)
+    _bfs_nodes: int = field(init=False, default=0, repr=False)
+    _augmenting_paths: int = field(init=False, default=0, repr=False)
+    _shortest_path_passes: int = field(init=False, default=0, repr=False)
 
     def __post_init__(self):
+        self.reset()
+
+    def reset(self):
+        self.internal_graph = defaultdict(dict)
+        self.internal_costs = defaultdict(dict)
+        # Plain max flows without costs do not pay for a second graph
+        keep_costs = self.algorithm is FlowAlgorithm.MIN_COST or any(edge.cost for edge in self.edges)
         for edge in self.edges:
+            if edge.cost < 0:
+                raise ValueError(f"Edge {edge.src} -> {edge.dst} has a negative cost")
             self.internal_graph[edge.src][edge.dst] = edge.capacity
             self.internal_graph[edge.dst][edge.src] = 0
+            if keep_costs:
+                self.internal_costs[edge.src][edge.dst] = edge.cost
+                self.internal_costs[edge.dst][edge.src] = -edge.cost
 
     def compute_largest_flow(self) -> Flow:
+        with measure(self.stats, "max_flow"):
+            flow = self._compute_largest_flow()
+        if self.stats is not None:
+            self.stats.increment("bfs_passes", self._bfs_passes)
+            self.stats.increment("bfs_nodes", self._bfs_nodes)
+            self.stats.increment("augmenting_paths", self._augmenting_paths)
+            self.stats.increment("flow_value", flow.value)
+            if self.algorithm is FlowAlgorithm.MIN_COST:
+                self.stats.increment("shortest_path_passes", self._shortest_path_passes)
+                self.stats.increment("flow_cost", flow.cost)
+        return flow
+
+    def _compute_largest_flow(self) -> Flow:
         flow: Graph = defaultdict(dict)
         value = 0
+        self._bfs_passes = 0
+        self._bfs_nodes = 0
+        self._augmenting_paths = 0
+        self._shortest_path_passes = 0
         for edge in self.edges:
             flow[edge.src][edge.dst] = 0
-        while residual_flow := self._find_residual_flow():
-            self._apply_residual_flow(residual_flow, flow)
-            value += residual_flow.rate
+        if self.algorithm is FlowAlgorithm.DINIC:
+            value = self._compute_dinic_flow(flow)
+        elif self.algorithm is FlowAlgorithm.MIN_COST:
+            value = self._compute_min_cost_flow(flow)
+        else:
+            while residual_flow := self._find_residual_flow():
+                self._apply_residual_flow(residual_flow, flow)
+                value += residual_flow.rate
+                self._augmenting_paths += 1
 
         # CleanUp empty edges
         for src in flow.keys():
             flow[src] = {dst: rate for dst, rate in flow[src].items() if rate > 0}
-        return Flow(value, flow)
+        cost = sum(rate * self.internal_costs[src][dst] for src in flow for dst, rate in flow[src].items()) \
+            if self.internal_costs else 0
+        return Flow(value, flow, cost)
 
     def _find_residual_flow(self) -> Union[_ResidualFlow, None]:
         to_visit: deque[Node] = deque()
@@ -69,6 +139,7 @@ class FlowGraph:
         while to_visit:
             cur_node = to_visit.popleft()
             if cur_node is self.sink:
+                self._count_bfs(len(prev_node))
                 return self._reconstruct_flow_from_prev_dict(prev_node)
             else:
                 next_nodes = [node for node in self.internal_graph[cur_node].keys()
@@ -79,8 +150,134 @@ class FlowGraph:
                     prev_node[node] = cur_node
                     to_visit.append(node)
 
+        self._count_bfs(len(prev_node))
         return None
 
+    def _count_bfs(self, discovered_nodes: int):
+        self._bfs_passes += 1
+        self._bfs_nodes += discovered_nodes
+
+    def min_cut_source_side(self) -> set[Node]:
+        """Nodes still reachable from the source in the residual graph.
+        After a max flow, edges leaving this set form a minimum cut."""
+        reachable = {self.source}
+        to_visit: deque[Node] = deque([self.source])
+        while to_visit:
+            cur_node = to_visit.popleft()
+            for node, capacity in self.internal_graph[cur_node].items():
+                if capacity > 0 and node not in reachable:
+                    reachable.add(node)
+                    to_visit.append(node)
+        return reachable
+
+    def _compute_min_cost_flow(self, flow: Graph) -> int:
+        # Reduced costs cost + potential[src] - potential[dst] stay
+        # non-negative on every residual edge, so Dijkstra applies
+        potential: defaultdict[Node, int] = defaultdict(int)
+        value = 0
+        while (distance := self._shortest_distances(potential)) is not None:
+            # Capping at the sink distance keeps unreached nodes consistent
+            sink_distance = distance[self.sink]
+            for node in list(self.internal_graph):
+                potential[node] += min(distance.get(node, sink_distance), sink_distance)
+            # Zero reduced cost edges are exactly those on shortest paths
+            value += self._compute_dinic_flow(
+                flow, lambda src, dst: self.internal_costs[src][dst] + potential[src] == potential[dst])
+        return value
+
+    def _shortest_distances(self, potential: defaultdict[Node, int]) -> Union[dict[Node, int], None]:
+        self._shortest_path_passes += 1
+        distance: dict[Node, int] = {self.source: 0}
+        done: set[Node] = set()
+        # Nodes need not be comparable: ties are broken by insertion order
+        tie_breaker = count()
+        to_visit = [(0, next(tie_breaker), self.source)]
+        while to_visit:
+            cur_distance, _, cur_node = heappop(to_visit)
+            if cur_node in done:
+                continue
+            done.add(cur_node)
+            costs = self.internal_costs[cur_node]
+            for node, capacity in self.internal_graph[cur_node].items():
+                if capacity <= 0 or node in done:
+                    continue
+                node_distance = cur_distance + costs[node] + potential[cur_node] - potential[node]
+                if node_distance < distance.get(node, maxsize):
+                    distance[node] = node_distance
+                    heappush(to_visit, (node_distance, next(tie_breaker), node))
+        return distance if self.sink in done else None
+
+    def _compute_dinic_flow(self, flow: Graph, is_admissible: Union[Callable[[Node, Node], bool], None] = None) -> int:
+        value = 0
+        while (level_graph := self._build_level_graph(is_admissible)) is not None:
+            path: List[Node] = [self.source]
+            while path:
+                cur_node = path[-1]
+                if cur_node == self.sink:
+                    residual_flow = self._reconstruct_flow_from_path(path)
+                    self._apply_residual_flow(residual_flow, flow)
+                    value += residual_flow.rate
+                    self._augmenting_paths += 1
+                    path = [self.source]
+                    continue
+
+                # Drop the edges saturated since the level graph was built
+                next_nodes = level_graph[cur_node]
+                while next_nodes and self.internal_graph[cur_node][next_nodes[-1]] <= 0:
+                    next_nodes.pop()
+
+                if next_nodes:
+                    path.append(next_nodes[-1])
+                else:
+                    # Dead end: prune it from the level graph for this phase
+                    path.pop()
+                    if path:
+                        level_graph[path[-1]].pop()
+        return value
+
+    def _build_level_graph(
+            self,
+            is_admissible: Union[Callable[[Node, Node], bool], None] = None
+    ) -> Union[LevelGraph, None]:
+        to_visit: deque[Node] = deque()
+        level: dict[Node, int] = dict()
+
+        to_visit.append(self.source)
+        level[self.source] = 0
+
+        while to_visit:
+            cur_node = to_visit.popleft()
+            if cur_node == self.sink:
+                continue
+            for node, capacity in self.internal_graph[cur_node].items():
+                if capacity > 0 and node not in level and (is_admissible is None or is_admissible(cur_node, node)):
+                    level[node] = level[cur_node] + 1
+                    to_visit.append(node)
+
+        self._bfs_passes += 1
+        self._bfs_nodes += len(level)
+        if self.sink not in level:
+            return None
+
+        level_graph: LevelGraph = dict()
+        for cur_node, cur_level in level.items():
+            next_nodes = [node for node, capacity in self.internal_graph[cur_node].items()
+                          if capacity > 0 and level.get(node) == cur_level + 1
+                          and (is_admissible is None or is_admissible(cur_node, node))]
+            shuffle(next_nodes)
+            level_graph[cur_node] = next_nodes
+        return level_graph
+
+    def _reconstruct_flow_from_path(self, path: List[Node]) -> _ResidualFlow:
+        flow = _ResidualFlow()
+        for src, dst in zip(path, path[1:]):
+            flow.add_edge(FlowEdge(
+                src=src,
+                dst=dst,
+                capacity=self.internal_graph[src][dst]
+            ))
+        return flow
+
     def _reconstruct_flow_from_prev_dict(self, prev_node_mapping: dict[Node, Node]) -> _ResidualFlow:
         flow = _ResidualFlow()
         dst = self.sink
@@ -0,0 +1,135 @@
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterable, Mapping, Union
+
+from secret_santa.secret_santa.player import Player
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    UNIQUE (name, email)
+);
+CREATE TABLE IF NOT EXISTS draws (
+    id INTEGER PRIMARY KEY,
+    group_name TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS draws_by_group_year ON draws (group_name, year);
+CREATE TABLE IF NOT EXISTS pairs (
+    draw_id INTEGER NOT NULL REFERENCES draws (id),
+    gifter_id INTEGER NOT NULL REFERENCES players (id),
+    giftee_id INTEGER NOT NULL REFERENCES players (id),
+    PRIMARY KEY (draw_id, gifter_id, giftee_id)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class HistoryStore:
+    """Past draws in a SQLite database, one row per gift.
+
+    Players are stored once each with their own ids, which, unlike
+    Player.id, are the same from one run to the next. Writes and lookups
+    go through temporary tables and set-based statements, so their cost
+    does not grow with one query per player.
+
+    Use as a context manager, or call close.
+    """
+    path: str
+    _connection: sqlite3.Connection = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> 'HistoryStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def record_draw(self, assignments: Mapping[Player, Iterable[Player]], group: str, year: int) -> int:
+        """Store a draw in a single transaction. Returns its id."""
+        with self._connection:
+            player_ids = self._player_ids({player for src, dsts in assignments.items() for player in (src, *dsts)})
+            draw_id = self._connection.execute(
+                "INSERT INTO draws (group_name, year, recorded_at) VALUES (?, ?, ?)",
+                (group, year, datetime.now(timezone.utc).isoformat())).lastrowid
+            self._connection.executemany(
+                "INSERT INTO pairs (draw_id, gifter_id, giftee_id) VALUES (?, ?, ?)",
+                ((draw_id, player_ids[src], player_ids[dst]) for src, dsts in assignments.items() for dst in dsts))
+        return draw_id
+
+    def past_draws(
+            self,
+            players: Iterable[Player],
+            years: int,
+            group: str,
+            before_year: Union[int, None] = None
+    ) -> list[dict[Player, set[Player]]]:
+        """Draws of group in the years last years before before_year
+        (default: every year recorded), oldest first, keeping only the
+        gifts between players. Fits NGiftGraph.pair_costs through
+        repeat_costs."""
+        if before_year is None:
+            before_year = self._connection.execute(
+                "SELECT COALESCE(MAX(year), 0) + 1 FROM draws WHERE group_name = ?", (group,)).fetchone()[0]
+        by_draw: defaultdict[int, defaultdict[Player, set[Player]]] = defaultdict(lambda: defaultdict(set))
+        with self._connection:
+            self._fill_wanted(players)
+            rows = self._connection.execute(
+                """
+                SELECT d.id, gifter.name, gifter.email, giftee.name, giftee.email
+                FROM draws d
+                JOIN pairs p ON p.draw_id = d.id
+                JOIN _wanted wanted_gifter ON wanted_gifter.id = p.gifter_id
+                JOIN _wanted wanted_giftee ON wanted_giftee.id = p.giftee_id
+                JOIN players gifter ON gifter.id = p.gifter_id
+                JOIN players giftee ON giftee.id = p.giftee_id
+                WHERE d.group_name = ? AND d.year >= ? AND d.year < ?
+                ORDER BY d.year, d.id
+                """, (group, before_year - years, before_year))
+            for draw_id, gifter_name, gifter_email, giftee_name, giftee_email in rows:
+                by_draw[draw_id][Player(gifter_name, gifter_email)].add(Player(giftee_name, giftee_email))
+        return list(by_draw.values())
+
+    def past_pairs(
+            self,
+            players: Iterable[Player],
+            years: int,
+            group: str,
+            before_year: Union[int, None] = None
+    ) -> set[tuple[Player, Player]]:
+        """Every gifter -> giftee pair of past_draws."""
+        return {(src, dst) for draw in self.past_draws(players, years, group, before_year)
+                for src, dsts in draw.items() for dst in dsts}
+
+    def _player_ids(self, players: Iterable[Player]) -> dict[Player, int]:
+        self._load_players(players)
+        self._connection.execute("INSERT OR IGNORE INTO players (name, email) SELECT name, email FROM _loaded")
+        rows = self._connection.execute(
+            "SELECT p.id, p.name, p.email FROM players p JOIN _loaded l ON l.name = p.name AND l.email = p.email")
+        return {Player(name, email): player_id for player_id, name, email in rows}
+
+    def _fill_wanted(self, players: Iterable[Player]):
+        # Ids of the players a lookup is restricted to; unknown players have none
+        self._load_players(players)
+        self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS _wanted (id INTEGER PRIMARY KEY)")
+        self._connection.execute("DELETE FROM _wanted")
+        self._connection.execute(
+            "INSERT OR IGNORE INTO _wanted (id) "
+            "SELECT p.id FROM players p JOIN _loaded l ON l.name = p.name AND l.email = p.email")
+
+    def _load_players(self, players: Iterable[Player]):
+        self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS _loaded (name TEXT, email TEXT)")
+        self._connection.execute("DELETE FROM _loaded")
+        self._connection.executemany("INSERT INTO _loaded (name, email) VALUES (?, ?)",
+                                     ((player.name, player.email) for player in players))
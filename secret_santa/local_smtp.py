@@ -0,0 +1,176 @@
+import os
+import shutil
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from typing import Union
+
+HAS_OPENSSL = shutil.which("openssl") is not None
+# Queued with the errors: drop the connection instead of replying
+DISCONNECT = (0, "Disconnect")
+
+
+def self_signed_certificate(directory: str, host: str = "127.0.0.1") -> tuple[str, str]:
+    """Generate a throwaway certificate for host with the openssl command,
+    valid for a day. Returns the paths of the certificate and of its key."""
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-keyout", keyfile, "-out", certfile, "-subj", "/CN=localhost",
+                    "-addext", f"subjectAltName=DNS:localhost,IP:{host}"],
+                   check=True, capture_output=True)
+    return certfile, keyfile
+
+
+@dataclass
+class ReceivedEmail:
+    mail_from: str
+    rcpt_to: list[str]
+    message: EmailMessage
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN, MAIL, RCPT,
+    DATA, RSET, NOOP and QUIT. Any credentials are accepted."""
+
+    def setup(self):
+        if (context := self.server.stand_in.ssl_context) is not None:
+            self.request = context.wrap_socket(self.request, server_side=True)
+        super().setup()
+
+    def handle(self):
+        stand_in: LocalSMTPServer = self.server.stand_in
+        mail_from, rcpt_to = None, []
+        self._reply(220, "localhost ESMTP stand-in")
+        while line := self.rfile.readline():
+            command, _, argument = line.decode("utf-8", "replace").rstrip("\r\n").partition(" ")
+            verb = command.upper()
+            if verb == "EHLO":
+                self._write(b"250-localhost\r\n250-AUTH PLAIN\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n")
+            elif verb in ("HELO", "NOOP"):
+                self._reply(250, "OK")
+            elif verb == "AUTH":
+                self._reply(235, "Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpt_to = argument, []
+                self._reply(250, "OK")
+            elif verb == "RCPT":
+                rcpt_to.append(argument)
+                self._reply(250, "OK")
+            elif verb == "DATA":
+                self._reply(354, "End data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                if (error := stand_in.next_error()) is DISCONNECT:
+                    # Hang up without a reply, as a crashing relay would
+                    return
+                elif error is not None:
+                    self._reply(*error)
+                else:
+                    stand_in.record(ReceivedEmail(mail_from, rcpt_to, BytesParser(policy=policy.default).parsebytes(data)))
+                    self._reply(250, "OK queued")
+                mail_from, rcpt_to = None, []
+            elif verb == "RSET":
+                mail_from, rcpt_to = None, []
+                self._reply(250, "OK")
+            elif verb == "QUIT":
+                self._reply(221, "Bye")
+                return
+            else:
+                self._reply(502, "Command not implemented")
+
+    def _reply(self, code: int, text: str):
+        self._write(f"{code} {text}\r\n".encode())
+
+    def _write(self, reply: bytes):
+        if latency := self.server.stand_in.latency:
+            time.sleep(latency)
+        self.wfile.write(reply)
+
+    def _read_data(self) -> bytes:
+        lines = []
+        while (line := self.rfile.readline()) not in (b".\r\n", b".\n", b""):
+            # Undo dot-stuffing
+            lines.append(line[1:] if line.startswith(b".") else line)
+        return b"".join(lines)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+@dataclass
+class LocalSMTPServer:
+    """In-process SMTP server on the loopback interface, recording every
+    delivered message. Meant for tests and benchmarks, never for real mail.
+
+    Use as a context manager, and point MailerSettings at host and port
+    with use_ssl=False, or with use_ssl=True and ssl_cafile=certfile when
+    serving TLS. TLS needs the openssl command, see HAS_OPENSSL.
+    """
+    host: str = field(default="127.0.0.1")
+    port: int = field(default=0)
+    # Implicit TLS, as SMTP_SSL expects, with a self-signed certificate
+    tls: bool = field(default=False)
+    # Seconds waited before each reply, as a distant server would
+    latency: float = field(default=0.)
+    messages: list[ReceivedEmail] = field(init=False, default_factory=list)
+    # Replies (code, text) given instead of accepting the next messages,
+    # or DISCONNECT to hang up instead
+    errors: list[tuple[int, str]] = field(init=False, default_factory=list)
+    # Certificate clients should trust when serving TLS
+    certfile: Union[str, None] = field(init=False, default=None)
+    ssl_context: Union[ssl.SSLContext, None] = field(init=False, default=None, repr=False)
+    _certificate_directory: Union[tempfile.TemporaryDirectory, None] = field(init=False, default=None, repr=False)
+    _server: Union[_ThreadingServer, None] = field(init=False, default=None, repr=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def __enter__(self) -> 'LocalSMTPServer':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        if self.tls and self.ssl_context is None:
+            self._certificate_directory = tempfile.TemporaryDirectory()
+            self.certfile, keyfile = self_signed_certificate(self._certificate_directory.name, self.host)
+            self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            self.ssl_context.load_cert_chain(self.certfile, keyfile)
+        self._server = _ThreadingServer((self.host, self.port), _SMTPHandler)
+        self._server.stand_in = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._certificate_directory is not None:
+            self._certificate_directory.cleanup()
+            self._certificate_directory = None
+            self.certfile = self.ssl_context = None
+
+    def fail_next(self, code: int, text: str = "Try again later", count: int = 1):
+        with self._lock:
+            self.errors.extend([(code, text)] * count)
+
+    def disconnect_next(self, count: int = 1):
+        with self._lock:
+            self.errors.extend([DISCONNECT] * count)
+
+    def next_error(self) -> Union[tuple[int, str], None]:
+        with self._lock:
+            return self.errors.pop(0) if self.errors else None
+
+    def record(self, email: ReceivedEmail):
+        with self._lock:
+            self.messages.append(email)
@@ -1,8 +1,12 @@
 import smtplib
-from dataclasses import dataclass
+import ssl
+from dataclasses import dataclass, field
+from datetime import datetime
+from email import policy
 from email.message import EmailMessage
 from email.utils import localtime
-from email.headerregistry import Address
+from email.headerregistry import Address, BaseHeader
+from typing import Any, Callable, Iterable, Union
 
 
 @dataclass
@@ -11,30 +15,132 @@ class Contact:
     email: str
 
 
+@dataclass
+class OutgoingEmail:
+    dst: Contact
+    sender: Contact
+    subject: str
+    body: str
+
+
 @dataclass
 class MailerSettings:
     server_fqdn: str
     server_port: int
     login: str
     password: str
+    # Reconnect after this many messages, as relays often cap them per session
+    max_messages_per_connection: int = field(default=100)
+    # Plain SMTP is only meant for local test servers
+    use_ssl: bool = field(default=True)
+    # Certificates to trust instead of the system ones, e.g. a test server's
+    ssl_cafile: Union[str, None] = field(default=None)
 
 @dataclass
-class Mailer:
-    settings: MailerSettings
+class MessageRenderer:
+    """Builds the EmailMessage of each email.
 
-    @classmethod
-    def __generate_msg(cls, dst: Contact, sender: Contact, subject: str, body: str) -> str:
-        sender_username, sender_domain = sender.email.split('@')
+    Parsing headers is most of the cost of building a message, so headers
+    shared between messages, sender and subject, are parsed once and
+    reused, as is the date if one is given for the whole batch. So are the
+    content headers of short-lined ASCII bodies, which set_content would
+    otherwise work out again for each message.
+    """
+    # Date of every message, defaults to the time each one is rendered
+    date: Union[datetime, None] = field(default=None)
+    _headers: dict[tuple[str, ...], BaseHeader] = field(init=False, default_factory=dict, repr=False)
+    # Content headers of short-lined ASCII bodies
+    _text_headers: list[BaseHeader] = field(init=False, default_factory=list, repr=False)
+
+    def render(self, dst: Contact, sender: Contact, subject: str, body: str) -> EmailMessage:
         email = EmailMessage()
-        email["Subject"] = subject
-        email["Date"] = localtime()
-        email["From"] = Address(sender.name, sender_username, sender_domain)
+        email["Subject"] = self._shared_header(("Subject", subject), lambda: subject)
+        email["Date"] = self._shared_header(("Date",), lambda: self.date) if self.date else localtime()
+        email["From"] = self._shared_header(("From", sender.name, sender.email), lambda: self._address(sender))
         email["To"] = f"{dst.name} <{dst.email}>"
-        email.set_content(body)
+        self._set_content(email, body)
         return email
 
+    def render_all(self, emails: Iterable[OutgoingEmail]) -> list[EmailMessage]:
+        return [self.render(email.dst, email.sender, email.subject, email.body) for email in emails]
+
+    def _set_content(self, email: EmailMessage, body: str):
+        try:
+            lines = body.encode("ascii").splitlines()
+        except UnicodeEncodeError:
+            lines = None
+        if lines is None or max((len(line) for line in lines), default=0) > policy.default.max_line_length:
+            email.set_content(body)
+            return
+        # What set_content does for such bodies: 7bit, with normalized line ends
+        if not self._text_headers:
+            probe = EmailMessage()
+            probe.set_content("")
+            self._text_headers = [policy.default.header_factory(name, value) for name, value in probe.items()]
+        for header in self._text_headers:
+            email[header.name] = header
+        email.set_payload(b"\n".join(lines).decode("ascii") + "\n")
+
+    def _shared_header(self, key: tuple[str, ...], value: Callable[[], Any]) -> BaseHeader:
+        if (header := self._headers.get(key)) is None:
+            header = self._headers[key] = policy.default.header_factory(key[0], value())
+        return header
+
+    @staticmethod
+    def _address(contact: Contact) -> Address:
+        username, domain = contact.email.split('@')
+        return Address(contact.name, username, domain)
+
+
+@dataclass
+class Mailer:
+    """Sends emails over one authenticated SMTP connection, opened on the
+    first message and reused until closed. Use it as a context manager to
+    close the connection when done."""
+    settings: MailerSettings
+    _connection: Union[smtplib.SMTP, None] = field(init=False, default=None, repr=False)
+    _messages_on_connection: int = field(init=False, default=0, repr=False)
+    _renderer: MessageRenderer = field(init=False, default_factory=MessageRenderer, repr=False)
+
+    def __enter__(self) -> 'Mailer':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def send_email(self, dst: Contact, sender: Contact, subject: str, body: str):
-        smtp_server = smtplib.SMTP_SSL(self.settings.server_fqdn, self.settings.server_port)
+        msg = self._renderer.render(dst, sender, subject, body)
+        try:
+            self._send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The server dropped the connection: retry once on a fresh one
+            self._drop_connection()
+            self._send_message(msg)
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                pass
+            self._drop_connection()
+
+    def _send_message(self, msg: EmailMessage):
+        if self._messages_on_connection >= self.settings.max_messages_per_connection:
+            self.close()
+        if self._connection is None:
+            self._connect()
+        self._connection.send_message(msg)
+        self._messages_on_connection += 1
+
+    def _connect(self):
+        if self.settings.use_ssl and self.settings.ssl_cafile:
+            context = ssl.create_default_context(cafile=self.settings.ssl_cafile)
+            smtp_server = smtplib.SMTP_SSL(self.settings.server_fqdn, self.settings.server_port, context=context)
+        elif self.settings.use_ssl:
+            smtp_server = smtplib.SMTP_SSL(self.settings.server_fqdn, self.settings.server_port)
+        else:
+            smtp_server = smtplib.SMTP(self.settings.server_fqdn, self.settings.server_port)
         smtp_server.ehlo()
         #smtp_server.starttls()
         #print("SSL started")
@@ -42,7 +148,11 @@ class Mailer:
         #print("Ehlo again")
         if self.settings.login:
             smtp_server.login(self.settings.login, self.settings.password)
+        self._connection = smtp_server
+        self._messages_on_connection = 0
 
-        msg = self.__generate_msg(dst, sender, subject, body)
-        smtp_server.send_message(msg)
-        smtp_server.quit()
+    def _drop_connection(self):
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self._messages_on_connection = 0
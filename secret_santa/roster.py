@@ -0,0 +1,132 @@
+import json
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.player import Player
+
+
+class RosterError(ValueError):
+    """Raised when an input file does not describe a valid roster."""
+    pass
+
+
+@dataclass
+class Roster:
+    players: set[Player]
+    incompatibilities: set[Incompatibility] = field(default_factory=set)
+    groups: list[set[Player]] = field(default_factory=list)
+    gift_number: int = field(default=1)
+
+
+@dataclass
+class _RosterBuilder:
+    """Collects records one at a time. Constraints naming players not seen
+    yet are kept as names and resolved once every record has been read."""
+    roster: Roster = field(default_factory=lambda: Roster(set()))
+    players_by_name: dict[str, Player] = field(default_factory=dict)
+    pending: list[tuple[str, list[str], str]] = field(default_factory=list)
+
+    def add_player(self, record: dict, location: str):
+        try:
+            player = Player(name=record["name"], email=record["email"])
+        except (KeyError, TypeError):
+            raise RosterError(f"{location}: a player needs a name and an email")
+        if player.name in self.players_by_name:
+            raise RosterError(f"{location}: player '{player.name}' is listed twice")
+        self.players_by_name[player.name] = player
+        self.roster.players.add(player)
+
+    def add_incompatibility(self, record: dict, location: str):
+        try:
+            names = [record["fst"], record["snd"]]
+        except (KeyError, TypeError):
+            raise RosterError(f"{location}: an incompatibility needs fst and snd")
+        if names[0] == names[1]:
+            raise RosterError(f"{location}: '{names[0]}' cannot be incompatible with themselves")
+        self._add_constraint("incompatibility", names, location)
+
+    def add_group(self, names: Iterable[str], location: str):
+        if isinstance(names, str):
+            raise RosterError(f"{location}: a group must be a list of player names")
+        self._add_constraint("group", list(names), location)
+
+    def _add_constraint(self, kind: str, names: list[str], location: str):
+        if all(name in self.players_by_name for name in names):
+            self._resolve(kind, names)
+        else:
+            self.pending.append((kind, names, location))
+
+    def _resolve(self, kind: str, names: list[str]):
+        players = [self.players_by_name[name] for name in names]
+        if kind == "incompatibility":
+            self.roster.incompatibilities.add(Incompatibility(*players))
+        else:
+            self.roster.groups.append(set(players))
+
+    def build(self) -> Roster:
+        unknown = [f"{location}: unknown player '{name}' in {kind}"
+                   for kind, names, location in self.pending
+                   for name in names if name not in self.players_by_name]
+        if unknown:
+            raise RosterError("\n".join(unknown))
+        for kind, names, _ in self.pending:
+            self._resolve(kind, names)
+        self.pending.clear()
+        return self.roster
+
+
+def load_roster(input_file: str) -> Roster:
+    if input_file.endswith(".jsonl"):
+        return load_jsonl_roster(input_file)
+
+    with open(input_file) as f:
+        input_data = json.load(f)
+
+    builder = _RosterBuilder()
+    for i, record in enumerate(input_data.get("players", [])):
+        builder.add_player(record, f"{input_file}: players[{i}]")
+    for i, record in enumerate(input_data.get("incompatibilities", [])):
+        builder.add_incompatibility(record, f"{input_file}: incompatibilities[{i}]")
+    for i, names in enumerate(input_data.get("groups", [])):
+        builder.add_group(names, f"{input_file}: groups[{i}]")
+    builder.roster.gift_number = input_data.get("giftNumber", 1)
+    return builder.build()
+
+
+def load_jsonl_roster(input_file: str) -> Roster:
+    """Read a JSON Lines roster, one record per line:
+
+        {"type": "settings", "giftNumber": 2}
+        {"type": "player", "name": "Player1", "email": "player1@example.com"}
+        {"type": "incompatibility", "fst": "Player1", "snd": "Player2"}
+        {"type": "group", "members": ["Player3", "Player4", "Player5"]}
+
+    Lines are parsed one at a time, so only the roster itself is kept in
+    memory, never the whole document. Blank lines are skipped.
+    """
+    builder = _RosterBuilder()
+    with open(input_file) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            location = f"{input_file}:{line_number}"
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise RosterError(f"{location}: invalid JSON ({e.msg})")
+            if not isinstance(record, dict):
+                raise RosterError(f"{location}: expected a JSON object")
+
+            record_type = record.get("type")
+            if record_type == "player":
+                builder.add_player(record, location)
+            elif record_type == "incompatibility":
+                builder.add_incompatibility(record, location)
+            elif record_type == "group":
+                builder.add_group(record.get("members", []), location)
+            elif record_type == "settings":
+                builder.roster.gift_number = record.get("giftNumber", builder.roster.gift_number)
+            else:
+                raise RosterError(f"{location}: unknown record type {record_type!r}")
+    return builder.build()
@@ -0,0 +1,135 @@
+"""Dense draws on NumPy arrays, for large groups where almost every pair of
+players is allowed. Players are numbered by their position in a list, and
+the allowed gifter -> giftee pairs are an n x n boolean mask; gifts are
+kept as two index arrays, sources and targets.
+
+NumPy is optional: check HAS_NUMPY before calling anything here.
+"""
+from random import randrange, sample
+from typing import Iterable, Sequence
+
+from .exclusion_groups import ExclusionGroups
+from .incompatibility import Incompatibility
+from .player import Player
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def allowed_mask(
+        players: list[Player],
+        incompatibilities: Iterable[Incompatibility],
+        exclusions: ExclusionGroups
+) -> 'np.ndarray':
+    """mask[i, j] is True when players[i] may give to players[j]."""
+    index = {player: i for i, player in enumerate(players)}
+    mask = np.ones((len(players), len(players)), dtype=bool)
+    np.fill_diagonal(mask, False)
+    pairs = np.array([(index[incompatibility.fst], index[incompatibility.snd])
+                      for incompatibility in incompatibilities
+                      if incompatibility.fst in index and incompatibility.snd in index],
+                     dtype=np.intp).reshape(-1, 2)
+    mask[pairs[:, 0], pairs[:, 1]] = False
+    mask[pairs[:, 1], pairs[:, 0]] = False
+    for group in exclusions.groups:
+        members = np.array([index[player] for player in group if player in index], dtype=np.intp)
+        mask[np.ix_(members, members)] = False
+    return mask
+
+
+def circulant_gifts(mask: 'np.ndarray', number_of_gifts: int) -> tuple['np.ndarray', 'np.ndarray']:
+    """Warm start: in a random order, every player gives to the
+    number_of_gifts players following them, wrapping around. This has no
+    2-cycles as long as there are more than 2 * number_of_gifts players.
+    Gifts the mask forbids are dropped."""
+    player_count = len(mask)
+    order = np.array(sample(range(player_count), player_count), dtype=np.intp)
+    positions = np.repeat(np.arange(player_count), number_of_gifts)
+    shifts = np.tile(np.arange(1, number_of_gifts + 1), player_count)
+    sources = order[positions]
+    targets = order[(positions + shifts) % player_count]
+    allowed = mask[sources, targets]
+    return sources[allowed], targets[allowed]
+
+
+def complete_gifts(
+        mask: 'np.ndarray',
+        sources: 'np.ndarray',
+        targets: 'np.ndarray',
+        number_of_gifts: int,
+        allow_2cycles: bool
+) -> tuple['np.ndarray', 'np.ndarray', list[tuple[int, int]]]:
+    """Pair the gifters missing a gift with the giftees missing one, at
+    random. A pair g, h is given g -> h directly when allowed, or else a
+    random gift a -> b, picked among all gifts at once, is rerouted into
+    g -> b and a -> h.
+
+    Returns the gifts and the pairs neither move could place, which need a
+    longer alternating path.
+    """
+    player_count = len(mask)
+    assigned = np.zeros((player_count, player_count), dtype=bool)
+    assigned[sources, targets] = True
+    gift_sources = np.empty(player_count * number_of_gifts, dtype=np.intp)
+    gift_targets = np.empty(player_count * number_of_gifts, dtype=np.intp)
+    gift_count = len(sources)
+    gift_sources[:gift_count] = sources
+    gift_targets[:gift_count] = targets
+
+    players = np.arange(player_count)
+    gifters = np.repeat(players, number_of_gifts - np.bincount(sources, minlength=player_count)).tolist()
+    giftees = np.repeat(players, number_of_gifts - np.bincount(targets, minlength=player_count)).tolist()
+    giftees = sample(giftees, len(giftees))
+
+    leftover = []
+    for gifter, giftee in zip(gifters, giftees):
+        if not (mask[gifter, giftee] and not assigned[gifter, giftee]
+                and (allow_2cycles or not assigned[giftee, gifter])):
+            current_sources, current_targets = gift_sources[:gift_count], gift_targets[:gift_count]
+            candidates = mask[gifter, current_targets] & ~assigned[gifter, current_targets] \
+                & mask[current_sources, giftee] & ~assigned[current_sources, giftee]
+            if not allow_2cycles:
+                candidates &= ~assigned[current_targets, gifter] & ~assigned[giftee, current_sources]
+            choices = np.flatnonzero(candidates)
+            if len(choices) == 0:
+                leftover.append((gifter, giftee))
+                continue
+            gift = int(choices[randrange(len(choices))])
+            src, dst = int(gift_sources[gift]), int(gift_targets[gift])
+            assigned[src, dst] = False
+            assigned[src, giftee] = True
+            gift_targets[gift] = giftee
+            giftee = dst
+        assigned[gifter, giftee] = True
+        gift_sources[gift_count] = gifter
+        gift_targets[gift_count] = giftee
+        gift_count += 1
+    return gift_sources[:gift_count], gift_targets[:gift_count], leftover
+
+
+def is_valid_assignment(
+        mask: 'np.ndarray',
+        sources: Sequence[int],
+        targets: Sequence[int],
+        number_of_gifts: int,
+        allow_2cycles: bool
+) -> bool:
+    """Vectorized check of the gifts sources[i] -> targets[i]: all allowed,
+    number_of_gifts given and received by everyone, no duplicates and, if
+    asked, no 2-cycles."""
+    player_count = len(mask)
+    sources = np.asarray(sources, dtype=np.intp)
+    targets = np.asarray(targets, dtype=np.intp)
+    if len(sources) != player_count * number_of_gifts or not mask[sources, targets].all():
+        return False
+    if (np.bincount(sources, minlength=player_count) != number_of_gifts).any() \
+            or (np.bincount(targets, minlength=player_count) != number_of_gifts).any():
+        return False
+    keys = sources * player_count + targets
+    if len(np.unique(keys)) != len(keys):
+        return False
+    return allow_2cycles or not np.isin(targets * player_count + sources, keys).any()
@@ -0,0 +1,31 @@
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from .player import Player
+
+_NO_GROUP: frozenset[int] = frozenset()
+
+
+@dataclass(order=False)
+class ExclusionGroups:
+    """Groups of players, e.g. households or teams, who must not gift each other.
+
+    Equivalent to an incompatibility between every pair of members, but
+    checked through a player -> group ids index instead of a pairwise set.
+    """
+    groups: Iterable[Iterable[Player]] = field(default_factory=list)
+    _group_ids: dict[Player, frozenset[int]] = field(init=False, repr=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.groups = [frozenset(group) for group in self.groups]
+        group_ids: dict[Player, set[int]] = dict()
+        for group_id, group in enumerate(self.groups):
+            for player in group:
+                group_ids.setdefault(player, set()).add(group_id)
+        self._group_ids = {player: frozenset(ids) for player, ids in group_ids.items()}
+
+    def excludes(self, fst: Player, snd: Player) -> bool:
+        return not self._group_ids.get(fst, _NO_GROUP).isdisjoint(self._group_ids.get(snd, _NO_GROUP))
+
+    def groups_of(self, player: Player) -> list[frozenset[Player]]:
+        return [self.groups[group_id] for group_id in self._group_ids.get(player, _NO_GROUP)]
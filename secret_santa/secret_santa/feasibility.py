@@ -0,0 +1,84 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from .exclusion_groups import ExclusionGroups
+from .incompatibility import Incompatibility
+from .player import Player
+
+# Player lists longer than this are truncated in messages
+_MAX_LISTED_PLAYERS = 10
+
+
+@dataclass
+class FeasibilityIssue:
+    message: str
+    players: list[Player] = field(default_factory=list)
+
+
+def format_player_names(players: Iterable[Player]) -> str:
+    names = sorted(player.name for player in players)
+    if len(names) > _MAX_LISTED_PLAYERS:
+        return f'{", ".join(names[:_MAX_LISTED_PLAYERS])} and {len(names) - _MAX_LISTED_PLAYERS} more'
+    return ", ".join(names)
+
+
+def check_feasibility(
+        players: set[Player],
+        incompatibilities: set[Incompatibility],
+        exclusions: ExclusionGroups,
+        number_of_gifts: int,
+        allow_2cycles: bool
+) -> list[FeasibilityIssue]:
+    """Necessary conditions for a draw to exist, checked in time linear in
+    the size of the input. An empty result does not guarantee a draw.
+
+    - Every player needs number_of_gifts recipients and as many santas
+      among the players they are allowed to pair with; without 2-cycles
+      those must all be distinct, doubling the count.
+    - Hall's condition on each exclusion group: its members give all their
+      gifts outside of the group, which cannot receive more than
+      number_of_gifts each, so a group cannot hold more than half the
+      players.
+    """
+    issues: list[FeasibilityIssue] = []
+    player_count = len(players)
+    needed_partners = number_of_gifts if allow_2cycles else 2 * number_of_gifts
+    if player_count - 1 < needed_partners:
+        issues.append(FeasibilityIssue(
+            f"{player_count} players are not enough for {number_of_gifts} gifts each"
+            + ("" if allow_2cycles else " without 2-cycles"),
+            sorted(players, key=lambda p: p.name)))
+        return issues
+
+    partners: defaultdict[Player, set[Player]] = defaultdict(set)
+    for incompatibility in incompatibilities:
+        if incompatibility.fst in players and incompatibility.snd in players:
+            partners[incompatibility.fst].add(incompatibility.snd)
+            partners[incompatibility.snd].add(incompatibility.fst)
+
+    group_sizes = {group: len(players.intersection(group)) for group in exclusions.groups}
+    for player in players:
+        groups = exclusions.groups_of(player)
+        if not groups:
+            excluded = len(partners[player])
+        elif len(groups) == 1:
+            # Group mates and incompatible players outside of the group
+            group = groups[0]
+            excluded = group_sizes[group] - 1 + sum(1 for p in partners[player] if p not in group)
+        else:
+            excluded = len(players.intersection(partners[player].union(*groups))) - 1
+        allowed = player_count - 1 - excluded
+        if allowed < needed_partners:
+            issues.append(FeasibilityIssue(
+                f"{player.name} can only be paired with {allowed} players but needs {needed_partners}",
+                [player]))
+
+    for group, size in group_sizes.items():
+        if 2 * size > player_count:
+            members = players.intersection(group)
+            issues.append(FeasibilityIssue(
+                f"Group of {format_player_names(members)} holds {size} of {player_count} players, "
+                f"too many to all give their gifts outside of it",
+                sorted(members, key=lambda p: p.name)))
+    return issues
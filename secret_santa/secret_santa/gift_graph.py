@@ -1,22 +1,56 @@
-from collections import defaultdict
+from array import array
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 import itertools
 from dataclasses import dataclass, field, InitVar
+from multiprocessing.context import BaseContext
 from itertools import product
-from typing import Tuple
-from random import randbytes, shuffle
+from typing import Iterable, Iterator, Mapping, Tuple, Union
+from random import randbytes, randrange, shuffle
 from .player import Player
-from .incompatibility import Incompatibility
-from secret_santa.flow_graph.flow_graph import FlowGraph, FlowEdge
+from .incompatibility import Incompatibility, pair_key
+from .exclusion_groups import ExclusionGroups
+from .feasibility import check_feasibility, format_player_names
+from .sampler import AssignmentSampler, DEFAULT_SWEEPS
+from .single_cycle import find_single_cycle, cycle_assignments
+from .dense import HAS_NUMPY, allowed_mask, circulant_gifts, complete_gifts, is_valid_assignment
+from .sharding import merge_failed_shards, partition_players, seed_worker, shard_constraints
+from .verifier import InvalidAssignmentError, VerificationReport, verify_assignments
+from secret_santa.flow_graph.flow_graph import FlowGraph, FlowEdge, FlowAlgorithm, Flow
+from secret_santa.flow_graph.compact_flow_graph import CompactFlowGraph
+from secret_santa.stats import SolverStats, measure
 
 _Edge = Tuple[Player, Player]
 
+# Node ids of the compact flow graph: gifter i is _COMPACT_OFFSET + i and
+# giftee i is _COMPACT_OFFSET + n + i
+_COMPACT_SOURCE = 0
+_COMPACT_SINK = 1
+_COMPACT_OFFSET = 2
+
+# Move budget of the single cycle heuristic, per player and attempt
+_CYCLE_MOVES_PER_PLAYER = 4
+
+# Attempts in a row without a cheaper draw after which a pair cost draw
+# settles for the cheapest one found
+_COST_PATIENCE = 1
+
 
 class GiftAssignmentError(Exception):
     """Raised when a valid gift assignment cannot be found."""
     pass
 
 
+class InfeasibleAssignmentError(GiftAssignmentError):
+    """Raised when the constraints make any assignment impossible."""
+
+    def __init__(self, message: str, players: Iterable[Player] = ()):
+        super().__init__(message)
+        # Players whose constraints cause the problem
+        self.players = list(players)
+
+
 class _PlayerDirection(Enum):
     GIFTER = 0
     GIFTEE = 1
@@ -38,29 +72,448 @@ class NGiftGraph:
     number_of_gifts: int = field(default=1)
     allow_2cycles: bool = field(default=True)
     max_attempts: int = field(default=3)
+    flow_algorithm: FlowAlgorithm = field(default=FlowAlgorithm.DINIC)
+    # Solve on an integer-indexed CSR graph instead of a dict of players
+    compact: bool = field(default=False)
+    # Households or teams whose members must not gift each other
+    groups: list[set[Player]] = field(default_factory=list)
+    # Opt-in per-phase counters and timers, shared with the flow graph
+    stats: Union[SolverStats, None] = field(default=None)
+    # Markov chain steps run on every new draw, see resample
+    mixing_steps: int = field(default=0)
+    # Draw one loop through every player instead of any union of cycles
+    single_cycle: bool = field(default=False)
+    # Solve on NumPy arrays when NumPy is installed, see dense.py
+    dense: bool = field(default=False)
+    # Soft preferences: cost of each gifter -> giftee pair, e.g. past
+    # pairings. Draws then have the lowest total cost, see repeat_costs
+    pair_costs: dict[_Edge, int] = field(default_factory=dict)
+    # Solve random shards of about this many players each, in parallel,
+    # instead of the whole group at once, see _solve_sharded. Gifts only
+    # cross shards through mixing_steps
+    shard_size: int = field(default=0)
+    # Worker processes for the shards, None for one per CPU
+    shard_processes: Union[int, None] = field(default=None)
+    # A previous draw for the same input, e.g. from AssignmentCache. Kept
+    # if it is still valid, otherwise a new draw is solved.
+    initial_assignments: InitVar[Union[Mapping[Player, Iterable[Player]], None]] = None
     assignments: defaultdict[Player, set[Player]] = field(init=False)
-    flow_graph: FlowGraph = field(init=False)
-
-    def __post_init__(self):
-        is_correct_flow = False
-        attempts = 0
-        while not is_correct_flow and attempts < self.max_attempts:
-            attempts += 1
+    # Number of full solves and of local 2-cycle repairs the draw needed
+    attempts: int = field(init=False, default=0)
+    repairs: int = field(init=False, default=0)
+    flow_graph: Union[FlowGraph, CompactFlowGraph, None] = field(init=False, default=None)
+    _compact_players: list[Player] = field(init=False, repr=False, default_factory=list)
+    _exclusions: ExclusionGroups = field(init=False, repr=False)
+    # pair_key of every incompatibility, checked on each candidate pair
+    _incompatible_keys: set[int] = field(init=False, repr=False, default_factory=set)
+    # Set once incremental updates made flow_graph outdated
+    _stale_flow_graph: bool = field(init=False, repr=False, default=False)
+    # Gift order of the loop in single_cycle mode
+    _cycle: list[Player] = field(init=False, repr=False, default_factory=list)
+
+    def __post_init__(self, initial_assignments: Union[Mapping[Player, Iterable[Player]], None]):
+        # Own copies, as incremental updates change them
+        self.players = set(self.players)
+        self.incompatibilities = set(self.incompatibilities)
+        self._incompatible_keys = {incompatibility.key for incompatibility in self.incompatibilities}
+        self._exclusions = ExclusionGroups(self.groups)
+        if self.single_cycle and self.number_of_gifts != 1:
+            raise ValueError("A single cycle gives exactly one gift per player")
+        if self.single_cycle and self.mixing_steps:
+            raise ValueError("Resampling does not keep a single cycle")
+        if self.single_cycle and self.dense:
+            raise ValueError("Single cycle draws have their own solver and cannot be dense")
+        if self.pair_costs and (self.compact or self.dense or self.single_cycle or self.mixing_steps):
+            raise ValueError("pair_costs are only minimized on the dict flow graph, without resampling")
+        if self.shard_size and (self.single_cycle or self.pair_costs):
+            raise ValueError("Sharded draws cannot be single cycles or minimize pair_costs across shards")
+        self._check_feasibility()
+        if initial_assignments is None or not self._reuse_assignments(initial_assignments):
+            self._solve(reuse_flow_graph=False)
+
+    def __getstate__(self) -> dict:
+        # pair_key packs Player.id, which differs from one process to the
+        # next: keys are rebuilt from the unpickled incompatibilities
+        state = self.__dict__.copy()
+        del state["_incompatible_keys"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._incompatible_keys = {incompatibility.key for incompatibility in self.incompatibilities}
+
+    def _reuse_assignments(self, assignments: Mapping[Player, Iterable[Player]]) -> bool:
+        self.assignments = defaultdict(set, {src: set(dsts) for src, dsts in assignments.items()})
+        if not self.assignment_report().ok:
             self.assignments = defaultdict(set)
-            flow_graph = self._build_flow_graph()
-            flow = flow_graph.compute_largest_flow()
+            return False
+        if self.single_cycle:
+            self._cycle = self._loop_from(next(iter(self.players)))
+        if self.stats is not None:
+            self.stats.increment("reused_assignments")
+        return True
+
+    def redraw(self):
+        """Replace the assignments with a new random draw, reusing the flow graph built for the previous one."""
+        self.attempts = 0
+        self.repairs = 0
+        self._solve(reuse_flow_graph=not self._stale_flow_graph)
+
+    def generate_many(
+            self,
+            n_draws: int,
+            processes: Union[int, None] = None,
+            mp_context: Union[BaseContext, None] = None
+    ) -> Iterator[dict[Player, set[Player]]]:
+        """Yield n_draws independent assignments for the same players.
+
+        The flow graph is built once and only reset between draws. With
+        processes, draws are spread over a pool of worker processes, each
+        receiving a copy of this graph once, started by mp_context if
+        given; otherwise they are drawn in turn on this instance, which
+        keeps the last one.
+        """
+        if not processes or processes <= 1:
+            for _ in range(n_draws):
+                self.redraw()
+                yield self._snapshot_assignments()
+            return
+
+        with ProcessPoolExecutor(processes, mp_context, initializer=_init_draw_worker, initargs=(self,)) as executor:
+            yield from executor.map(_draw_in_worker, range(n_draws), chunksize=max(1, n_draws // (4 * processes)))
+
+    def _solve(self, reuse_flow_graph: bool):
+        if self.single_cycle:
+            self._solve_single_cycle()
+            return
+        if self.shard_size:
+            self._solve_sharded()
+            if self.mixing_steps:
+                # Also mixes gifts across shards
+                self.resample(self.mixing_steps)
+            return
+        # The dense path gives up on draws it cannot complete quickly: the
+        # flow solver below then finds them, or explains why there are none
+        if self.dense and HAS_NUMPY and self._solve_dense():
+            if self.mixing_steps:
+                self.resample(self.mixing_steps)
+            return
+        is_correct_flow = False
+        cheapest: Union[tuple[int, defaultdict[Player, set[Player]]], None] = None
+        stale_attempts = 0
+        # A dense attempt does not count against max_attempts, so the flow
+        # solver always gets to run
+        flow_attempts = 0
+        while not is_correct_flow and flow_attempts < self.max_attempts:
+            flow_attempts += 1
+            self.attempts += 1
+            with measure(self.stats, "build_flow_graph"):
+                if reuse_flow_graph and self.flow_graph is not None:
+                    self.flow_graph.reset()
+                elif self.compact:
+                    self.flow_graph = self._build_compact_flow_graph()
+                else:
+                    self.flow_graph = self._build_flow_graph()
+            self._stale_flow_graph = False
+            self.flow_graph.stats = self.stats
+            flow = self.flow_graph.compute_largest_flow()
+            with measure(self.stats, "extract_assignments"):
+                if self.compact:
+                    self.assignments = self._compact_flow_to_assignments(flow)
+                else:
+                    self.assignments = self._flow_to_assignments(flow)
+            # A short max flow is short on every attempt, and explained
+            # before 2-cycle repairs, which cannot add gifts, are tried
+            assigned = sum(len(dsts) for dsts in self.assignments.values())
+            if assigned < len(self.players) * self.number_of_gifts:
+                raise self._explain_shortfall(assigned)
+            # Retry from scratch only when 2-cycles cannot be repaired locally
+            repairs = self.repairs
+            with measure(self.stats, "repair_2cycles"):
+                is_correct_flow = self.allow_2cycles or self._repair_2cycles()
+            if is_correct_flow and self.pair_costs:
+                # Repairs may cost more than the flow's optimum, which the
+                # best 2-cycle free draw may never reach: keep the cheapest
+                # draw, and stop at one matching the optimum or once
+                # _COST_PATIENCE attempts in a row brought no cheaper one
+                cost = self.assignment_cost()
+                if cheapest is None or cost < cheapest[0]:
+                    cheapest = (cost, self.assignments)
+                    stale_attempts = 0
+                else:
+                    stale_attempts += 1
+                is_correct_flow = cost == flow.cost or stale_attempts >= _COST_PATIENCE
+            if self.stats is not None:
+                self.stats.increment("attempts")
+                self.stats.increment("repairs", self.repairs - repairs)
+
+        if cheapest is not None:
+            self.assignments = cheapest[1]
             is_correct_flow = True
-            for src in flow.graph:
-                if not src == "src":
-                    for dst in flow.graph[src]:
-                        if not dst == "sink":
-                            self.assignments[src.player].add(dst.player)
-                            if not self.allow_2cycles and src.player in self.assignments[dst.player]:
-                                is_correct_flow = False
-        
+
         if not is_correct_flow:
+            if self.stats is not None:
+                self.stats.increment("failed_solves")
             raise GiftAssignmentError(f"Could not find a valid solution after {self.max_attempts} attempts")
 
+        if self.mixing_steps:
+            self.resample(self.mixing_steps)
+
+    def resample(self, steps: Union[int, None] = None):
+        """Re-randomize the assignments in place with a Markov chain of
+        constraint-preserving gift swaps, see AssignmentSampler.
+
+        Much cheaper than redraw on large groups, and closer to uniform
+        over valid draws than the flow solution, whose augmenting paths
+        favour some pairings. Defaults to DEFAULT_SWEEPS steps per gift.
+        """
+        if self.single_cycle:
+            raise ValueError("Resampling does not keep a single cycle, use redraw")
+        if steps is None:
+            steps = DEFAULT_SWEEPS * len(self.players) * self.number_of_gifts
+        with measure(self.stats, "resample"):
+            sampler = AssignmentSampler.from_assignments(self.assignments, self.number_of_gifts,
+                                                         self.allow_2cycles, self._is_invalid_pair)
+            accepted = sampler.run(steps)
+            self.assignments = sampler.assignments()
+        if self.stats is not None:
+            self.stats.increment("mixing_steps", steps)
+            self.stats.increment("mixing_moves", accepted)
+
+    def _solve_dense(self) -> bool:
+        self.attempts += 1
+        if self.stats is not None:
+            self.stats.increment("attempts")
+        with measure(self.stats, "dense_solve"):
+            players = list(self.players)
+            mask = allowed_mask(players, self.incompatibilities, self._exclusions)
+            sources, targets = circulant_gifts(mask, self.number_of_gifts)
+            sources, targets, leftover = complete_gifts(mask, sources, targets, self.number_of_gifts,
+                                                       self.allow_2cycles)
+            self.assignments = defaultdict(set, {player: set() for player in players})
+            for src, dst in zip(sources.tolist(), targets.tolist()):
+                self.assignments[players[src]].add(players[dst])
+
+            # Gifts the array moves could not place go through the usual
+            # alternating paths, then the flow solver if those fail too
+            missing = Counter(players[giftee] for _, giftee in leftover)
+            for gifter, _ in leftover:
+                giftee = self._augment(players[gifter], set(missing))
+                if giftee is None:
+                    break
+                missing[giftee] -= 1
+                if not missing[giftee]:
+                    del missing[giftee]
+            solved = not missing and (self.allow_2cycles or self._repair_2cycles())
+        if self.stats is not None:
+            self.stats.increment("dense_leftover_gifts", len(leftover))
+            if not solved:
+                self.stats.increment("dense_fallbacks")
+        return solved
+
+    def _solve_sharded(self):
+        # Players of a shard only give to each other, so valid draws of every
+        # shard make a valid draw of the group, and each shard's flow graph
+        # has shard_size² edges instead of n². Shards that fail are merged
+        # with a neighbour and solved again, up to the whole group at once.
+        shards = partition_players(self.players, self.incompatibilities, self._exclusions.groups,
+                                   max(1, round(len(self.players) / self.shard_size)))
+        solved: dict[tuple[Player, ...], dict[Player, set[Player]]] = {}
+        with measure(self.stats, "sharded_solve"):
+            while True:
+                self.attempts += 1
+                pending = [shard for shard in shards if shard not in solved]
+                options = [dict(players=set(shard), incompatibilities=incompatibilities, groups=groups,
+                                number_of_gifts=self.number_of_gifts, allow_2cycles=self.allow_2cycles,
+                                max_attempts=self.max_attempts, flow_algorithm=self.flow_algorithm,
+                                compact=self.compact, dense=self.dense)
+                           for shard, (incompatibilities, groups)
+                           in zip(pending, shard_constraints(pending, self.incompatibilities, self._exclusions.groups))]
+                failed, error = [], None
+                for shard, result in zip(pending, self._map_shards(options)):
+                    if isinstance(result, GiftAssignmentError):
+                        failed.append(shards.index(shard))
+                        error = result
+                    else:
+                        solved[shard] = result
+                if self.stats is not None:
+                    self.stats.increment("shards_solved", len(pending))
+                if not failed:
+                    break
+                if len(shards) == 1:
+                    raise error
+                shards = merge_failed_shards(shards, failed)
+                if self.stats is not None:
+                    self.stats.increment("shard_merges", len(failed))
+        self.assignments = defaultdict(set)
+        for shard in shards:
+            self.assignments.update(solved[shard])
+
+    def _map_shards(self, options: list[dict]) -> list[Union[dict[Player, set[Player]], GiftAssignmentError]]:
+        if len(options) == 1 or self.shard_processes == 1:
+            return [_solve_shard(shard_options) for shard_options in options]
+        with ProcessPoolExecutor(self.shard_processes, initializer=seed_worker) as executor:
+            return list(executor.map(_solve_shard, options))
+
+    def _solve_single_cycle(self):
+        # No flow here: a shuffled loop is repaired with 2-opt moves, and
+        # redrawn from scratch if the move budget runs out
+        with measure(self.stats, "single_cycle"):
+            while self.attempts < self.max_attempts:
+                self.attempts += 1
+                if self.stats is not None:
+                    self.stats.increment("attempts")
+                order = list(self.players)
+                shuffle(order)
+                if self._repair_cycle(order):
+                    return
+        if self.stats is not None:
+            self.stats.increment("failed_solves")
+        raise GiftAssignmentError(f"Could not find a single cycle through all players after {self.max_attempts} attempts")
+
+    def _repair_cycle(self, order: list[Player]) -> bool:
+        cycle = find_single_cycle(order, self._is_invalid_pair, _CYCLE_MOVES_PER_PLAYER * len(order))
+        if cycle is None:
+            return False
+        self._cycle = cycle
+        self.assignments = defaultdict(set, cycle_assignments(cycle))
+        return True
+
+    def _check_feasibility(self):
+        # A loop of 3 players or more has no 2-cycles
+        issues = check_feasibility(self.players, self.incompatibilities, self._exclusions,
+                                   self.number_of_gifts, self.allow_2cycles and not self.single_cycle)
+        if issues:
+            raise InfeasibleAssignmentError("\n".join(issue.message for issue in issues),
+                                            itertools.chain.from_iterable(issue.players for issue in issues))
+
+    def _explain_shortfall(self, assigned: int) -> InfeasibleAssignmentError:
+        # Gifters still reachable from the source after the max flow are on
+        # the source side of a minimum cut: together they are allowed to
+        # give to too few players to place all of their gifts
+        source_side = self.flow_graph.min_cut_source_side()
+        if self.compact:
+            player_count = len(self._compact_players)
+            stuck = [self._compact_players[node - _COMPACT_OFFSET] for node in source_side
+                     if _COMPACT_OFFSET <= node < _COMPACT_OFFSET + player_count]
+        else:
+            stuck = [node.player for node in source_side
+                     if isinstance(node, _DirectedPlayer) and node.direction is _PlayerDirection.GIFTER]
+        recipients = {player for player in self.players
+                      if any(not self._is_invalid_pair(gifter, player) for gifter in stuck)}
+        return InfeasibleAssignmentError(
+            f"Only {assigned} of {len(self.players) * self.number_of_gifts} gifts can be assigned: "
+            f"{format_player_names(stuck)} can only give to {format_player_names(recipients) or 'nobody'}, "
+            f"who cannot receive all of their gifts",
+            stuck)
+
+    # Incremental updates: the current assignments are kept and only the
+    # gifts affected by the change are rerouted, so most pairings stay the
+    # same. flow_graph still describes the initial solve afterwards.
+
+    def add_player(self, player: Player, incompatible_with: Iterable[Player] = ()):
+        if player in self.players:
+            raise ValueError(f"{player.name} is already in the draw")
+        new_incompatibilities = {Incompatibility(player, other) for other in incompatible_with} \
+            - self.incompatibilities
+        snapshot = self._snapshot_assignments()
+        self.players.add(player)
+        self.incompatibilities |= new_incompatibilities
+        self._incompatible_keys.update(incompatibility.key for incompatibility in new_incompatibilities)
+        self.assignments[player] = set()
+        cycle = self._cycle
+        try:
+            if self.single_cycle:
+                # Loops are only repaired around the insertion point
+                if not self._repair_cycle(self._cycle_with(randrange(len(cycle) + 1), player)):
+                    raise GiftAssignmentError(f"Could not add {player.name} to the draw")
+            else:
+                # Each path gives the new player one giftee and one gifter
+                for _ in range(self.number_of_gifts):
+                    if self._augment(player, {player}) is None:
+                        raise GiftAssignmentError(f"Could not add {player.name} to the draw")
+                self._ensure_no_2cycles()
+            self._stale_flow_graph = True
+        except GiftAssignmentError:
+            self.assignments = snapshot
+            self._cycle = cycle
+            self.players.remove(player)
+            self.incompatibilities -= new_incompatibilities
+            self._incompatible_keys.difference_update(incompatibility.key for incompatibility in new_incompatibilities)
+            raise
+
+    def remove_player(self, player: Player):
+        if player not in self.players:
+            raise ValueError(f"{player.name} is not in the draw")
+        snapshot = self._snapshot_assignments()
+        santas = [src for src, dsts in self.assignments.items() if player in dsts]
+        for santa in santas:
+            self.assignments[santa].remove(player)
+        orphans = self.assignments.pop(player, set())
+        self.players.remove(player)
+        cycle = self._cycle
+        try:
+            if self.single_cycle:
+                if not self._repair_cycle([other for other in cycle if other != player]):
+                    raise GiftAssignmentError(f"Could not remove {player.name} from the draw")
+            else:
+                for santa in santas:
+                    orphan = self._augment(santa, orphans)
+                    if orphan is None:
+                        raise GiftAssignmentError(f"Could not remove {player.name} from the draw")
+                    orphans.remove(orphan)
+                self._ensure_no_2cycles()
+            self._stale_flow_graph = True
+        except GiftAssignmentError:
+            self.assignments = snapshot
+            self.players.add(player)
+            self._cycle = cycle
+            raise
+
+    def add_incompatibility(self, incompatibility: Incompatibility):
+        if incompatibility in self.incompatibilities:
+            return
+        snapshot = self._snapshot_assignments()
+        self.incompatibilities.add(incompatibility)
+        self._incompatible_keys.add(incompatibility.key)
+        cycle = self._cycle
+        try:
+            if self.single_cycle:
+                if not self._repair_cycle(cycle):
+                    raise GiftAssignmentError(
+                        f"Could not separate {incompatibility.fst.name} and {incompatibility.snd.name}")
+            else:
+                for (src, dst) in ((incompatibility.fst, incompatibility.snd), (incompatibility.snd, incompatibility.fst)):
+                    if dst in self.assignments.get(src, ()):
+                        self.assignments[src].remove(dst)
+                        if self._augment(src, {dst}) is None:
+                            raise GiftAssignmentError(f"Could not separate {src.name} and {dst.name}")
+                self._ensure_no_2cycles()
+            self._stale_flow_graph = True
+        except GiftAssignmentError:
+            self.assignments = snapshot
+            self.incompatibilities.remove(incompatibility)
+            self._incompatible_keys.remove(incompatibility.key)
+            self._cycle = cycle
+            raise
+
+    def remove_incompatibility(self, incompatibility: Incompatibility):
+        # Relaxing a constraint keeps the current assignments valid
+        if incompatibility in self.incompatibilities:
+            self.incompatibilities.remove(incompatibility)
+            self._incompatible_keys.remove(incompatibility.key)
+            self._stale_flow_graph = True
+
+    def _cycle_with(self, position: int, player: Player) -> list[Player]:
+        return self._cycle[:position] + [player] + self._cycle[position:]
+
+    def _snapshot_assignments(self) -> defaultdict[Player, set[Player]]:
+        return defaultdict(set, {src: set(dsts) for src, dsts in self.assignments.items()})
+
+    def _ensure_no_2cycles(self):
+        if not self.allow_2cycles and not self._repair_2cycles():
+            raise GiftAssignmentError("Could not remove 2-cycles from the draw")
+
     def _build_flow_graph(self) -> FlowGraph:
         graph_source = "src"
         graph_sink = "sink"
@@ -83,25 +536,231 @@ class NGiftGraph:
         for (src, dst) in product(gifters, giftees):
             if not self._is_invalid_edge(src, dst):
                 flow_edges.append(
-                    FlowEdge(src, dst, 1)
+                    FlowEdge(src, dst, 1, self._pair_cost(src.player, dst.player))
                 )
-        return FlowGraph(flow_edges, graph_source, graph_sink)
+        algorithm = FlowAlgorithm.MIN_COST if self.pair_costs else self.flow_algorithm
+        return FlowGraph(flow_edges, graph_source, graph_sink, algorithm)
+
+    def _build_compact_flow_graph(self) -> CompactFlowGraph:
+        self._compact_players = list(self.players)
+        shuffle(self._compact_players)
+        player_count = len(self._compact_players)
+        giftee_offset = _COMPACT_OFFSET + player_count
+        sources, targets, capacities = array('i'), array('i'), array('i')
+
+        for i in range(player_count):
+            # Edges source -> gifter
+            sources.append(_COMPACT_SOURCE)
+            targets.append(_COMPACT_OFFSET + i)
+            capacities.append(self.number_of_gifts)
+            # Edges giftee -> sink
+            sources.append(giftee_offset + i)
+            targets.append(_COMPACT_SINK)
+            capacities.append(self.number_of_gifts)
+
+        # Edges gifter -> giftee, starting each gifter at a random giftee
+        for i, gifter in enumerate(self._compact_players):
+            start = randrange(player_count)
+            for j in itertools.chain(range(start, player_count), range(start)):
+                if not self._is_invalid_pair(gifter, self._compact_players[j]):
+                    sources.append(_COMPACT_OFFSET + i)
+                    targets.append(giftee_offset + j)
+                    capacities.append(1)
+
+        return CompactFlowGraph.from_edges(
+            giftee_offset + player_count, sources, targets, capacities, _COMPACT_SOURCE, _COMPACT_SINK)
+
+    def _flow_to_assignments(self, flow: Flow) -> defaultdict[Player, set[Player]]:
+        assignments: defaultdict[Player, set[Player]] = defaultdict(set)
+        for src in flow.graph:
+            if not src == "src":
+                for dst in flow.graph[src]:
+                    if not dst == "sink":
+                        assignments[src.player].add(dst.player)
+        return assignments
+
+    def _compact_flow_to_assignments(self, flow: Flow) -> defaultdict[Player, set[Player]]:
+        # Player objects are only looked up here, once the flow is known
+        assignments: defaultdict[Player, set[Player]] = defaultdict(set)
+        giftee_offset = _COMPACT_OFFSET + len(self._compact_players)
+        for src, dsts in flow.graph.items():
+            if _COMPACT_OFFSET <= src < giftee_offset:
+                for dst in dsts:
+                    assignments[self._compact_players[src - _COMPACT_OFFSET]] \
+                        .add(self._compact_players[dst - giftee_offset])
+        return assignments
+
+    def _2cycle_edges(self) -> list[_Edge]:
+        return [(src, dst) for src, dsts in self.assignments.items() for dst in dsts
+                if src in self.assignments.get(dst, ())]
+
+    def _repair_2cycles(self) -> bool:
+        # Rerouting along longer paths may create new 2-cycles, so repeat
+        # a bounded number of rounds
+        for _ in range(len(self.players) + 1):
+            cycle_edges = self._2cycle_edges()
+            if not cycle_edges:
+                return True
+            edges = [(src, dst) for src, dsts in self.assignments.items() for dst in dsts]
+            edge_positions = {edge: position for position, edge in enumerate(edges)}
+            for (src, dst) in cycle_edges:
+                # Skip cycles already broken by an earlier repair
+                if dst not in self.assignments[src] or src not in self.assignments.get(dst, ()):
+                    continue
+                if not self._swap_out_edge(src, dst, edges, edge_positions):
+                    if not self._reroute_edge(src, dst):
+                        return False
+                    edges = [(src, dst) for src, dsts in self.assignments.items() for dst in dsts]
+                    edge_positions = {edge: position for position, edge in enumerate(edges)}
+                self.repairs += 1
+        return not self._2cycle_edges()
+
+    def _swap_out_edge(self, src: Player, dst: Player, edges: list[_Edge], edge_positions: dict[_Edge, int]) -> bool:
+        # Replace src -> dst and other_src -> other_dst by src -> other_dst and
+        # other_src -> dst: an alternating 4-cycle in the residual graph, which
+        # keeps every player's gift counts unchanged
+        # With pair_costs, swaps keeping the total cost are tried first
+        start = randrange(len(edges))
+        for allow_extra_cost in ((False, True) if self.pair_costs else (True,)):
+            for position in itertools.chain(range(start, len(edges)), range(start)):
+                other_src, other_dst = edges[position]
+                if other_dst in self.assignments[src] or dst in self.assignments[other_src] \
+                        or src in self.assignments.get(other_dst, ()) or other_src in self.assignments.get(dst, ()) \
+                        or self._is_invalid_pair(src, other_dst) or self._is_invalid_pair(other_src, dst):
+                    continue
+                if not allow_extra_cost and \
+                        self._pair_cost(src, other_dst) + self._pair_cost(other_src, dst) > \
+                        self._pair_cost(src, dst) + self._pair_cost(other_src, other_dst):
+                    continue
+
+                self.assignments[src].remove(dst)
+                self.assignments[src].add(other_dst)
+                self.assignments[other_src].remove(other_dst)
+                self.assignments[other_src].add(dst)
+                src_position = edge_positions.pop((src, dst))
+                del edge_positions[(other_src, other_dst)]
+                edges[src_position] = (src, other_dst)
+                edges[position] = (other_src, dst)
+                edge_positions[(src, other_dst)] = src_position
+                edge_positions[(other_src, dst)] = position
+                return True
+        return False
+
+    def _reroute_edge(self, src: Player, dst: Player) -> bool:
+        # Drop src -> dst, then give src a new giftee and dst a new gifter
+        # along an alternating path
+        self.assignments[src].remove(dst)
+        if self._augment(src, {dst}) is None:
+            self.assignments[src].add(dst)
+            return False
+        return True
+
+    def _augment(self, gifter: Player, giftees: set[Player]) -> Union[Player, None]:
+        """Find an alternating path from a gifter missing a giftee to one of
+        the giftees missing a gifter, and flip it. Every player on the path
+        keeps their gift counts, except for both ends which gain one.
+        Returns the giftee reached, or None if there is no such path."""
+        if self.stats is not None:
+            self.stats.increment("alternating_path_searches")
+        received: defaultdict[Player, set[Player]] = defaultdict(set)
+        for src, dsts in self.assignments.items():
+            for dst in dsts:
+                received[dst].add(src)
+
+        candidates = list(self.players)
+        shuffle(candidates)
+        prev_gifter: dict[Player, Union[_Edge, None]] = {gifter: None}
+        to_visit: deque[Player] = deque([gifter])
+        while to_visit:
+            cur_gifter = to_visit.popleft()
+            for giftee in candidates:
+                if giftee in self.assignments[cur_gifter] or self._is_invalid_pair(cur_gifter, giftee) \
+                        or (not self.allow_2cycles and cur_gifter in self.assignments.get(giftee, ())):
+                    continue
+                if giftee in giftees:
+                    self.assignments[cur_gifter].add(giftee)
+                    while (prev := prev_gifter[cur_gifter]) is not None:
+                        prev_src, prev_dst = prev
+                        self.assignments[cur_gifter].remove(prev_dst)
+                        self.assignments[prev_src].add(prev_dst)
+                        cur_gifter = prev_src
+                    return giftee
+                # Someone already giving to this giftee may give it up and
+                # look for another giftee instead
+                for holder in received[giftee]:
+                    if holder not in prev_gifter:
+                        prev_gifter[holder] = (cur_gifter, giftee)
+                        to_visit.append(holder)
+        return None
+
+    def _pair_cost(self, src: Player, dst: Player) -> int:
+        return self.pair_costs.get((src, dst), 0)
+
+    def assignment_cost(self) -> int:
+        """Total pair_costs of the current assignments."""
+        return sum(self._pair_cost(src, dst) for src, dsts in self.assignments.items() for dst in dsts)
 
     def _is_invalid_edge(self, src: _DirectedPlayer, dst: _DirectedPlayer) -> bool:
-        return src.player == dst.player or \
-            Incompatibility(src.player, dst.player) in self.incompatibilities
+        return self._is_invalid_pair(src.player, dst.player)
 
-    def verify_assignments(self):
-        gifts_per_assignee: defaultdict[Player, int] = defaultdict(int)
-        for src, assignment_arr in self.assignments.items():
-            assert (len(assignment_arr) is self.number_of_gifts)  # Has right number of assignees
-            for dst in assignment_arr:
-                assert (src is not dst)  # Is not self-assigned
-                assert (Incompatibility(src, dst) not in self.incompatibilities)  # Is not incompatible
-                gifts_per_assignee[dst] += 1
+    def _is_invalid_pair(self, src: Player, dst: Player) -> bool:
+        return src is dst or pair_key(src, dst) in self._incompatible_keys or self._exclusions.excludes(src, dst)
 
-        assert (len(gifts_per_assignee) == len(self.players))  # Everyone has gifts
-        assert (set(gifts_per_assignee.values()) == {self.number_of_gifts})  # Everyone has the right number of gifts
+    def verify_assignments(self):
+        with measure(self.stats, "verify_assignments"):
+            self._verify_assignments()
+
+    def _verify_assignments(self):
+        if not (report := self.assignment_report()).ok:
+            raise InvalidAssignmentError(report)
+
+    def assignment_report(self) -> VerificationReport:
+        """Every constraint the assignments break, see verify_assignments."""
+        if self.dense and HAS_NUMPY and self._are_dense_assignments_valid():
+            return VerificationReport(len(self.players), sum(len(dsts) for dsts in self.assignments.values()))
+        return verify_assignments(self.assignments, self.players, self.incompatibilities, self.number_of_gifts,
+                                  self.allow_2cycles, self._exclusions, self.single_cycle)
+
+    def _are_dense_assignments_valid(self) -> bool:
+        # Vectorized check of valid draws; invalid ones get the full report
+        players = list(self.players)
+        index = {player: i for i, player in enumerate(players)}
+        if not all(src in index and dsts <= index.keys() for src, dsts in self.assignments.items()):
+            return False
+        sources = [index[src] for src, dsts in self.assignments.items() for _ in dsts]
+        targets = [index[dst] for dsts in self.assignments.values() for dst in dsts]
+        mask = allowed_mask(players, self.incompatibilities, self._exclusions)
+        return is_valid_assignment(mask, sources, targets, self.number_of_gifts, self.allow_2cycles)
+
+    def _loop_from(self, start: Player) -> list[Player]:
+        # Stops once longer than the draw, if start is not on a loop
+        loop = [start]
+        while (player := next(iter(self.assignments[loop[-1]]))) is not start and len(loop) <= len(self.players):
+            loop.append(player)
+        return loop
+
+
+# Graph copy owned by each generate_many worker process
+_worker_graph: Union[NGiftGraph, None] = None
+
+
+def _init_draw_worker(graph: NGiftGraph):
+    global _worker_graph
+    _worker_graph = graph
+    seed_worker()
+
+
+def _draw_in_worker(_draw_index: int) -> dict[Player, set[Player]]:
+    _worker_graph.redraw()
+    return dict(_worker_graph.assignments)
+
+
+def _solve_shard(options: dict) -> Union[dict[Player, set[Player]], GiftAssignmentError]:
+    # Failures are returned, to be told apart from crashes of the worker
+    try:
+        return dict(NGiftGraph(**options).assignments)
+    except GiftAssignmentError as e:
+        return e
 
 
 @dataclass(order=False)
@@ -1,23 +1,52 @@
-from dataclasses import InitVar, dataclass, field
+from typing import Any
+
 from .player import Player
 
+# Player ids are packed into one int per pair: low id above, high id below
+_PAIR_SHIFT = 32
+
+
+def pair_key(fst: Player, snd: Player) -> int:
+    """Order-independent int key of a pair of players, allocation-free to test
+    against a set of keys."""
+    if fst.id < snd.id:
+        return (fst.id << _PAIR_SHIFT) | snd.id
+    return (snd.id << _PAIR_SHIFT) | fst.id
+
 
-@dataclass(order=False)
 class Incompatibility:
-    fst: Player = field(init=False)
-    snd: Player = field(init=False)
-    fst_init: InitVar[Player]
-    snd_init: InitVar[Player]
+    """Two players who must not gift each other, in either direction.
 
-    def __post_init__(self, fst_init, snd_init):
+    fst is the player with the lower id. Equality and hash only use the
+    packed pair_key, computed once.
+    """
+    __slots__ = ("fst", "snd", "key")
+    fst: Player
+    snd: Player
+    key: int
+
+    def __init__(self, fst_init: Player, snd_init: Player):
         if fst_init == snd_init:
             raise RuntimeError("Should not have same players")
-        if hash(fst_init) < hash(snd_init):
+        if fst_init.id < snd_init.id:
             self.fst = fst_init
             self.snd = snd_init
         else:
             self.fst = snd_init
             self.snd = fst_init
+        self.key = pair_key(fst_init, snd_init)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Incompatibility):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __reduce__(self):
+        # Player ids, and so keys, differ from one process to the next
+        return Incompatibility, (self.fst, self.snd)
 
-    def __hash__(self):
-        return hash((self.fst, self.snd))
\ No newline at end of file
+    def __repr__(self) -> str:
+        return f"Incompatibility(fst={self.fst!r}, snd={self.snd!r})"
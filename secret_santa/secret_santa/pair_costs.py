@@ -0,0 +1,15 @@
+from typing import Iterable, Mapping, Sequence
+
+from .player import Player
+
+
+def repeat_costs(past_draws: Sequence[Mapping[Player, Iterable[Player]]]) -> dict[tuple[Player, Player], int]:
+    """NGiftGraph.pair_costs discouraging past pairings, given oldest draw
+    first. A pair drawn in the i-th of the past draws costs i + 1, summed
+    over draws, so the most recent repeats are the first to be avoided."""
+    costs: dict[tuple[Player, Player], int] = dict()
+    for age, draw in enumerate(past_draws, 1):
+        for src, dsts in draw.items():
+            for dst in dsts:
+                costs[(src, dst)] = costs.get((src, dst), 0) + age
+    return costs
@@ -1,7 +1,48 @@
-from dataclasses import dataclass
+from itertools import count
+from typing import Any
+from weakref import WeakValueDictionary
 
 
-@dataclass(order=False, frozen=True)
 class Player:
+    """Immutable player, interned on (name, email): building the same player
+    twice returns the same object, so equality is identity and the hash is
+    computed once.
+
+    Each player also gets a small integer id, unique for the lifetime of
+    the process, used to pack pairs of players into ints. Ids are not kept
+    across pickling: unpickled players are interned again on arrival.
+    """
+    __slots__ = ("name", "email", "id", "_hash", "__weakref__")
     name: str
     email: str
+    id: int
+
+    _interned: 'WeakValueDictionary[tuple[str, str], Player]' = WeakValueDictionary()
+    _ids = count()
+
+    def __new__(cls, name: str, email: str) -> 'Player':
+        key = (name, email)
+        player = cls._interned.get(key)
+        if player is None:
+            player = super().__new__(cls)
+            object.__setattr__(player, "name", name)
+            object.__setattr__(player, "email", email)
+            object.__setattr__(player, "id", next(cls._ids))
+            object.__setattr__(player, "_hash", hash(key))
+            cls._interned[key] = player
+        return player
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"cannot delete field '{name}'")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        return Player, (self.name, self.email)
+
+    def __repr__(self) -> str:
+        return f"Player(name={self.name!r}, email={self.email!r})"
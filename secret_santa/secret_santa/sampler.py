@@ -0,0 +1,118 @@
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field
+from random import random, randrange
+from typing import Callable, Mapping
+
+from .player import Player
+
+# Default chain length, in steps per assigned gift
+DEFAULT_SWEEPS = 20
+
+
+@dataclass(order=False)
+class AssignmentSampler:
+    """Markov chain over valid assignments with the same number of gifts.
+
+    Gift slot ``p * number_of_gifts + j`` holds the j-th giftee of player
+    ``p``, so every player always gives and receives number_of_gifts gifts.
+    Each step picks two or three random gifts, with equal probability, and
+    rotates their giftees:
+
+    - a swap: a -> b and c -> d become a -> d and c -> b;
+    - a 3-rotation: a -> b, c -> d and e -> f become a -> d, c -> f and
+      e -> b. Reversing a cycle a -> b -> c -> a is one, and is needed to
+      reach draws swaps alone cannot, e.g. between the 4-cycles of 4
+      players without 2-cycles.
+
+    Proposals are symmetric and any move breaking a constraint is
+    rejected, so the chain's stationary distribution is uniform over the
+    assignments it can reach from the starting one. Steps run in constant
+    time.
+    """
+    players: list[Player]
+    number_of_gifts: int
+    allow_2cycles: bool
+    is_invalid_pair: Callable[[Player, Player], bool] = field(repr=False)
+    giftees: array = field(repr=False)
+    # Gift src -> dst, keyed by src * len(players) + dst, to its slot
+    _slots: dict[int, int] = field(init=False, repr=False, default_factory=dict)
+    steps: int = field(init=False, default=0)
+    accepted: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        player_count = len(self.players)
+        for slot, dst in enumerate(self.giftees):
+            self._slots[slot // self.number_of_gifts * player_count + dst] = slot
+
+    @classmethod
+    def from_assignments(
+            cls,
+            assignments: Mapping[Player, set[Player]],
+            number_of_gifts: int,
+            allow_2cycles: bool,
+            is_invalid_pair: Callable[[Player, Player], bool]
+    ) -> 'AssignmentSampler':
+        players = list(assignments)
+        ids = {player: player_id for player_id, player in enumerate(players)}
+        giftees = array('i')
+        for player in players:
+            if len(assignments[player]) != number_of_gifts:
+                raise ValueError(f"{player.name} gives {len(assignments[player])} gifts instead of {number_of_gifts}")
+            giftees.extend(ids[dst] for dst in assignments[player])
+        return cls(players, number_of_gifts, allow_2cycles, is_invalid_pair, giftees)
+
+    def run(self, steps: int) -> int:
+        """Run steps moves of the chain, returning how many were accepted."""
+        accepted = self.accepted
+        for _ in range(steps):
+            self.step()
+        return self.accepted - accepted
+
+    def step(self) -> bool:
+        self.steps += 1
+        gift_count = len(self.giftees)
+        chosen = [randrange(gift_count) for _ in range(2 if random() < 0.5 else 3)]
+        if self._rotate(chosen):
+            self.accepted += 1
+            return True
+        return False
+
+    def assignments(self) -> defaultdict[Player, set[Player]]:
+        players, k = self.players, self.number_of_gifts
+        return defaultdict(set, {src: {players[dst] for dst in self.giftees[src_id * k:(src_id + 1) * k]}
+                                 for src_id, src in enumerate(players)})
+
+    def _rotate(self, chosen: list[int]) -> bool:
+        giftees, slots, k, n = self.giftees, self._slots, self.number_of_gifts, len(self.players)
+        if len(set(chosen)) < len(chosen):
+            return False
+        srcs = [slot // k for slot in chosen]
+        old_dsts = [giftees[slot] for slot in chosen]
+        new_dsts = old_dsts[1:] + old_dsts[:1]
+        old_keys = [src * n + dst for src, dst in zip(srcs, old_dsts)]
+        new_keys = [src * n + dst for src, dst in zip(srcs, new_dsts)]
+        # Checked against the other gifts only: the rotated ones are taken out first
+        for key in old_keys:
+            del slots[key]
+        if self._is_valid_rotation(srcs, new_dsts, new_keys):
+            for slot, dst, key in zip(chosen, new_dsts, new_keys):
+                giftees[slot] = dst
+                slots[key] = slot
+            return True
+        for slot, key in zip(chosen, old_keys):
+            slots[key] = slot
+        return False
+
+    def _is_valid_rotation(self, srcs: list[int], dsts: list[int], keys: list[int]) -> bool:
+        slots, n, players = self._slots, len(self.players), self.players
+        if len(set(keys)) < len(keys):
+            return False
+        for src, dst, key in zip(srcs, dsts, keys):
+            if src == dst or key in slots:
+                return False
+            if not self.allow_2cycles and (dst * n + src in slots or dst * n + src in keys):
+                return False
+            if self.is_invalid_pair(players[src], players[dst]):
+                return False
+        return True
@@ -0,0 +1,88 @@
+from collections import Counter
+from random import random, seed
+from typing import Iterable
+
+from .incompatibility import Incompatibility
+from .player import Player
+
+
+def seed_worker():
+    """Reseed the random generator of a pool worker process."""
+    # Forked workers inherit the parent's random state, and would all draw
+    # the same shuffles without this
+    seed()
+
+
+def partition_players(
+        players: Iterable[Player],
+        incompatibilities: Iterable[Incompatibility],
+        groups: Iterable[Iterable[Player]],
+        shard_count: int
+) -> list[tuple[Player, ...]]:
+    """Split players at random into shard_count shards whose sizes differ
+    by one at most.
+
+    Players are dealt to the shards in decreasing order of constraints,
+    incompatibilities plus group mates, going back and forth over the
+    shards, so every shard gets its share of the most constrained players
+    and the density of constraints stays about the same in each.
+    """
+    constraints: Counter[Player] = Counter()
+    for incompatibility in incompatibilities:
+        constraints[incompatibility.fst] += 1
+        constraints[incompatibility.snd] += 1
+    for group in groups:
+        group = list(group)
+        for player in group:
+            constraints[player] += len(group) - 1
+    # Random order among players with as many constraints
+    order = sorted(players, key=lambda player: (-constraints[player], random()))
+    shards: list[list[Player]] = [[] for _ in range(shard_count)]
+    for position, player in enumerate(order):
+        row, column = divmod(position, shard_count)
+        shards[column if row % 2 == 0 else shard_count - 1 - column].append(player)
+    return [tuple(shard) for shard in shards]
+
+
+def shard_constraints(
+        shards: list[tuple[Player, ...]],
+        incompatibilities: Iterable[Incompatibility],
+        groups: Iterable[Iterable[Player]]
+) -> list[tuple[set[Incompatibility], list[set[Player]]]]:
+    """The incompatibilities and groups of each shard, in one pass over
+    them: the constraints between two shards never apply, as their players
+    never give to each other."""
+    shard_of = {player: index for index, shard in enumerate(shards) for player in shard}
+    constraints = [(set(), []) for _ in shards]
+    for incompatibility in incompatibilities:
+        shard = shard_of.get(incompatibility.fst)
+        if shard is not None and shard == shard_of.get(incompatibility.snd):
+            constraints[shard][0].add(incompatibility)
+    for group in groups:
+        members: dict[int, set[Player]] = {}
+        for player in group:
+            if (shard := shard_of.get(player)) is not None:
+                members.setdefault(shard, set()).add(player)
+        for shard, shard_members in members.items():
+            if len(shard_members) > 1:
+                constraints[shard][1].append(shard_members)
+    return constraints
+
+
+def merge_failed_shards(shards: list[tuple[Player, ...]], failed: Iterable[int]) -> list[tuple[Player, ...]]:
+    """Merge every failed shard with the next one, or with the previous one
+    for the last shard. Merged shards have more room to place their gifts."""
+    failed = set(failed)
+    merged: list[tuple[Player, ...]] = []
+    index = 0
+    while index < len(shards):
+        if index in failed and index + 1 < len(shards):
+            merged.append(shards[index] + shards[index + 1])
+            index += 2
+            continue
+        if index in failed and merged:
+            merged[-1] = merged[-1] + shards[index]
+        else:
+            merged.append(shards[index])
+        index += 1
+    return merged
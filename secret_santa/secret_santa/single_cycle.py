@@ -0,0 +1,69 @@
+from random import choice, random, randrange
+from typing import Callable, Union
+
+from .player import Player
+
+# Random reversals tried per move before settling for a neutral one
+_CANDIDATES_PER_MOVE = 200
+# Probability of taking a neutral move when no improving one was found
+_NEUTRAL_MOVE_PROBABILITY = 0.5
+
+
+def find_single_cycle(
+        order: list[Player],
+        is_invalid_pair: Callable[[Player, Player], bool],
+        max_moves: int
+) -> Union[list[Player], None]:
+    """Repair order, read as the cycle order[0] -> order[1] -> ... ->
+    order[-1] -> order[0], until every gift in it is valid.
+
+    Each move takes an invalid gift at position i and reverses the players
+    between it and another random position j (2-opt), which replaces gifts
+    i and j with two new ones. Gifts inside the reversed stretch change
+    direction, so is_invalid_pair must be symmetric, as incompatibilities
+    and groups are. Moves removing invalid gifts are preferred, neutral
+    ones are taken now and then to get out of local minima.
+
+    Returns the repaired cycle, or None after max_moves moves.
+    """
+    cycle = list(order)
+    size = len(cycle)
+    if size < 2:
+        return None
+
+    def is_bad(position: int) -> bool:
+        return is_invalid_pair(cycle[position], cycle[(position + 1) % size])
+
+    bad = {position for position in range(size) if is_bad(position)}
+    moves = 0
+    while bad:
+        if moves >= max_moves:
+            return None
+        moves += 1
+        position = choice(tuple(bad))
+        neutral = None
+        for _ in range(min(size, _CANDIDATES_PER_MOVE)):
+            lo, hi = sorted((position, randrange(size)))
+            if hi - lo < 2:
+                continue
+            old_bad = (lo in bad) + (hi in bad)
+            new_bad = is_invalid_pair(cycle[lo], cycle[hi]) + is_invalid_pair(cycle[lo + 1], cycle[(hi + 1) % size])
+            if new_bad < old_bad:
+                break
+            if new_bad == old_bad and neutral is None:
+                neutral = (lo, hi)
+        else:
+            if neutral is None or random() >= _NEUTRAL_MOVE_PROBABILITY:
+                continue
+            lo, hi = neutral
+
+        # Gifts strictly inside the reversed stretch keep their validity
+        # and only move: the one at x ends up at lo + hi - x
+        bad = {lo + hi - x if lo < x < hi else x for x in bad if x != lo and x != hi}
+        cycle[lo + 1:hi + 1] = reversed(cycle[lo + 1:hi + 1])
+        bad.update(x for x in (lo, hi) if is_bad(x))
+    return cycle
+
+
+def cycle_assignments(cycle: list[Player]) -> dict[Player, set[Player]]:
+    return {src: {cycle[(position + 1) % len(cycle)]} for position, src in enumerate(cycle)}
@@ -0,0 +1,283 @@
+"""Checks a draw against its roster and reports every violation found,
+instead of stopping at the first one.
+
+All constraints are checked in a single pass over the gifts, through set
+and dict lookups keyed by player ids, so auditing tens of thousands of
+gifts takes a fraction of a second. Draws can be checked in memory or
+streamed from the logs main.py writes, one report per draw of the log.
+"""
+import json
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Mapping, Union
+
+from .exclusion_groups import ExclusionGroups
+from .feasibility import format_player_names
+from .incompatibility import _PAIR_SHIFT, Incompatibility, pair_key
+from .player import Player
+
+
+@dataclass
+class Violation:
+    # One of unreadable, unknown_player, listed_twice, self_gift, incompatible,
+    # same_group, 2cycle, gives, receives or not_single_cycle
+    kind: str
+    message: str
+    players: list[Player] = field(default_factory=list)
+    # Where the gift was read, e.g. "draw.log:12"
+    location: Union[str, None] = field(default=None)
+
+    def __str__(self) -> str:
+        return f"{self.location}: {self.message}" if self.location else self.message
+
+
+@dataclass
+class VerificationReport:
+    players: int = field(default=0)
+    gifts: int = field(default=0)
+    violations: list[Violation] = field(default_factory=list)
+    # Header of the draw in a log of several, e.g. "Draw 2"
+    draw: Union[str, None] = field(default=None)
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+    def counts(self) -> Counter[str]:
+        return Counter(violation.kind for violation in self.violations)
+
+    def format(self, max_listed: int = 20) -> str:
+        lines = [(f"{self.draw}: " if self.draw else "") + f"{self.gifts} gifts between {self.players} players: "
+                 + ("valid" if self.ok else f"{len(self.violations)} violations")]
+        lines.extend(f"- {violation}" for violation in self.violations[:max_listed])
+        if len(self.violations) > max_listed:
+            lines.append(f"- and {len(self.violations) - max_listed} more ("
+                         + ", ".join(f"{kind}: {count}" for kind, count in self.counts().most_common()) + ")")
+        return "\n".join(lines)
+
+
+class InvalidAssignmentError(Exception):
+    """Raised when a draw breaks its constraints."""
+
+    def __init__(self, report: VerificationReport):
+        super().__init__(report.format())
+        self.report = report
+
+
+@dataclass
+class _Verifier:
+    players: set[Player]
+    number_of_gifts: int
+    allow_2cycles: bool
+    single_cycle: bool
+    incompatible_keys: set[int]
+    exclusions: ExclusionGroups
+    report: VerificationReport = field(default_factory=VerificationReport)
+    # Directed gift keys, src.id above dst.id
+    _gifts: set[int] = field(default_factory=set)
+    _received: defaultdict[Player, int] = field(default_factory=lambda: defaultdict(int))
+    _giftees: dict[Player, list[Player]] = field(default_factory=dict)
+
+    def add(self, src: Player, dsts: Iterable[Player], location: Union[str, None] = None):
+        if src not in self.players:
+            self.violation("unknown_player", f"{src.name} gives gifts but is not a player", [src], location)
+            return
+        if src in self._giftees:
+            self.violation("listed_twice", f"{src.name} is listed twice", [src], location)
+            return
+        dsts = list(dsts)
+        self._giftees[src] = dsts
+        if len(dsts) != self.number_of_gifts:
+            self.violation("gives", f"{src.name} gives {len(dsts)} gifts instead of {self.number_of_gifts}",
+                           [src], location)
+        src_key = src.id << _PAIR_SHIFT
+        for dst in dsts:
+            self.report.gifts += 1
+            if dst not in self.players:
+                self.violation("unknown_player", f"{src.name} gives to {dst.name}, who is not a player",
+                               [src, dst], location)
+                continue
+            self._received[dst] += 1
+            if src is dst:
+                self.violation("self_gift", f"{src.name} gives to themselves", [src], location)
+                continue
+            if pair_key(src, dst) in self.incompatible_keys:
+                self.violation("incompatible", f"{src.name} gives to {dst.name}, who is incompatible",
+                               [src, dst], location)
+            if self.exclusions.excludes(src, dst):
+                self.violation("same_group", f"{src.name} gives to {dst.name}, of the same group",
+                               [src, dst], location)
+            # Each 2-cycle is reported once, by its second gift
+            if not self.allow_2cycles and (dst.id << _PAIR_SHIFT | src.id) in self._gifts:
+                self.violation("2cycle", f"{src.name} and {dst.name} give to each other", [dst, src], location)
+            self._gifts.add(src_key | dst.id)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._giftees and self.report.ok
+
+    def next_draw(self, name: str) -> '_Verifier':
+        """A verifier for another draw of the same roster."""
+        return _Verifier(self.players, self.number_of_gifts, self.allow_2cycles, self.single_cycle,
+                         self.incompatible_keys, self.exclusions, VerificationReport(draw=name))
+
+    def violation(self, kind: str, message: str, players: list[Player], location: Union[str, None] = None):
+        self.report.violations.append(Violation(kind, message, players, location))
+
+    def finish(self) -> VerificationReport:
+        self.report.players = len(self.players)
+        missing = [player for player in self.players if player not in self._giftees]
+        if missing:
+            self.violation("gives", f"{len(missing)} players give no gift: {format_player_names(missing)}", missing)
+        wrong_counts = defaultdict(list)
+        for player in self.players:
+            if self._received[player] != self.number_of_gifts:
+                wrong_counts[self._received[player]].append(player)
+        for count, players in sorted(wrong_counts.items()):
+            self.violation("receives", f"{len(players)} players receive {count} gifts instead of "
+                                       f"{self.number_of_gifts}: {format_player_names(players)}", players)
+        if self.single_cycle and self.players and self.report.ok:
+            self._check_single_cycle()
+        return self.report
+
+    def _check_single_cycle(self):
+        start = next(iter(self.players))
+        player, length = self._giftees[start][0], 1
+        # Bounded: a walk that does not come back to start must not spin
+        while player is not start and length <= len(self.players):
+            player, length = self._giftees[player][0], length + 1
+        if player is not start or length != len(self.players):
+            self.violation("not_single_cycle", f"The draw is not one loop: the one through {start.name} "
+                                               f"has {length} of the {len(self.players)} players", [start])
+
+
+def _verifier(
+        players: Iterable[Player],
+        incompatibilities: Iterable[Incompatibility],
+        number_of_gifts: int,
+        allow_2cycles: bool,
+        groups: Union[Iterable[Iterable[Player]], ExclusionGroups],
+        single_cycle: bool
+) -> _Verifier:
+    if single_cycle and number_of_gifts != 1:
+        # With more gifts, the loop through each player's first giftee is not the draw
+        raise ValueError("A single cycle gives exactly one gift per player")
+    exclusions = groups if isinstance(groups, ExclusionGroups) else ExclusionGroups(groups)
+    return _Verifier(set(players), number_of_gifts, allow_2cycles, single_cycle,
+                     {incompatibility.key for incompatibility in incompatibilities}, exclusions)
+
+
+def verify_assignments(
+        assignments: Mapping[Player, Iterable[Player]],
+        players: Iterable[Player],
+        incompatibilities: Iterable[Incompatibility],
+        number_of_gifts: int,
+        allow_2cycles: bool = False,
+        groups: Union[Iterable[Iterable[Player]], ExclusionGroups] = (),
+        single_cycle: bool = False
+) -> VerificationReport:
+    """Check that every player gives and receives number_of_gifts gifts,
+    to other players they are not incompatible or grouped with, without
+    2-cycles unless allowed, and in one loop if single_cycle. Raises
+    ValueError if single_cycle with more than one gift."""
+    verifier = _verifier(players, incompatibilities, number_of_gifts, allow_2cycles, groups, single_cycle)
+    for src, dsts in assignments.items():
+        verifier.add(src, dsts)
+    return verifier.finish()
+
+
+def verify_assignment_file(
+        path: str,
+        players: Iterable[Player],
+        incompatibilities: Iterable[Incompatibility],
+        number_of_gifts: int,
+        allow_2cycles: bool = False,
+        groups: Iterable[Iterable[Player]] = (),
+        single_cycle: bool = False
+) -> list[VerificationReport]:
+    """verify_assignments on the draws streamed from a log file, one santa
+    per line, either as JSON objects {"santa": name, "recipients": [names]}
+    if path ends with .jsonl, or as written by format_assignment_lines:
+    "Santa Recipient1, Recipient2 and Recipient3".
+
+    A line starting with # begins a new draw named after it, like the
+    "# Draw 2" headers of --draws logs. Returns one report per draw.
+    Raises ValueError if players share a name, as gifts are read by name,
+    or as verify_assignments.
+    """
+    verifier = _verifier(players, incompatibilities, number_of_gifts, allow_2cycles, groups, single_cycle)
+    players_by_name: dict[str, Player] = {}
+    for player in verifier.players:
+        if players_by_name.setdefault(player.name, player) is not player:
+            raise ValueError(f"Several players are named {player.name}: their gifts cannot be told apart")
+    parse = _parse_record if path.endswith(".jsonl") else _parse_line
+    reports = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if line.startswith("#"):
+                # Headers before any gift only name the draw
+                if not verifier.is_empty:
+                    reports.append(verifier.finish())
+                    verifier = verifier.next_draw(line[1:].strip())
+                else:
+                    verifier.report.draw = line[1:].strip()
+                continue
+            if not line.strip():
+                continue
+            location = f"{path}:{line_number}"
+            names = parse(line, players_by_name)
+            if names is None:
+                verifier.violation("unreadable", f"Cannot read {line!r}", [], location)
+                continue
+            santa, recipients = names
+            unknown = [name for name in (santa, *recipients) if name not in players_by_name]
+            if unknown:
+                verifier.violation("unknown_player", f"{', '.join(unknown)} are not players", [], location)
+                continue
+            verifier.add(players_by_name[santa], (players_by_name[name] for name in recipients), location)
+    reports.append(verifier.finish())
+    return reports
+
+
+def _parse_record(line: str, players_by_name: Mapping[str, Player]) -> Union[tuple[str, list[str]], None]:
+    try:
+        record = json.loads(line)
+        santa, recipients = record["santa"], record["recipients"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(santa, str) or not isinstance(recipients, list):
+        return None
+    return santa, recipients
+
+
+def _parse_line(line: str, players_by_name: Mapping[str, Player]) -> Union[tuple[str, list[str]], None]:
+    # Names may contain spaces: the santa is the first prefix that is a
+    # player's name and leaves a readable list of recipients
+    for space in _spaces(line):
+        santa = line[:space]
+        if santa not in players_by_name:
+            continue
+        if (recipients := _parse_recipients(line[space + 1:], players_by_name)) is not None:
+            return santa, recipients
+    return None
+
+
+def _spaces(line: str) -> Iterator[int]:
+    space = line.find(" ")
+    while space != -1:
+        yield space
+        space = line.find(" ", space + 1)
+
+
+def _parse_recipients(text: str, players_by_name: Mapping[str, Player]) -> Union[list[str], None]:
+    if text in players_by_name:
+        return [text]
+    # The last " and " may be part of a name: try each from the right
+    separator = text.rfind(" and ")
+    while separator != -1:
+        recipients = text[:separator].split(", ") + [text[separator + len(" and "):]]
+        if all(name in players_by_name for name in recipients):
+            return recipients
+        separator = text.rfind(" and ", 0, separator)
+    return None
@@ -0,0 +1,42 @@
+import mailbox
+import os
+from email.message import EmailMessage
+from typing import Iterable
+
+SPOOL_FORMATS = ("mbox", "maildir", "eml")
+
+
+def write_spool(messages: Iterable[EmailMessage], path: str, spool_format: str = "mbox") -> int:
+    """Write messages to a local spool for a relay or a review tool to pick
+    up. Returns the number of messages written.
+
+    - mbox: appended to the mbox file path, locked and flushed once for the
+      whole batch;
+    - maildir: delivered to the new/ folder of the Maildir path;
+    - eml: one numbered .eml file per message in the directory path.
+    """
+    if spool_format not in SPOOL_FORMATS:
+        raise ValueError(f"Unknown spool format {spool_format!r}, expected one of {', '.join(SPOOL_FORMATS)}")
+    count = 0
+    if spool_format == "mbox":
+        box = mailbox.mbox(path, create=True)
+        box.lock()
+        try:
+            for message in messages:
+                box.add(message)
+                count += 1
+            box.flush()
+        finally:
+            box.unlock()
+            box.close()
+    elif spool_format == "maildir":
+        box = mailbox.Maildir(path, create=True)
+        for message in messages:
+            box.add(message)
+            count += 1
+    else:
+        os.makedirs(path, exist_ok=True)
+        for count, message in enumerate(messages, 1):
+            with open(os.path.join(path, f"{count:06d}.eml"), "wb") as f:
+                f.write(message.as_bytes())
+    return count
@@ -0,0 +1,45 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, ContextManager, Iterator, Union
+
+Hook = Callable[[str, float], None]
+
+
+@dataclass
+class SolverStats:
+    """Opt-in counters and timers (in seconds) filled in by a solve.
+
+    Hooks are called with (name, value) on every counter increment and
+    timer measurement, e.g. to forward them to a metrics pipeline. Solvers
+    only report aggregates at the end of each phase, never from their
+    inner loops, so the overhead stays negligible.
+    """
+    counters: defaultdict[str, int] = field(default_factory=lambda: defaultdict(int))
+    timers: defaultdict[str, float] = field(default_factory=lambda: defaultdict(float))
+    hooks: list[Hook] = field(default_factory=list)
+
+    def increment(self, name: str, value: int = 1):
+        self.counters[name] += value
+        for hook in self.hooks:
+            hook(name, value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timers[name] += elapsed
+            for hook in self.hooks:
+                hook(name, elapsed)
+
+    def as_dict(self) -> dict[str, float]:
+        return {**self.counters, **{f"{name}_s": elapsed for name, elapsed in self.timers.items()}}
+
+
+def measure(stats: Union[SolverStats, None], name: str) -> ContextManager:
+    """Time a phase into stats, or do nothing when stats are disabled."""
+    return stats.timer(name) if stats is not None else nullcontext()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from secret_santa.assignment_cache import AssignmentCache, cache_key
+from secret_santa.secret_santa.gift_graph import NGiftGraph
+from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.player import Player
+
+
+class TestAssignmentCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.players = [Player(f"Player {i}", f"p{i}@example.com") for i in range(6)]
+        pa, pb, pc, pd, pe, pf = self.players
+        self.draw = {pa: {pb}, pb: {pc}, pc: {pa}, pd: {pe}, pe: {pf}, pf: {pd}}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_key_ignores_order(self):
+        """
+        Scenario: the same input listed in two orders, then with one setting changed.
+        Verification:
+        - Both orders give the same key.
+        - Changing the number of gifts or an option changes it.
+        """
+        pa, pb, pc = self.players[:3]
+        key = cache_key(self.players, [Incompatibility(pa, pb), Incompatibility(pb, pc)], 1, False)
+        self.assertEqual(key, cache_key(reversed(self.players), [Incompatibility(pc, pb), Incompatibility(pb, pa)],
+                                        1, False))
+        self.assertNotEqual(key, cache_key(self.players, [Incompatibility(pa, pb), Incompatibility(pb, pc)], 2, False))
+        self.assertNotEqual(key, cache_key(self.players, [Incompatibility(pa, pb), Incompatibility(pb, pc)], 1, False,
+                                           year=2024))
+
+    def test_round_trip(self):
+        """
+        Scenario: a draw is stored, then read back by a new cache on the same directory.
+        Verification:
+        - The same draw comes back; an unknown key gives None.
+        """
+        AssignmentCache(self.directory.name).put("abc", self.draw)
+        cache = AssignmentCache(self.directory.name)
+        self.assertEqual(cache.get("abc"), self.draw)
+        self.assertIsNone(cache.get("def"))
+
+    def test_damaged_entries(self):
+        """
+        Scenario: entries of the wrong shape, then a write that fails halfway.
+        Verification:
+        - Damaged entries are cache misses, not errors.
+        - The failed write leaves no temporary file behind.
+        """
+        cache = AssignmentCache(self.directory.name)
+        for key, content in (("scalar", '{"assignments": [[1, 2]]}'), ("names", '{"assignments": [[["A"], []]]}'),
+                             ("list", '[]')):
+            with open(os.path.join(self.directory.name, f"{key}.json"), "w") as f:
+                f.write(content)
+            self.assertIsNone(cache.get(key))
+
+        with patch('secret_santa.assignment_cache.json.dump', side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                cache.put("abc", self.draw)
+        self.assertEqual([name for name in os.listdir(self.directory.name) if name.endswith(".tmp")], [])
+        self.assertIsNone(cache.get("abc"))
+
+    def test_eviction(self):
+        """
+        Scenario: a cache of 2 entries with one expired entry, then a third entry added.
+        Verification:
+        - Expired entries are not returned, and are removed.
+        - The least recently read entry is removed first.
+        """
+        cache = AssignmentCache(self.directory.name, max_entries=2, max_age=3600)
+        cache.put("old", self.draw)
+        expired = time.time() - 7200
+        os.utime(os.path.join(self.directory.name, "old.json"), (expired, expired))
+        self.assertIsNone(cache.get("old"))
+
+        cache.put("first", self.draw)
+        cache.put("second", self.draw)
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, "old.json")))
+        past = time.time() - 60
+        os.utime(os.path.join(self.directory.name, "second.json"), (past, past))
+        cache.get("first")
+        cache.put("third", self.draw)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ["first.json", "third.json"])
+
+    def test_graph_reuses_valid_draw(self):
+        """
+        Scenario: a graph built with a cached draw that is still valid, then with one an incompatibility breaks.
+        Verification:
+        - The valid draw is kept as is, without solving.
+        - The invalid one is replaced with a new valid draw.
+        """
+        pa, pb = self.players[:2]
+        graph = NGiftGraph(players=self.players, incompatibilities=[], number_of_gifts=1, allow_2cycles=False,
+                           initial_assignments=self.draw)
+        self.assertEqual(graph.assignments, self.draw)
+        self.assertEqual(graph.attempts, 0)
+
+        graph = NGiftGraph(players=self.players, incompatibilities=[Incompatibility(pa, pb)], number_of_gifts=1,
+                           allow_2cycles=False, initial_assignments=self.draw)
+        self.assertNotIn(pb, graph.assignments[pa])
+        self.assertGreater(graph.attempts, 0)
+        graph.verify_assignments()
+
+
+if __name__ == '__main__':
+    unittest.main()
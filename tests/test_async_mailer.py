@@ -0,0 +1,69 @@
+import time
+import unittest
+from secret_santa.async_mailer import AsyncMailer
+from secret_santa.local_smtp import LocalSMTPServer
+from secret_santa.mailer import MailerSettings, Contact, OutgoingEmail
+
+SENDER = Contact("Santa", "santa@example.com")
+
+
+def _emails(count):
+    return [OutgoingEmail(Contact(f"Player{i}", f"player{i}@example.com"), SENDER, "Subject", f"Body {i}")
+            for i in range(count)]
+
+
+class TestAsyncMailer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalSMTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.settings = MailerSettings("127.0.0.1", self.server.port, "santa", "secret", use_ssl=False)
+
+    def test_sends_all_messages(self):
+        """
+        Every message is delivered once and results keep the input order.
+        """
+        emails = _emails(20)
+
+        results = AsyncMailer(self.settings, connections=4).send_all(emails)
+
+        self.assertEqual([result.email for result in results], emails)
+        self.assertTrue(all(result.sent and result.attempts == 1 for result in results))
+        self.assertEqual(sorted(m.message["To"] for m in self.server.messages),
+                         sorted(f"Player{i} <player{i}@example.com>" for i in range(20)))
+
+    def test_retries_transient_failures(self):
+        """
+        4xx replies are retried, 5xx replies are reported as failures.
+        """
+        self.server.fail_next(451, count=2)
+        results = AsyncMailer(self.settings, connections=1, retry_delay=0.01).send_all(_emails(1))
+        self.assertTrue(results[0].sent)
+        self.assertEqual(results[0].attempts, 3)
+
+        self.server.fail_next(554, "Rejected")
+        results = AsyncMailer(self.settings, connections=1, retry_delay=0.01).send_all(_emails(1))
+        self.assertFalse(results[0].sent)
+        self.assertEqual(results[0].attempts, 1)
+        self.assertIn("554", results[0].error)
+
+    def test_reports_results_as_they_come(self):
+        self.server.fail_next(554, "Rejected")
+        reported = []
+        results = AsyncMailer(self.settings, connections=1).send_all(_emails(3), reported.append)
+        self.assertEqual(reported, results)
+        self.assertEqual([result.sent for result in reported], [False, True, True])
+
+    def test_gives_up_after_max_attempts(self):
+        self.server.fail_next(421, count=5)
+        results = AsyncMailer(self.settings, connections=1, max_attempts=2, retry_delay=0.01).send_all(_emails(1))
+        self.assertFalse(results[0].sent)
+        self.assertEqual(results[0].attempts, 2)
+
+    def test_rate_limit(self):
+        start = time.perf_counter()
+        AsyncMailer(self.settings, connections=4, max_messages_per_second=50).send_all(_emails(10))
+        # 10 messages at 50/s need at least 9 intervals of 20ms
+        self.assertGreaterEqual(time.perf_counter() - start, 0.17)
+        self.assertEqual(len(self.server.messages), 10)
@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import unittest
+from secret_santa.batch import find_input_files, solve_group, solve_groups
+
+
+def _write_group(directory, name, player_names, incompatibilities=()):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        json.dump({
+            "players": [{"name": n, "email": f"{n.lower()}@example.com"} for n in player_names],
+            "incompatibilities": [{"fst": fst, "snd": snd} for fst, snd in incompatibilities]
+        }, f)
+    return path
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.tmp_dir.name
+        self.good = _write_group(self.directory, "a.json", ["A", "B", "C", "D"])
+        self.other = _write_group(self.directory, "b.json", ["E", "F", "G", "H"], [("E", "F")])
+        # Only two players: impossible without 2-cycles
+        self.bad = _write_group(self.directory, "c.json", ["I", "J"])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_find_input_files_in_directory(self):
+        self.assertEqual(find_input_files(self.directory), [self.good, self.other, self.bad])
+
+    def test_find_input_files_in_manifest(self):
+        manifest = os.path.join(self.directory, "manifest.txt")
+        with open(manifest, 'w') as f:
+            f.write("# December draws\nb.json\n\na.json\n")
+        self.assertEqual(find_input_files(manifest), [self.other, self.good])
+
+    def test_solve_group_reports_failure(self):
+        result = solve_group(self.bad)
+        self.assertFalse(result.succeeded)
+        self.assertIn("InfeasibleAssignmentError", result.error)
+
+    def test_solve_groups(self):
+        input_files = [self.good, self.other, self.bad, self.good]
+        indexed = {index: result for index, result in solve_groups(input_files, 2)}
+        results = {result.input_file: result for result in indexed.values()}
+
+        self.assertEqual([indexed[index].input_file for index in range(4)], input_files)
+        self.assertTrue(results[self.good].succeeded)
+        self.assertEqual(len(results[self.good].assignments), 4)
+        self.assertTrue(results[self.other].succeeded)
+        self.assertFalse(results[self.bad].succeeded)
@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from benchmarks import bench_end_to_end, bench_mailer, bench_solver
+from benchmarks.compare import compare
+from benchmarks.results import write_results
+from benchmarks.rosters import synthetic_roster
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Smoke tests: each benchmark runs on a tiny configuration."""
+
+    def test_synthetic_roster(self):
+        roster = synthetic_roster(20, 0.1, 4, 2, seed=1)
+
+        self.assertEqual(len(roster.players), 20)
+        self.assertEqual(len(roster.incompatibilities), 19)
+        self.assertEqual(sorted(len(group) for group in roster.groups), [4] * 5)
+        self.assertEqual(roster.gift_number, 2)
+        self.assertEqual(roster.incompatibilities, synthetic_roster(20, 0.1, 4, 2, seed=1).incompatibilities)
+
+    def test_bench_solver(self):
+        """
+        Scenario: 20 Players, 2 gifts, in both flow graph modes.
+        Verification:
+        - Every phase is timed, and attempts and repairs are those of the single solve.
+        """
+        for compact in (False, True):
+            result = bench_solver.bench_config(20, 0.05, 0, 2, compact, track_memory=False)
+
+            self.assertNotIn("error", result)
+            for phase in ("total_s", "build_flow_graph_s", "compute_largest_flow_s", "repair_2cycles_s",
+                          "verify_assignments_s"):
+                self.assertIn(phase, result)
+            self.assertEqual(result["attempts"], 1)
+            self.assertIn("repairs", result)
+
+    def test_bench_mailer(self):
+        for connections in (0, 2):
+            result = bench_mailer.bench_config(5, connections)
+            self.assertEqual(result["delivered"], 5)
+
+    def test_bench_end_to_end(self):
+        result = bench_end_to_end.bench_config(10, 1, 0, tls=False, spool=False)
+
+        self.assertTrue(result["all_sent"])
+        self.assertEqual(result["delivered"], 10)
+
+    def test_compare(self):
+        """
+        Results written by two runs: a timing over the threshold is a regression, the rest is not.
+        """
+        config = {"players": 10, "compact": False}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "before.json")
+            write_results(path, "solver", [{**config, "total_s": 1.0, "max_flow_s": 1.0}])
+            with open(path) as f:
+                before = json.load(f)
+        after = {"results": [{**config, "total_s": 1.1, "max_flow_s": 2.0}]}
+
+        with redirect_stdout(StringIO()):
+            regressions = compare(before, after, 1.2)
+
+        self.assertEqual(before["benchmark"], "solver")
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("max_flow_s", regressions[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from secret_santa.delivery_journal import DeliveryJournal
+from secret_santa.mailer import Contact
+from secret_santa.secret_santa.player import Player
+
+
+class TestDeliveryJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "draw.journal")
+        self.players = [Player(f"Player {i}", f"p{i}@example.com") for i in range(3)]
+        pa, pb, pc = self.players
+        self.draw = {pa: {pb}, pb: {pc}, pc: {pa}}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _contact(self, player):
+        return Contact(player.name, player.email)
+
+    def test_resume_state(self):
+        """
+        Scenario: a draw is journaled, one email is sent and one fails, then the journal is reopened.
+        Verification:
+        - The draw comes back with its assignments in sending order.
+        - Only the sent email counts as sent; the failure keeps its error.
+        """
+        pa, pb, pc = self.players
+        with DeliveryJournal(self.path) as journal:
+            self.assertIsNone(journal.last_draw())
+            journal.start_draw("key", self.draw)
+            journal.record_sent(self._contact(pa))
+            journal.record_failed(self._contact(pb), "554 Rejected")
+
+        with DeliveryJournal(self.path) as journal:
+            draw = journal.last_draw()
+        self.assertEqual(draw.key, "key")
+        self.assertEqual(list(draw.assignments.items()), list(self.draw.items()))
+        self.assertTrue(draw.is_sent(pa))
+        self.assertFalse(draw.is_sent(pb))
+        self.assertEqual(draw.failed, {(pb.name, pb.email): "554 Rejected"})
+        self.assertEqual(draw.pending, 2)
+        self.assertFalse(draw.recorded)
+
+    def test_entries_follow_latest_draw(self):
+        """
+        Scenario: a draw is resumed from a reopened journal, then a new draw is started.
+        Verification:
+        - Entries appended after reopening belong to the resumed draw.
+        - A new draw starts with nothing sent.
+        """
+        pa, pb, pc = self.players
+        with DeliveryJournal(self.path) as journal:
+            journal.start_draw("key", self.draw)
+            journal.record_sent(self._contact(pa))
+        with DeliveryJournal(self.path) as journal:
+            journal.record_sent(self._contact(pb))
+            journal.record_history()
+            draw = journal.last_draw()
+            self.assertEqual(draw.sent, {(pa.name, pa.email), (pb.name, pb.email)})
+            self.assertTrue(draw.recorded)
+
+            journal.start_draw("other key", self.draw)
+            draw = journal.last_draw()
+            self.assertEqual((draw.number, draw.key, draw.sent), (2, "other key", set()))
+
+    def test_torn_entry(self):
+        """
+        Scenario: the journal ends with half an entry, as left by a crash, and more entries are appended.
+        Verification:
+        - The torn entry is skipped and the new ones are read.
+        """
+        pa, pb, pc = self.players
+        with DeliveryJournal(self.path) as journal:
+            journal.start_draw("key", self.draw)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"event": "sent", "draw": 1, "to": ["Play')
+        with DeliveryJournal(self.path) as journal:
+            journal.record_sent(self._contact(pc))
+            self.assertEqual(journal.last_draw().sent, {(pc.name, pc.email)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from secret_santa.secret_santa.dense import HAS_NUMPY
+from secret_santa.secret_santa.gift_graph import NGiftGraph
+from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.player import Player
+from secret_santa.stats import SolverStats
+
+if HAS_NUMPY:
+    from secret_santa.secret_santa.dense import allowed_mask, complete_gifts, is_valid_assignment
+    from secret_santa.secret_santa.exclusion_groups import ExclusionGroups
+
+
+class TestDenseFallback(unittest.TestCase):
+    @patch('secret_santa.secret_santa.gift_graph.HAS_NUMPY', False)
+    def test_solves_without_numpy(self):
+        """
+        Scenario: dense draw of 8 Players, 2 gifts each, as if NumPy was not installed.
+        Verification:
+        - The flow solver is used and assignments are valid.
+        """
+        players = {Player(f"P{i}", f"p{i}@example.com") for i in range(8)}
+        graph = NGiftGraph(players, set(), number_of_gifts=2, allow_2cycles=False, dense=True)
+
+        self.assertIsNotNone(graph.flow_graph)
+        graph.verify_assignments()
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+class TestDense(unittest.TestCase):
+    def setUp(self):
+        self.players = [Player(f"P{i}", f"p{i}@example.com") for i in range(60)]
+        self.incompatibilities = {Incompatibility(self.players[i], self.players[(7 * i + 3) % 60]) for i in range(60)
+                                  if i != (7 * i + 3) % 60}
+        self.groups = [set(self.players[i:i + 4]) for i in range(0, 60, 10)]
+
+    def test_allowed_mask(self):
+        mask = allowed_mask(self.players, self.incompatibilities, ExclusionGroups(self.groups))
+
+        for i, src in enumerate(self.players):
+            for j, dst in enumerate(self.players):
+                expected = src != dst and Incompatibility(src, dst) not in self.incompatibilities \
+                    and not any(src in group and dst in group for group in self.groups)
+                self.assertEqual(mask[i, j], expected)
+
+    def test_complete_gifts(self):
+        """
+        Scenario: 60 Players, 3 gifts each, starting from no gifts at all.
+        Verification:
+        - Every gift is placed and the result passes the vectorized check.
+        """
+        mask = allowed_mask(self.players, self.incompatibilities, ExclusionGroups(self.groups))
+        empty = mask.nonzero()[0][:0]
+        # The last pairs can be left over for the flow fallback, depending on the
+        # random order: seeded so that the test does not depend on it
+        rng = random.Random(1)
+        with patch('secret_santa.secret_santa.dense.sample', rng.sample), \
+                patch('secret_santa.secret_santa.dense.randrange', rng.randrange):
+            sources, targets, leftover = complete_gifts(mask, empty, empty, 3, False)
+
+        self.assertEqual(leftover, [])
+        self.assertTrue(is_valid_assignment(mask, sources, targets, 3, False))
+        self.assertFalse(is_valid_assignment(mask, sources[1:], targets[1:], 3, False))
+
+    def test_dense_draw(self):
+        """
+        Scenario: 60 Players, 2 gifts each, no 2-cycles, incompatibilities and households.
+        Verification:
+        - Assignments are valid, checked both vectorized and in pure Python.
+        - No flow graph was needed.
+        """
+        stats = SolverStats()
+        graph = NGiftGraph(set(self.players), self.incompatibilities, number_of_gifts=2, allow_2cycles=False,
+                           groups=self.groups, dense=True, stats=stats)
+
+        graph.verify_assignments()
+        graph.dense = False
+        graph.verify_assignments()
+        self.assertIsNone(graph.flow_graph)
+        self.assertEqual(stats.counters["dense_fallbacks"], 0)
+
+    def test_dense_miss_leaves_flow_attempts(self):
+        """
+        Scenario: 60 Players, 2 gifts each, a dense attempt that cannot place a gift, and max_attempts=1.
+        Verification:
+        - The flow solver still runs its one attempt, and the draw is valid.
+        """
+        stats = SolverStats()
+        with patch('secret_santa.secret_santa.gift_graph.complete_gifts',
+                   lambda mask, sources, targets, number_of_gifts, allow_2cycles: (sources, targets, [(0, 1)])), \
+                patch('secret_santa.secret_santa.gift_graph.NGiftGraph._augment', return_value=None):
+            graph = NGiftGraph(set(self.players), self.incompatibilities, number_of_gifts=2, groups=self.groups,
+                               dense=True, max_attempts=1, stats=stats)
+
+        graph.verify_assignments()
+        self.assertIsNotNone(graph.flow_graph)
+        self.assertEqual(stats.counters["dense_fallbacks"], 1)
+        self.assertEqual(graph.attempts, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
-from secret_santa.flow_graph import FlowEdge, FlowGraph
+from secret_santa.flow_graph import FlowEdge, FlowGraph, FlowAlgorithm, CompactFlowGraph
+from secret_santa.stats import SolverStats
 
 class FlowGrahTest(unittest.TestCase):
     def setUp(self) -> None:
@@ -45,3 +46,132 @@ class FlowGrahTest(unittest.TestCase):
         flow = graph.compute_largest_flow()
         self.assertDictEqual(flow.graph, {"src": {}, "A" : {}, "C": {}}, 'Flow di')
         self.assertEqual(flow.value, 0, 'Flow value is not zero when no path')
+
+
+class DinicFlowGraphTest(unittest.TestCase):
+    def test_correct_flow_value(self):
+        edges = [
+            FlowEdge("src", "A", 2),
+            FlowEdge("src", "C", 3),
+            FlowEdge("A", "B", 3),
+            FlowEdge("C", "D", 4),
+            FlowEdge("B", "dst", 3),
+            FlowEdge("D", "B", 1),
+            FlowEdge("D", "dst", 1),
+            FlowEdge("D", "E", 2),
+            FlowEdge("E", "dst", 3),
+        ]
+
+        graph = FlowGraph(edges, "src", "dst", FlowAlgorithm.DINIC)
+        flow = graph.compute_largest_flow()
+        self.assertEqual(flow.value, 5, 'incorrect flow value')
+        self.assertEqual(sum(flow.graph["src"].values()), 5, 'source edges do not carry the flow value')
+
+    def test_no_path_returns_zero(self):
+        edges = [
+            FlowEdge("src", "A", 1),
+            FlowEdge("A", "B", 1),
+            FlowEdge("C", "B", 1),
+            FlowEdge("C", "dst", 1)
+        ]
+
+        graph = FlowGraph(edges, "src", "dst", FlowAlgorithm.DINIC)
+        flow = graph.compute_largest_flow()
+        self.assertDictEqual(flow.graph, {"src": {}, "A" : {}, "C": {}}, 'Flow di')
+        self.assertEqual(flow.value, 0, 'Flow value is not zero when no path')
+
+    def test_stats(self):
+        edges = [FlowEdge("src", "A", 1), FlowEdge("A", "dst", 1), FlowEdge("src", "B", 1), FlowEdge("B", "dst", 1)]
+        for algorithm in FlowAlgorithm:
+            stats = SolverStats()
+            FlowGraph(edges, "src", "dst", algorithm, stats).compute_largest_flow()
+            self.assertEqual(stats.counters["flow_value"], 2)
+            self.assertEqual(stats.counters["augmenting_paths"], 2)
+            self.assertGreater(stats.counters["bfs_passes"], 0)
+            self.assertIn("max_flow", stats.timers)
+
+    def test_matches_edmonds_karp_on_bipartite_graph(self):
+        # Complete bipartite graph minus the diagonal, 2 units per left node
+        edges = [FlowEdge("src", f"L{i}", 2) for i in range(6)]
+        edges += [FlowEdge(f"R{i}", "dst", 2) for i in range(6)]
+        edges += [FlowEdge(f"L{i}", f"R{j}", 1) for i in range(6) for j in range(6) if i != j]
+
+        ek_flow = FlowGraph(list(edges), "src", "dst").compute_largest_flow()
+        dinic_flow = FlowGraph(list(edges), "src", "dst", FlowAlgorithm.DINIC).compute_largest_flow()
+        self.assertEqual(dinic_flow.value, ek_flow.value)
+        self.assertEqual(dinic_flow.value, 12)
+
+
+class MinCostFlowGraphTest(unittest.TestCase):
+    def test_lowest_cost_max_flow(self):
+        # Two units from src to dst: the cheap path only takes one, the
+        # second one must pick the cheaper of the remaining paths
+        edges = [
+            FlowEdge("src", "A", 2),
+            FlowEdge("A", "B", 1, cost=1),
+            FlowEdge("A", "C", 1, cost=4),
+            FlowEdge("A", "D", 1, cost=6),
+            FlowEdge("B", "dst", 1),
+            FlowEdge("C", "dst", 1),
+            FlowEdge("D", "dst", 1),
+        ]
+
+        flow = FlowGraph(edges, "src", "dst", FlowAlgorithm.MIN_COST).compute_largest_flow()
+        self.assertEqual(flow.value, 2)
+        self.assertEqual(flow.cost, 5)
+        self.assertDictEqual(flow.graph["A"], {"B": 1, "C": 1})
+
+    def test_cancels_expensive_flow(self):
+        # The first shortest path L0 -> R0 must be undone through its
+        # reverse edge for both left nodes to be matched
+        edges = [FlowEdge("src", "L0", 1), FlowEdge("src", "L1", 1),
+                 FlowEdge("R0", "dst", 1), FlowEdge("R1", "dst", 1),
+                 FlowEdge("L0", "R0", 1, cost=0), FlowEdge("L0", "R1", 1, cost=2),
+                 FlowEdge("L1", "R0", 1, cost=1)]
+
+        flow = FlowGraph(edges, "src", "dst", FlowAlgorithm.MIN_COST).compute_largest_flow()
+        self.assertEqual(flow.value, 2)
+        self.assertEqual(flow.cost, 3)
+        self.assertDictEqual(flow.graph["L0"], {"R1": 1})
+
+    def test_costs_kept_only_when_read(self):
+        # Plain max flows without costs keep no cost graph, and cost nothing
+        edges = [FlowEdge("src", "A", 1), FlowEdge("A", "dst", 1)]
+        graph = FlowGraph(edges, "src", "dst", FlowAlgorithm.DINIC)
+        self.assertEqual(graph.internal_costs, {})
+        self.assertEqual(graph.compute_largest_flow().cost, 0)
+
+        costed = FlowGraph(edges + [FlowEdge("src", "B", 1), FlowEdge("B", "dst", 1, cost=2)], "src", "dst",
+                           FlowAlgorithm.DINIC)
+        self.assertEqual(costed.compute_largest_flow().cost, 2)
+        self.assertEqual(FlowGraph(edges, "src", "dst", FlowAlgorithm.MIN_COST).internal_costs["A"]["src"], 0)
+
+    def test_negative_cost(self):
+        with self.assertRaises(ValueError):
+            FlowGraph([FlowEdge("src", "dst", 1, cost=-1)], "src", "dst", FlowAlgorithm.MIN_COST)
+
+
+class CompactFlowGraphTest(unittest.TestCase):
+    def test_correct_flow_value(self):
+        # Same graph as FlowGrahTest with src=0, A=1, B=2, C=3, D=4, E=5, dst=6
+        sources = [0, 0, 1, 3, 2, 4, 4, 4, 5]
+        targets = [1, 3, 2, 4, 6, 2, 6, 5, 6]
+        capacities = [2, 3, 3, 4, 3, 1, 1, 2, 3]
+
+        graph = CompactFlowGraph.from_edges(7, sources, targets, capacities, 0, 6)
+        flow = graph.compute_largest_flow()
+        self.assertEqual(flow.value, 5, 'incorrect flow value')
+        self.assertEqual(sum(flow.graph[0].values()), 5, 'source edges do not carry the flow value')
+
+    def test_no_path_returns_zero(self):
+        # src=0, A=1, B=2, C=3, dst=4
+        graph = CompactFlowGraph.from_edges(5, [0, 1, 3, 3], [1, 2, 2, 4], [1, 1, 1, 1], 0, 4)
+        flow = graph.compute_largest_flow()
+        self.assertDictEqual(flow.graph, {0: {}, 1: {}, 3: {}}, 'Flow di')
+        self.assertEqual(flow.value, 0, 'Flow value is not zero when no path')
+
+    def test_reset_restores_capacities(self):
+        graph = CompactFlowGraph.from_edges(3, [0, 1], [1, 2], [2, 2], 0, 2)
+        self.assertEqual(graph.compute_largest_flow().value, 2)
+        graph.reset()
+        self.assertEqual(graph.compute_largest_flow().value, 2)
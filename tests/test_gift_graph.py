@@ -1,8 +1,12 @@
+import multiprocessing
 import unittest
 from unittest.mock import patch, MagicMock
-from secret_santa.secret_santa.gift_graph import NGiftGraph, GiftAssignmentError
+from secret_santa.secret_santa.gift_graph import NGiftGraph, GiftAssignmentError, InfeasibleAssignmentError
 from secret_santa.secret_santa.player import Player
 from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.pair_costs import repeat_costs
+from secret_santa.flow_graph import CompactFlowGraph
+from secret_santa.stats import SolverStats
 
 class TestNGiftGraph(unittest.TestCase):
 
@@ -132,43 +136,278 @@ class TestNGiftGraph(unittest.TestCase):
         if pc in graph.assignments:
             self.assertNotIn(pd, graph.assignments[pc])
 
+    def test_exclusion_groups(self):
+        """
+        Scenario: 6 Players, 1 gift each, households {A, B, C} and {D, E}.
+        Verification:
+        - Assignments are valid.
+        - Nobody gifts a member of their own household.
+        """
+        pa, pb, pc, pd, pe, pf = (Player(name, f"{name.lower()}@example.com") for name in "ABCDEF")
+        players = {pa, pb, pc, pd, pe, pf}
+        groups = [{pa, pb, pc}, {pd, pe}]
+
+        for compact in (False, True):
+            graph = NGiftGraph(players, set(), number_of_gifts=1, groups=groups, compact=compact)
+
+            graph.verify_assignments()
+            for group in groups:
+                for src in group:
+                    self.assertTrue(graph.assignments[src].isdisjoint(group))
+
+    def test_infeasible_rejected_before_solving(self):
+        """
+        Scenario: 5 Players, A incompatible with everyone but B, a household {C, D, E} of 3.
+        Verification:
+        - InfeasibleAssignmentError is raised without building a flow graph.
+        - The message explains both problems and the offending players are listed.
+        """
+        pa, pb, pc, pd, pe = (Player(name, f"{name.lower()}@example.com") for name in "ABCDE")
+        players = {pa, pb, pc, pd, pe}
+        incompatibilities = {Incompatibility(pa, pc), Incompatibility(pa, pd), Incompatibility(pa, pe)}
+
+        with patch.object(NGiftGraph, '_build_flow_graph') as build:
+            with self.assertRaises(InfeasibleAssignmentError) as context:
+                NGiftGraph(players, incompatibilities, number_of_gifts=2, groups=[{pc, pd, pe}])
+
+        build.assert_not_called()
+        self.assertIn("A can only be paired with 1 players but needs 2", str(context.exception))
+        self.assertIn("Group of C, D, E holds 3 of 5 players", str(context.exception))
+        self.assertIn(pa, context.exception.players)
+        self.assertIn(pc, context.exception.players)
+
+    def test_flow_shortfall_explained(self):
+        """
+        Scenario: 5 Players, 1 gift each, A and B can only give to C.
+        Verification:
+        - The pre-check passes but the flow comes up short.
+        - InfeasibleAssignmentError names A and B as the bottleneck, in both modes.
+        """
+        pa, pb, pc, pd, pe = (Player(name, f"{name.lower()}@example.com") for name in "ABCDE")
+        players = {pa, pb, pc, pd, pe}
+        incompatibilities = {Incompatibility(pa, pb), Incompatibility(pa, pd), Incompatibility(pa, pe),
+                             Incompatibility(pb, pd), Incompatibility(pb, pe)}
+
+        for compact in (False, True):
+            with self.assertRaises(InfeasibleAssignmentError) as context:
+                NGiftGraph(players, incompatibilities, number_of_gifts=1, compact=compact)
+
+            self.assertEqual(set(context.exception.players), {pa, pb})
+            self.assertIn("Only 4 of 5 gifts can be assigned: A, B can only give to C", str(context.exception))
+
+    def test_flow_shortfall_explained_without_2cycles(self):
+        """
+        Scenario: 6 Players, 1 gift each, no 2-cycles, A, B, C and F can only give to D and E.
+        Verification:
+        - The short flow is explained even when its 2-cycles cannot be repaired.
+        """
+        pa, pb, pc, pd, pe, pf = (Player(name, f"{name.lower()}@example.com") for name in "ABCDEF")
+        players = {pa, pb, pc, pd, pe, pf}
+        incompatibilities = {Incompatibility(src, dst) for src, dst in
+                             ((pa, pb), (pa, pc), (pb, pc), (pa, pf), (pb, pf), (pc, pf))}
+
+        for compact in (False, True):
+            with self.assertRaises(InfeasibleAssignmentError) as context, \
+                    patch('secret_santa.secret_santa.gift_graph.NGiftGraph._repair_2cycles', return_value=False):
+                NGiftGraph(players, incompatibilities, number_of_gifts=1, allow_2cycles=False, compact=compact,
+                           max_attempts=1)
+
+            self.assertEqual(set(context.exception.players), {pa, pb, pc, pf})
+            self.assertIn("Only 4 of 6 gifts can be assigned", str(context.exception))
+
+    def test_resample(self):
+        """
+        Scenario: 8 Players, 2 gifts each, no 2-cycles, two incompatibilities and a household.
+        Verification:
+        - Resampled assignments stay valid and eventually differ from the flow solution.
+        - mixing_steps resamples every new draw, and the steps are counted in stats.
+        """
+        players = {Player(f"P{i}", f"p{i}@example.com") for i in range(8)}
+        ordered = sorted(players, key=lambda p: p.name)
+        incompatibilities = {Incompatibility(ordered[0], ordered[1]), Incompatibility(ordered[2], ordered[3])}
+        groups = [set(ordered[4:6])]
+        stats = SolverStats()
+        graph = NGiftGraph(players, incompatibilities, number_of_gifts=2, allow_2cycles=False, groups=groups,
+                           mixing_steps=100, stats=stats)
+        graph.verify_assignments()
+        self.assertEqual(stats.counters["mixing_steps"], 100)
+
+        initial = graph._snapshot_assignments()
+        changed = False
+        for _ in range(20):
+            graph.resample()
+            graph.verify_assignments()
+            changed = changed or graph.assignments != initial
+        self.assertTrue(changed)
+        self.assertEqual(stats.counters["mixing_steps"], 100 + 20 * 20 * 8 * 2)
+
+    def test_single_cycle(self):
+        """
+        Scenario: 40 Players, 1 gift each, one loop, a few incompatibilities and households of 4.
+        Verification:
+        - Assignments are valid and form a single loop through every player.
+        - Adding and removing players keeps a single loop.
+        """
+        players = [Player(f"P{i}", f"p{i}@example.com") for i in range(40)]
+        incompatibilities = {Incompatibility(players[i], players[i + 5]) for i in range(0, 35, 3)}
+        groups = [set(players[i:i + 4]) for i in range(0, 40, 4)]
+        graph = NGiftGraph(set(players), incompatibilities, allow_2cycles=False, single_cycle=True, groups=groups)
+        graph.verify_assignments()
+        self.assertEqual(len(graph._loop_from(players[0])), 40)
+
+        newcomer = Player("New", "new@example.com")
+        graph.add_player(newcomer, incompatible_with=players[:3])
+        graph.verify_assignments()
+        graph.remove_player(players[7])
+        graph.add_incompatibility(Incompatibility(players[0], next(iter(graph.assignments[players[0]]))))
+        graph.verify_assignments()
+        self.assertEqual(len(graph._loop_from(newcomer)), 40)
+
+    def test_single_cycle_invalid_settings(self):
+        players = {Player(f"P{i}", f"p{i}@example.com") for i in range(6)}
+        with self.assertRaises(ValueError):
+            NGiftGraph(players, set(), number_of_gifts=2, single_cycle=True)
+        with self.assertRaises(ValueError):
+            NGiftGraph(players, set(), single_cycle=True, mixing_steps=10)
+        with self.assertRaises(ValueError):
+            NGiftGraph(players, set(), single_cycle=True).resample()
+
+    @patch('secret_santa.secret_santa.gift_graph.find_single_cycle', return_value=None)
+    def test_single_cycle_gives_up(self, find_single_cycle):
+        """
+        Scenario: the loop heuristic never succeeds.
+        Verification:
+        - GiftAssignmentError is raised after max_attempts attempts.
+        """
+        players = {Player(f"P{i}", f"p{i}@example.com") for i in range(6)}
+        with self.assertRaises(GiftAssignmentError) as context:
+            NGiftGraph(players, set(), single_cycle=True, max_attempts=3)
+
+        self.assertEqual(find_single_cycle.call_count, 3)
+        self.assertEqual(str(context.exception), "Could not find a single cycle through all players after 3 attempts")
+
+    def test_pair_costs_avoid_repeats(self):
+        """
+        Scenario: 3 Players, no 2-cycles: the only draws are the two 3-cycles. Last year's draw is costed.
+        Verification:
+        - The other 3-cycle is drawn every time, at no cost.
+        """
+        pa, pb, pc = (Player(name, f"{name.lower()}@example.com") for name in "ABC")
+        last_year = {pa: {pb}, pb: {pc}, pc: {pa}}
+        costs = repeat_costs([last_year])
+        self.assertEqual(costs, {(pa, pb): 1, (pb, pc): 1, (pc, pa): 1})
+
+        for _ in range(10):
+            graph = NGiftGraph({pa, pb, pc}, set(), allow_2cycles=False, pair_costs=costs)
+            graph.verify_assignments()
+            self.assertEqual(dict(graph.assignments), {pa: {pc}, pc: {pb}, pb: {pa}})
+            self.assertEqual(graph.assignment_cost(), 0)
+
+    def test_pair_costs_stop_without_improvement(self):
+        """
+        Scenario: draws that all cost more than the flow's optimum of 0, the second one least, up to 5 attempts.
+        Verification:
+        - Attempts stop at the first one without a cheaper draw, and the cheapest draw is kept rather than the last.
+        - Draws of equal cost stop after two attempts.
+        """
+        pa, pb, pc, pd = (Player(name, f"{name.lower()}@example.com") for name in "ABCD")
+        draws = [[(pa, pb), (pb, pc), (pc, pd), (pd, pa)],
+                 [(pa, pc), (pc, pb), (pb, pd), (pd, pa)],
+                 [(pa, pd), (pd, pc), (pc, pb), (pb, pa)]]
+        costs = {(pa, pb): 2, (pa, pc): 1, (pa, pd): 3}
+
+        def directed(player):
+            node = MagicMock()
+            node.player = player
+            return node
+
+        def flow_graph(edges):
+            mock_flow_graph = MagicMock()
+            flow = mock_flow_graph.compute_largest_flow.return_value
+            flow.graph = {directed(src): {directed(dst): 1} for src, dst in edges}
+            flow.cost = 0
+            return mock_flow_graph
+
+        with patch('secret_santa.secret_santa.gift_graph.NGiftGraph._build_flow_graph',
+                   side_effect=[flow_graph(draw) for draw in draws + draws]) as mock_build:
+            graph = NGiftGraph({pa, pb, pc, pd}, set(), pair_costs=costs, max_attempts=5)
+
+        self.assertEqual(mock_build.call_count, 3)
+        self.assertEqual(graph.assignment_cost(), 1)
+        self.assertEqual({(src, dst) for src, dsts in graph.assignments.items() for dst in dsts}, set(draws[1]))
+
+        with patch('secret_santa.secret_santa.gift_graph.NGiftGraph._build_flow_graph',
+                   side_effect=[flow_graph(draws[0]) for _ in range(5)]) as mock_build:
+            graph = NGiftGraph({pa, pb, pc, pd}, set(), pair_costs=costs, max_attempts=5)
+
+        self.assertEqual(mock_build.call_count, 2)
+        self.assertEqual(graph.assignment_cost(), 2)
+
+    def test_pair_costs_lowest_repeats(self):
+        """
+        Scenario: 8 Players, 2 gifts each, three past draws costed by repeat_costs.
+        Verification:
+        - Assignments are valid and cost no more than any plain draw.
+        - Recent pairings weigh more than old ones.
+        """
+        players = {Player(f"P{i}", f"p{i}@example.com") for i in range(8)}
+        past = [NGiftGraph(players, set(), number_of_gifts=2, allow_2cycles=False).assignments for _ in range(3)]
+        costs = repeat_costs(past)
+        src = next(iter(past[2]))
+        self.assertGreaterEqual(costs[(src, next(iter(past[2][src])))], 3)
+
+        graph = NGiftGraph(players, set(), number_of_gifts=2, allow_2cycles=False, pair_costs=costs)
+        graph.verify_assignments()
+        for draw in past:
+            draw_cost = sum(costs[(src, dst)] for src, dsts in draw.items() for dst in dsts)
+            self.assertLessEqual(graph.assignment_cost(), draw_cost)
+
+    def test_compact_mode(self):
+        """
+        Scenario: 6 Players, 2 gifts each, one incompatibility, solved on the compact graph.
+        Verification:
+        - Assignments are valid.
+        - The compact flow graph is kept on the instance.
+        """
+        players = {Player(name, f"{name.lower()}@example.com") for name in "ABCDEF"}
+        pa, pb = sorted(players, key=lambda p: p.name)[:2]
+        incompatibilities = {Incompatibility(pa, pb)}
+
+        graph = NGiftGraph(players, incompatibilities, number_of_gifts=2, compact=True)
+
+        graph.verify_assignments()
+        self.assertIsInstance(graph.flow_graph, CompactFlowGraph)
+        self.assertNotIn(pb, graph.assignments[pa])
+        self.assertNotIn(pa, graph.assignments[pb])
+
     def test_max_retries_exceeded_raises_exception(self):
         """
         Test that an exception is raised when a valid flow cannot be found
         within the maximum number of retries.
         """
-        pa = Player("A", "a@example.com")
-        pb = Player("B", "b@example.com")
-        pc = Player("C", "c@example.com")
-        players = {pa, pb, pc}
+        pa, pb, pc, pd = (Player(name, f"{name.lower()}@example.com") for name in "ABCD")
+        players = {pa, pb, pc, pd}
         incompatibilities = set()
-        
-        with patch('secret_santa.secret_santa.gift_graph.NGiftGraph._build_flow_graph') as mock_build:
-            mock_flow_graph = MagicMock()
-            mock_build.return_value = mock_flow_graph
-            
-            p_a = list(players)[0]
-            p_b = list(players)[1]
-            
-            mock_src_a = MagicMock()
-            mock_src_a.player = p_a
-            mock_dst_b = MagicMock()
-            mock_dst_b.player = p_b
-            mock_src_b = MagicMock()
-            mock_src_b.player = p_b
-            mock_dst_a = MagicMock()
-            mock_dst_a.player = p_a
 
+        def directed(player):
+            node = MagicMock()
+            node.player = player
+            return node
+
+        with patch('secret_santa.secret_santa.gift_graph.NGiftGraph._build_flow_graph') as mock_build, \
+                patch('secret_santa.secret_santa.gift_graph.NGiftGraph._repair_2cycles', return_value=False):
             mock_flow = MagicMock()
             mock_flow.graph = {
-                mock_src_a: {mock_dst_b: 1},
-                mock_src_b: {mock_dst_a: 1}
+                directed(pa): {directed(pb): 1},
+                directed(pb): {directed(pa): 1},
+                directed(pc): {directed(pd): 1},
+                directed(pd): {directed(pc): 1}
             }
-            mock_flow_graph.compute_largest_flow.return_value = mock_flow
-            
+            mock_build.return_value.compute_largest_flow.return_value = mock_flow
+
             with self.assertRaises(GiftAssignmentError) as cm:
                 NGiftGraph(players, incompatibilities, allow_2cycles=False, max_attempts=3)
-            
+
             self.assertIn("Could not find a valid solution after 3 attempts", str(cm.exception))
             self.assertEqual(mock_build.call_count, 3)
 
@@ -177,59 +416,231 @@ class TestNGiftGraph(unittest.TestCase):
         Test that if the graph generation fails initially but succeeds later,
         it returns successfully.
         """
-        players = {
-            Player("A", "a@example.com"),
-            Player("B", "b@example.com"),
-            Player("C", "c@example.com")
-        }
+        pa, pb, pc, pd = (Player(name, f"{name.lower()}@example.com") for name in "ABCD")
+        players = {pa, pb, pc, pd}
         incompatibilities = set()
-        
-        with patch('secret_santa.secret_santa.gift_graph.NGiftGraph._build_flow_graph') as mock_build:
-            mock_flow_graph_bad = MagicMock()
-            mock_flow_bad = MagicMock()
-            
-            players_list = list(players)
-            p_a = players_list[0]
-            p_b = players_list[1]
-            
-            mock_src_a = MagicMock()
-            mock_src_a.player = p_a
-            mock_dst_b = MagicMock()
-            mock_dst_b.player = p_b
-            mock_src_b = MagicMock()
-            mock_src_b.player = p_b
-            mock_dst_a = MagicMock()
-            mock_dst_a.player = p_a
-            
-            mock_flow_bad.graph = {
-                mock_src_a: {mock_dst_b: 1},
-                mock_src_b: {mock_dst_a: 1}
-            }
-            mock_flow_graph_bad.compute_largest_flow.return_value = mock_flow_bad
-
-            mock_flow_graph_good = MagicMock()
-            mock_flow_good = MagicMock()
-            p_c = players_list[2]
-            mock_src_c = MagicMock()
-            mock_src_c.player = p_c
-            mock_dst_c = MagicMock()
-            mock_dst_c.player = p_c
-            
-            mock_flow_good.graph = {
-                mock_src_a: {mock_dst_b: 1},
-                mock_src_b: {mock_dst_c: 1},
-                mock_src_c: {mock_dst_a: 1}
-            }
-            mock_flow_graph_good.compute_largest_flow.return_value = mock_flow_good
-            
+
+        def directed(player):
+            node = MagicMock()
+            node.player = player
+            return node
+
+        def flow_graph(edges):
+            mock_flow_graph = MagicMock()
+            mock_flow_graph.compute_largest_flow.return_value.graph = {
+                directed(src): {directed(dst): 1} for src, dst in edges}
+            return mock_flow_graph
+
+        # 2-cycles the repair cannot break, twice, then a loop through everyone
+        mock_flow_graph_bad = flow_graph([(pa, pb), (pb, pa), (pc, pd), (pd, pc)])
+        mock_flow_graph_good = flow_graph([(pa, pb), (pb, pc), (pc, pd), (pd, pa)])
+        with patch('secret_santa.secret_santa.gift_graph.NGiftGraph._build_flow_graph') as mock_build, \
+                patch('secret_santa.secret_santa.gift_graph.NGiftGraph._repair_2cycles',
+                      side_effect=[False, False, True]):
             mock_build.side_effect = [mock_flow_graph_bad, mock_flow_graph_bad, mock_flow_graph_good]
-            
+
             graph = NGiftGraph(players, incompatibilities, allow_2cycles=False, max_attempts=5)
-            
+
             self.assertEqual(mock_build.call_count, 3)
-            self.assertIn(p_b, graph.assignments[p_a])
-            self.assertIn(p_c, graph.assignments[p_b])
-            self.assertIn(p_a, graph.assignments[p_c])
+            self.assertIn(pb, graph.assignments[pa])
+            self.assertIn(pc, graph.assignments[pb])
+            self.assertIn(pd, graph.assignments[pc])
+            self.assertIn(pa, graph.assignments[pd])
+
+    def test_2cycles_repaired_without_retry(self):
+        """
+        Test that 2-cycles in the solved flow are repaired locally
+        instead of triggering a new solve.
+        """
+        pa, pb, pc, pd = (Player(name, f"{name.lower()}@example.com") for name in "ABCD")
+        players = {pa, pb, pc, pd}
+
+        def directed(player):
+            node = MagicMock()
+            node.player = player
+            return node
+
+        with patch('secret_santa.secret_santa.gift_graph.NGiftGraph._build_flow_graph') as mock_build:
+            mock_flow = MagicMock()
+            mock_flow.graph = {
+                directed(pa): {directed(pb): 1},
+                directed(pb): {directed(pa): 1},
+                directed(pc): {directed(pd): 1},
+                directed(pd): {directed(pc): 1}
+            }
+            mock_build.return_value.compute_largest_flow.return_value = mock_flow
+
+            graph = NGiftGraph(players, set(), allow_2cycles=False, max_attempts=1)
+
+            self.assertEqual(mock_build.call_count, 1)
+            self.assertEqual(graph.attempts, 1)
+            self.assertEqual(graph.repairs, 1)
+            graph.verify_assignments()
+            for src, dsts in graph.assignments.items():
+                for dst in dsts:
+                    self.assertNotIn(src, graph.assignments[dst])
+
+    def test_no_2cycles_with_multiple_gifts(self):
+        """
+        Scenario: 5 Players, 2 gifts each, 2-cycles forbidden.
+        With 5 players every valid draw is a pair of disjoint 5-cycles,
+        so this only succeeds reliably through local repairs.
+        """
+        players = {Player(name, f"{name.lower()}@example.com") for name in "ABCDE"}
+
+        for _ in range(10):
+            graph = NGiftGraph(players, set(), number_of_gifts=2, allow_2cycles=False, max_attempts=1)
+            graph.verify_assignments()
+            for src, dsts in graph.assignments.items():
+                for dst in dsts:
+                    self.assertNotIn(src, graph.assignments[dst])
+
+    def test_stats(self):
+        """
+        Scenario: 6 Players, 2 gifts each, with statistics enabled.
+        Verification:
+        - Every phase is timed and the flow counters are filled in.
+        - Hooks receive every measurement.
+        """
+        players = {Player(name, f"{name.lower()}@example.com") for name in "ABCDEF"}
+        for compact in (False, True):
+            received = []
+            stats = SolverStats(hooks=[lambda name, value: received.append(name)])
+
+            graph = NGiftGraph(players, set(), number_of_gifts=2, allow_2cycles=False, compact=compact, stats=stats)
+            graph.verify_assignments()
+
+            self.assertIs(graph.flow_graph.stats, stats)
+            self.assertEqual(stats.counters["attempts"], 1)
+            self.assertEqual(stats.counters["flow_value"], 12)
+            self.assertGreaterEqual(stats.counters["augmenting_paths"], 1)
+            self.assertGreater(stats.counters["bfs_nodes"], 0)
+            self.assertEqual(stats.counters["repairs"], graph.repairs)
+            for phase in ("build_flow_graph", "max_flow", "extract_assignments", "repair_2cycles", "verify_assignments"):
+                self.assertIn(phase, stats.timers)
+                self.assertIn(phase, received)
+            self.assertIn("max_flow_s", stats.as_dict())
+
+    def test_generate_many(self):
+        """
+        Scenario: 6 Players, 1 gift each, many draws from one graph.
+        Verification:
+        - Every draw is valid.
+        - Draws are not all identical.
+        - The flow graph is built only once.
+        """
+        players = {Player(name, f"{name.lower()}@example.com") for name in "ABCDEF"}
+
+        for compact in (False, True):
+            graph = NGiftGraph(players, set(), number_of_gifts=1, allow_2cycles=False, compact=compact)
+            flow_graph = graph.flow_graph
+
+            draws = list(graph.generate_many(20))
+
+            self.assertEqual(len(draws), 20)
+            self.assertIs(graph.flow_graph, flow_graph)
+            for draw in draws:
+                graph.assignments = draw
+                graph.verify_assignments()
+            self.assertGreater(len({frozenset((src, frozenset(dsts)) for src, dsts in draw.items()) for draw in draws}), 1)
+
+    def test_generate_many_in_processes(self):
+        players = {Player(name, f"{name.lower()}@example.com") for name in "ABCDEF"}
+        graph = NGiftGraph(players, set(), number_of_gifts=2, compact=True)
+
+        draws = list(graph.generate_many(8, processes=2))
+
+        self.assertEqual(len(draws), 8)
+        for draw in draws:
+            graph.assignments = draw
+            graph.verify_assignments()
+
+    def test_generate_many_in_spawned_processes(self):
+        """
+        Scenario: 12 Players, 2 gifts each, no 2-cycles, incompatibilities, mixed draws in spawned workers.
+        Verification:
+        - Workers, whose players get new ids, still apply every incompatibility.
+        """
+        players = [Player(f"Spawned {i}", f"spawned{i}@example.com") for i in range(12)]
+        incompatibilities = {Incompatibility(players[i], players[(i + 1) % 12]) for i in range(12)}
+        graph = NGiftGraph(set(players), incompatibilities, number_of_gifts=2, allow_2cycles=False,
+                           mixing_steps=200)
+
+        draws = list(graph.generate_many(20, processes=2, mp_context=multiprocessing.get_context("spawn")))
+
+        self.assertEqual(len(draws), 20)
+        for draw in draws:
+            graph.assignments = draw
+            graph.verify_assignments()
+
+
+class TestNGiftGraphUpdates(unittest.TestCase):
+
+    def setUp(self):
+        self.players = {Player(name, f"{name.lower()}@example.com") for name in "ABCDEFGH"}
+        self.graph = NGiftGraph(self.players, set(), number_of_gifts=2, allow_2cycles=False)
+        self.edges_before = self._edges()
+
+    def _edges(self):
+        return {(src, dst) for src, dsts in self.graph.assignments.items() for dst in dsts}
+
+    def test_add_player(self):
+        """
+        A late joiner gets gifts in and out while most pairings stay.
+        """
+        newcomer = Player("I", "i@example.com")
+        excluded = next(iter(self.players))
+
+        self.graph.add_player(newcomer, incompatible_with=[excluded])
+
+        self.graph.verify_assignments()
+        self.assertEqual(len(self.graph.assignments[newcomer]), 2)
+        self.assertNotIn(excluded, self.graph.assignments[newcomer])
+        self.assertNotIn(newcomer, self.graph.assignments[excluded])
+        self.assertGreaterEqual(len(self.edges_before & self._edges()), len(self.edges_before) // 2)
+
+    def test_remove_player(self):
+        """
+        Santas and recipients of a dropout are paired again.
+        """
+        dropout = next(iter(self.players))
+
+        self.graph.remove_player(dropout)
+
+        self.graph.verify_assignments()
+        self.assertNotIn(dropout, self.graph.assignments)
+        self.assertNotIn(dropout, set().union(*self.graph.assignments.values()))
+        self.assertGreaterEqual(len(self.edges_before & self._edges()), len(self.edges_before) // 2)
+
+    def test_add_and_remove_incompatibility(self):
+        """
+        A new incompatibility reroutes the gift it forbids, removing one does not reshuffle.
+        """
+        src, dst = next(iter(self.edges_before))
+        incompatibility = Incompatibility(src, dst)
+
+        self.graph.add_incompatibility(incompatibility)
+
+        self.graph.verify_assignments()
+        self.assertNotIn(dst, self.graph.assignments[src])
+        edges_after = self._edges()
+
+        self.graph.remove_incompatibility(incompatibility)
+
+        self.assertEqual(self._edges(), edges_after)
+
+    def test_failed_update_is_rolled_back(self):
+        """
+        An update that makes the draw impossible raises and leaves the draw untouched.
+        """
+        newcomer = Player("I", "i@example.com")
+
+        with self.assertRaises(GiftAssignmentError):
+            self.graph.add_player(newcomer, incompatible_with=self.players)
+
+        self.assertNotIn(newcomer, self.graph.players)
+        self.assertEqual(self._edges(), self.edges_before)
+        self.graph.verify_assignments()
 
 if __name__ == '__main__':
     unittest.main()
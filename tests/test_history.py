@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from secret_santa.history import HistoryStore
+from secret_santa.secret_santa.gift_graph import NGiftGraph
+from secret_santa.secret_santa.pair_costs import repeat_costs
+from secret_santa.secret_santa.player import Player
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "history.db")
+        self.players = [Player(f"Player {i}", f"p{i}@example.com") for i in range(6)]
+        pa, pb, pc, pd, pe, pf = self.players
+        self.draw_2023 = {pa: {pb}, pb: {pc}, pc: {pa}, pd: {pe}, pe: {pf}, pf: {pd}}
+        self.draw_2024 = {pa: {pd}, pd: {pb}, pb: {pe}, pe: {pc}, pc: {pf}, pf: {pa}}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_past_draws(self):
+        """
+        Scenario: draws of 2023 and 2024 recorded, plus one for another group; the store is reopened.
+        Verification:
+        - Lookups return the group's draws oldest first, limited to the requested years.
+        - Names with spaces come back intact.
+        """
+        with HistoryStore(self.path) as history:
+            history.record_draw(self.draw_2023, "family", 2023)
+            history.record_draw(self.draw_2024, "family", 2024)
+            history.record_draw(self.draw_2024, "office", 2024)
+
+        with HistoryStore(self.path) as history:
+            self.assertEqual(history.past_draws(self.players, 3, "family"), [self.draw_2023, self.draw_2024])
+            self.assertEqual(history.past_draws(self.players, 1, "family"), [self.draw_2024])
+            self.assertEqual(history.past_draws(self.players, 1, "family", before_year=2024), [self.draw_2023])
+            self.assertEqual(history.past_draws(self.players, 3, "office", before_year=2024), [])
+
+    def test_past_pairs_restricted_to_players(self):
+        pa, pb, pc = self.players[:3]
+        with HistoryStore(self.path) as history:
+            history.record_draw(self.draw_2023, "family", 2023)
+            self.assertEqual(history.past_pairs([pa, pb, pc, Player("New", "new@example.com")], 3, "family"),
+                             {(pa, pb), (pb, pc), (pc, pa)})
+
+    def test_avoids_last_years_pairs(self):
+        """
+        Scenario: 6 Players, 2023 and 2024 draws recorded, 2025 drawn with their repeat costs.
+        Verification:
+        - No 2024 pairing repeats in 2025, as one such draw exists.
+        """
+        with HistoryStore(self.path) as history:
+            history.record_draw(self.draw_2023, "family", 2023)
+            history.record_draw(self.draw_2024, "family", 2024)
+            costs = repeat_costs(history.past_draws(self.players, 3, "family", before_year=2025))
+
+        graph = NGiftGraph(set(self.players), set(), allow_2cycles=False, pair_costs=costs, max_attempts=10)
+        graph.verify_assignments()
+        self.assertEqual(graph.assignment_cost(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
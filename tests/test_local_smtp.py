@@ -0,0 +1,60 @@
+import smtplib
+import ssl
+import time
+import unittest
+
+from secret_santa.local_smtp import HAS_OPENSSL, LocalSMTPServer
+from secret_santa.mailer import Contact, Mailer, MailerSettings
+
+SENDER = Contact("Santa", "santa@example.com")
+PLAYER = Contact("Player", "player@example.com")
+
+
+class TestLocalSMTPServer(unittest.TestCase):
+
+    @unittest.skipUnless(HAS_OPENSSL, "openssl is not installed")
+    def test_tls(self):
+        """
+        Mailer delivers over implicit TLS when trusting the certificate, which system certificates do not vouch for.
+        """
+        with LocalSMTPServer(tls=True) as server:
+            settings = MailerSettings(server.host, server.port, "santa", "secret", ssl_cafile=server.certfile)
+            with Mailer(settings) as mailer:
+                mailer.send_email(PLAYER, SENDER, "Subject", "Body")
+            self.assertEqual(server.messages[0].message["To"], "Player <player@example.com>")
+
+            with self.assertRaises(ssl.SSLCertVerificationError):
+                smtplib.SMTP_SSL(server.host, server.port, context=ssl.create_default_context())
+
+    def test_latency(self):
+        """
+        Every reply is delayed, so a message costs several round trips.
+        """
+        with LocalSMTPServer(latency=0.02) as server:
+            settings = MailerSettings(server.host, server.port, "santa", "secret", use_ssl=False)
+            start = time.perf_counter()
+            with Mailer(settings) as mailer:
+                mailer.send_email(PLAYER, SENDER, "Subject", "Body")
+            # Greeting, EHLO, AUTH, MAIL, RCPT, DATA, end of data and QUIT
+            self.assertGreaterEqual(time.perf_counter() - start, 8 * 0.02)
+
+    def test_disconnect(self):
+        """
+        Mailer resends a message once on a new connection after a disconnect, and gives up after two.
+        """
+        with LocalSMTPServer() as server:
+            settings = MailerSettings(server.host, server.port, "santa", "secret", use_ssl=False)
+            server.disconnect_next()
+            with Mailer(settings) as mailer:
+                mailer.send_email(PLAYER, SENDER, "Subject", "Body")
+            self.assertEqual(len(server.messages), 1)
+
+            server.disconnect_next(count=2)
+            with self.assertRaises(smtplib.SMTPServerDisconnected):
+                with Mailer(settings) as mailer:
+                    mailer.send_email(PLAYER, SENDER, "Subject", "Body")
+            self.assertEqual(len(server.messages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
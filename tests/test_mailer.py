@@ -0,0 +1,67 @@
+import smtplib
+import unittest
+from unittest.mock import patch, MagicMock
+from secret_santa.mailer import Mailer, MailerSettings, Contact
+
+SENDER = Contact("Santa", "santa@example.com")
+
+
+def _contact(i):
+    return Contact(f"Player{i}", f"player{i}@example.com")
+
+
+class TestMailer(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = MailerSettings("smtp.example.com", 465, "santa", "secret", max_messages_per_connection=3)
+        patcher = patch('secret_santa.mailer.smtplib.SMTP_SSL')
+        self.mock_smtp = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_smtp.side_effect = lambda *args: MagicMock()
+
+    def test_reuses_connection(self):
+        """
+        Two messages go through a single connection and login.
+        """
+        with Mailer(self.settings) as mailer:
+            mailer.send_email(_contact(1), SENDER, "Subject", "Body")
+            mailer.send_email(_contact(2), SENDER, "Subject", "Body")
+            connection = mailer._connection
+
+        self.assertEqual(self.mock_smtp.call_count, 1)
+        connection.login.assert_called_once_with("santa", "secret")
+        self.assertEqual(connection.send_message.call_count, 2)
+        connection.quit.assert_called_once()
+
+    def test_max_messages_per_connection(self):
+        """
+        A new connection is opened once the per-connection limit is reached.
+        """
+        with Mailer(self.settings) as mailer:
+            for i in range(7):
+                mailer.send_email(_contact(i), SENDER, "Subject", "Body")
+
+        self.assertEqual(self.mock_smtp.call_count, 3)
+
+    def test_reconnects_when_server_disconnects(self):
+        """
+        A dropped connection is replaced and the message is sent again.
+        """
+        dropped = MagicMock()
+        dropped.send_message.side_effect = smtplib.SMTPServerDisconnected()
+        healthy = MagicMock()
+        self.mock_smtp.side_effect = [dropped, healthy]
+
+        with Mailer(self.settings) as mailer:
+            mailer.send_email(_contact(1), SENDER, "Subject", "Body")
+
+        self.assertEqual(self.mock_smtp.call_count, 2)
+        dropped.close.assert_called_once()
+        healthy.send_message.assert_called_once()
+        sent = healthy.send_message.call_args.args[0]
+        self.assertEqual(sent["To"], "Player1 <player1@example.com>")
+
+    def test_no_connection_until_first_message(self):
+        with Mailer(self.settings):
+            pass
+        self.mock_smtp.assert_not_called()
@@ -0,0 +1,100 @@
+import io
+import mailbox
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from main import main
+from secret_santa.delivery_journal import DeliveryJournal, JournalError
+from secret_santa.history import HistoryStore
+from secret_santa.local_smtp import LocalSMTPServer
+from secret_santa.mailer import Contact, MailerSettings
+from secret_santa.secret_santa.player import Player
+
+SENDER = Contact("Santa", "santa@example.com")
+TEMPLATE = "Dear {santa}, you give to {recipient}"
+
+
+class TestMain(unittest.TestCase):
+    """The flow of main.py end to end, against the SMTP stand-in."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.server = LocalSMTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.settings = MailerSettings(self.server.host, self.server.port, "santa", "secret", use_ssl=False)
+        self.players = {Player(f"Player {i}", f"p{i}@example.com") for i in range(8)}
+
+    def _main(self, **kwargs) -> bool:
+        with redirect_stdout(io.StringIO()):
+            return main(self.players, set(), 1, self.settings, "Subject", TEMPLATE, SENDER, False, None, **kwargs)
+
+    def test_resume(self):
+        """
+        Scenario: the server rejects one email for good, then the draw is resumed.
+        Verification:
+        - The first run reports the failure and the resumed run sends only that email.
+        - Every recipient got one email, from the same draw.
+        """
+        path = os.path.join(self.directory.name, "draw.journal")
+        self.server.fail_next(554, "Rejected")
+        with DeliveryJournal(path) as journal:
+            self.assertFalse(self._main(journal=journal, connections=2))
+        self.assertEqual(len(self.server.messages), len(self.players) - 1)
+
+        with DeliveryJournal(path) as journal:
+            self.assertTrue(self._main(journal=journal, resume=True))
+            draw = journal.last_draw()
+        recipients = [m.message["To"] for m in self.server.messages]
+        self.assertEqual(sorted(recipients), sorted(f"{p.name} <{p.email}>" for p in self.players))
+        for message in self.server.messages:
+            santa = next(p for p in self.players if f"<{p.email}>" in message.message["To"])
+            giftee = next(iter(draw.assignments[santa]))
+            self.assertEqual(message.message.get_content().strip(), f"Dear {santa.name}, you give to {giftee.name}")
+
+    def test_resume_without_draw(self):
+        """
+        Resuming from a journal without any draw fails, instead of sending a whole new draw.
+        """
+        with DeliveryJournal(os.path.join(self.directory.name, "draw.journal")) as journal:
+            with self.assertRaisesRegex(JournalError, "Nothing to resume"):
+                self._main(journal=journal, resume=True)
+        self.assertEqual(self.server.messages, [])
+
+    def test_history_records_complete_draws(self):
+        """
+        Scenario: a draw with one rejected email, resumed, with a history; then a spooled draw.
+        Verification:
+        - The draw is recorded once, by the resume that completes it.
+        - The spooled draw is not recorded.
+        """
+        path = os.path.join(self.directory.name, "draw.journal")
+        history = HistoryStore(os.path.join(self.directory.name, "history.db"))
+        self.addCleanup(history.close)
+        self.server.fail_next(554, "Rejected")
+        with DeliveryJournal(path) as journal:
+            self.assertFalse(self._main(journal=journal, connections=2, history=history, year=2026))
+        self.assertEqual(history.past_draws(self.players, 1, "", 2027), [])
+
+        with DeliveryJournal(path) as journal:
+            self.assertTrue(self._main(journal=journal, resume=True, history=history, year=2026))
+        self.assertEqual(len(history.past_draws(self.players, 1, "", 2027)), 1)
+
+        self._main(spool=os.path.join(self.directory.name, "outbox.mbox"), history=history, year=2027)
+        self.assertEqual(history.past_draws(self.players, 1, "", 2028), [])
+
+    def test_spool(self):
+        """
+        With a spool, emails are written to the mbox file and none is sent.
+        """
+        path = os.path.join(self.directory.name, "out.mbox")
+        self.assertTrue(self._main(spool=path))
+        self.assertEqual(len(mailbox.mbox(path)), len(self.players))
+        self.assertEqual(self.server.messages, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
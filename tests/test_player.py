@@ -0,0 +1,50 @@
+import pickle
+import unittest
+
+from secret_santa.secret_santa.incompatibility import Incompatibility, pair_key
+from secret_santa.secret_santa.player import Player
+
+
+class TestPlayer(unittest.TestCase):
+    def test_interned(self):
+        fst = Player("A", "a@example.com")
+        self.assertIs(Player(name="A", email="a@example.com"), fst)
+        self.assertIsNot(Player("A", "other@example.com"), fst)
+        self.assertEqual(hash(fst), hash(("A", "a@example.com")))
+
+    def test_immutable(self):
+        player = Player("A", "a@example.com")
+        with self.assertRaises(AttributeError):
+            player.name = "B"
+        with self.assertRaises(AttributeError):
+            player.nickname = "B"
+
+    def test_pickle_interns_again(self):
+        player = Player("A", "a@example.com")
+        self.assertIs(pickle.loads(pickle.dumps(player)), player)
+
+
+class TestIncompatibility(unittest.TestCase):
+    def setUp(self):
+        self.pa = Player("A", "a@example.com")
+        self.pb = Player("B", "b@example.com")
+
+    def test_order_independent(self):
+        self.assertEqual(Incompatibility(self.pa, self.pb), Incompatibility(self.pb, self.pa))
+        self.assertEqual(Incompatibility(self.pb, self.pa).fst, min(self.pa, self.pb, key=lambda p: p.id))
+        self.assertEqual(Incompatibility(self.pa, self.pb).key, pair_key(self.pb, self.pa))
+        self.assertIn(Incompatibility(self.pb, self.pa), {Incompatibility(self.pa, self.pb)})
+
+    def test_same_player(self):
+        with self.assertRaises(RuntimeError):
+            Incompatibility(self.pa, self.pa)
+
+    def test_pickle(self):
+        incompatibility = Incompatibility(self.pa, self.pb)
+        copy = pickle.loads(pickle.dumps(incompatibility))
+        self.assertEqual(copy, incompatibility)
+        self.assertIs(copy.fst, incompatibility.fst)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import unittest
+from secret_santa.roster import load_roster, RosterError
+from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.player import Player
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), os.pardir)
+
+
+class TestRoster(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def _write_jsonl(self, records):
+        return self._write("roster.jsonl", "\n".join(json.dumps(record) for record in records) + "\n")
+
+    def test_json_and_jsonl_examples_match(self):
+        json_roster = load_roster(os.path.join(EXAMPLES_DIR, "input.example.json"))
+        jsonl_roster = load_roster(os.path.join(EXAMPLES_DIR, "input.example.jsonl"))
+
+        self.assertEqual(json_roster, jsonl_roster)
+        self.assertEqual(jsonl_roster.gift_number, 2)
+        self.assertEqual(len(jsonl_roster.players), 6)
+        self.assertEqual(len(jsonl_roster.incompatibilities), 2)
+        self.assertEqual(jsonl_roster.groups, [{Player("Player5", "player5@example.com"),
+                                                Player("Player6", "player6@example.com")}])
+
+    def test_jsonl_forward_references(self):
+        """
+        Constraints may name players defined further down the file.
+        """
+        path = self._write_jsonl([
+            {"type": "incompatibility", "fst": "A", "snd": "B"},
+            {"type": "player", "name": "A", "email": "a@example.com"},
+            {"type": "player", "name": "B", "email": "b@example.com"},
+        ])
+
+        roster = load_roster(path)
+
+        self.assertEqual(roster.incompatibilities, {Incompatibility(Player("A", "a@example.com"),
+                                                                    Player("B", "b@example.com"))})
+
+    def test_unknown_names_are_reported(self):
+        path = self._write_jsonl([
+            {"type": "player", "name": "A", "email": "a@example.com"},
+            {"type": "incompatibility", "fst": "A", "snd": "Bob"},
+            {"type": "group", "members": ["A", "Carol"]},
+        ])
+
+        with self.assertRaises(RosterError) as cm:
+            load_roster(path)
+
+        self.assertIn("roster.jsonl:2: unknown player 'Bob' in incompatibility", str(cm.exception))
+        self.assertIn("roster.jsonl:3: unknown player 'Carol' in group", str(cm.exception))
+
+    def test_unknown_names_in_json(self):
+        path = self._write("roster.json", json.dumps({
+            "players": [{"name": "A", "email": "a@example.com"}],
+            "incompatibilities": [{"fst": "A", "snd": "Bob"}]
+        }))
+
+        with self.assertRaises(RosterError) as cm:
+            load_roster(path)
+
+        self.assertIn("incompatibilities[0]: unknown player 'Bob'", str(cm.exception))
+
+    def test_invalid_records(self):
+        for line, message in [
+            ("not json", "roster.jsonl:1: invalid JSON"),
+            ('{"type": "pet", "name": "Rex"}', "unknown record type 'pet'"),
+            ('{"type": "player", "name": "A"}', "a player needs a name and an email"),
+        ]:
+            path = self._write("roster.jsonl", line + "\n")
+            with self.assertRaises(RosterError) as cm:
+                load_roster(path)
+            self.assertIn(message, str(cm.exception))
+
+    def test_duplicate_player(self):
+        path = self._write_jsonl([
+            {"type": "player", "name": "A", "email": "a@example.com"},
+            {"type": "player", "name": "A", "email": "other@example.com"},
+        ])
+
+        with self.assertRaises(RosterError) as cm:
+            load_roster(path)
+
+        self.assertIn("player 'A' is listed twice", str(cm.exception))
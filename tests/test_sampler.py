@@ -0,0 +1,54 @@
+import unittest
+from collections import Counter
+
+from secret_santa.secret_santa.player import Player
+from secret_santa.secret_santa.sampler import AssignmentSampler
+
+
+def _never_invalid(src: Player, dst: Player) -> bool:
+    return False
+
+
+class TestAssignmentSampler(unittest.TestCase):
+    def setUp(self):
+        self.players = [Player(name, f"{name.lower()}@example.com") for name in "ABCD"]
+        pa, pb, pc, pd = self.players
+        self.cycle = {pa: {pb}, pb: {pc}, pc: {pd}, pd: {pa}}
+
+    def test_reaches_every_draw_uniformly(self):
+        """
+        Scenario: 4 Players, 1 gift each, no 2-cycles: the only valid draws are the six 4-cycles.
+        Verification:
+        - Starting from one of them, the chain visits all six.
+        - Each comes up about as often as the others.
+        """
+        sampler = AssignmentSampler.from_assignments(self.cycle, 1, False, _never_invalid)
+        draws = Counter()
+        for _ in range(3000):
+            sampler.run(20)
+            draws[frozenset((src.name, dst.name) for src, dsts in sampler.assignments().items() for dst in dsts)] += 1
+
+        self.assertEqual(len(draws), 6)
+        self.assertGreater(min(draws.values()), 350)
+
+    def test_rejects_invalid_moves(self):
+        """
+        Scenario: same 4-cycle, every pair but the current gifts is invalid.
+        Verification:
+        - No move is ever accepted and the assignment is unchanged.
+        """
+        current = {(src, dst) for src, dsts in self.cycle.items() for dst in dsts}
+        sampler = AssignmentSampler.from_assignments(self.cycle, 1, True, lambda src, dst: (src, dst) not in current)
+
+        self.assertEqual(sampler.run(500), 0)
+        self.assertEqual(sampler.steps, 500)
+        self.assertEqual(dict(sampler.assignments()), self.cycle)
+
+    def test_requires_complete_assignment(self):
+        self.cycle[self.players[0]] = set()
+        with self.assertRaises(ValueError):
+            AssignmentSampler.from_assignments(self.cycle, 1, True, _never_invalid)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import random
+import unittest
+
+from secret_santa.secret_santa.gift_graph import NGiftGraph
+from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.player import Player
+from secret_santa.secret_santa.sharding import merge_failed_shards, partition_players, shard_constraints
+from secret_santa.stats import SolverStats
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.random_state = random.getstate()
+        random.seed(1)
+        self.players = [Player(f"Player {i}", f"player{i}@example.com") for i in range(60)]
+
+    def tearDown(self):
+        random.setstate(self.random_state)
+
+    def test_partition_is_balanced(self):
+        """
+        Scenario: 60 players, 6 of them with many incompatibilities, split into 4 shards.
+        Verification:
+        - Every player is in one shard, and shard sizes differ by one at most.
+        - The constrained players are spread over the shards.
+        """
+        constrained = self.players[:6]
+        incompatibilities = {Incompatibility(player, other) for player in constrained
+                             for other in self.players[6:16]}
+        shards = partition_players(self.players, incompatibilities, [], 4)
+
+        self.assertCountEqual([player for shard in shards for player in shard], self.players)
+        sizes = [len(shard) for shard in shards]
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+        for shard in shards:
+            self.assertIn(len(set(shard) & set(constrained)), (1, 2))
+
+    def test_constraints_stay_within_shards(self):
+        """
+        Scenario: incompatibilities and a group spanning two shards.
+        Verification:
+        - Each shard only gets the incompatibilities between its own players.
+        - Groups are cut along the shards, parts of a single player dropped.
+        """
+        pa, pb, pc, pd, pe = self.players[:5]
+        shards = [(pa, pb, pc), (pd, pe)]
+        constraints = shard_constraints(shards, {Incompatibility(pa, pb), Incompatibility(pc, pd)},
+                                        [{pa, pc, pd, pe}, {pb, pe}])
+
+        self.assertEqual(constraints[0], ({Incompatibility(pa, pb)}, [{pa, pc}]))
+        self.assertEqual(constraints[1], (set(), [{pd, pe}]))
+
+    def test_merge_failed_shards(self):
+        """
+        Scenario: the first and last of four shards fail.
+        Verification:
+        - The first is merged with the next one, the last with the previous one.
+        """
+        shards = [(player,) for player in self.players[:4]]
+        merged = merge_failed_shards(shards, [0, 3])
+
+        self.assertEqual(merged, [shards[0] + shards[1], shards[2] + shards[3]])
+
+    def test_sharded_draw_is_valid(self):
+        """
+        Scenario: 60 players with groups and incompatibilities, solved in shards of 15, in process and by 2 workers.
+        Verification:
+        - The merged draw passes the verification of the whole group.
+        """
+        groups = [set(self.players[i:i + 4]) for i in range(0, 60, 4)]
+        incompatibilities = {Incompatibility(self.players[i], self.players[i + 5]) for i in range(0, 55, 3)}
+        for processes in (1, 2):
+            with self.subTest(processes=processes):
+                stats = SolverStats()
+                graph = NGiftGraph(set(self.players), incompatibilities, 2, groups=groups, shard_size=15,
+                                   shard_processes=processes, stats=stats)
+
+                self.assertTrue(graph.assignment_report().ok)
+                self.assertEqual(stats.counters["shards_solved"], 4)
+
+    def test_infeasible_shards_are_merged(self):
+        """
+        Scenario: 2 gifts without 2-cycles in shards of 3 players, which cannot hold such a draw.
+        Verification:
+        - Shards are merged until they can, and the draw is valid.
+        """
+        stats = SolverStats()
+        graph = NGiftGraph(set(self.players[:20]), set(), 2, shard_size=3, shard_processes=1, stats=stats)
+
+        self.assertTrue(graph.assignment_report().ok)
+        self.assertGreater(stats.counters["shard_merges"], 0)
+
+    def test_rejects_single_cycle(self):
+        with self.assertRaises(ValueError):
+            NGiftGraph(set(self.players), set(), 1, single_cycle=True, shard_size=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
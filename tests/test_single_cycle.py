@@ -0,0 +1,40 @@
+import unittest
+
+from secret_santa.secret_santa.player import Player
+from secret_santa.secret_santa.single_cycle import find_single_cycle, cycle_assignments
+
+
+class TestSingleCycle(unittest.TestCase):
+    def setUp(self):
+        self.players = [Player(f"P{i}", f"p{i}@example.com") for i in range(30)]
+
+    def test_repairs_invalid_gifts(self):
+        """
+        Scenario: 30 Players in order, neighbours by index are incompatible.
+        Verification:
+        - The repaired loop holds every player once and no incompatible neighbours.
+        """
+        index = {player: i for i, player in enumerate(self.players)}
+
+        def is_invalid_pair(src: Player, dst: Player) -> bool:
+            return abs(index[src] - index[dst]) in (0, 1, 29)
+
+        cycle = find_single_cycle(self.players, is_invalid_pair, 1000)
+
+        self.assertCountEqual(cycle, self.players)
+        for src, dsts in cycle_assignments(cycle).items():
+            self.assertFalse(any(is_invalid_pair(src, dst) for dst in dsts))
+
+    def test_gives_up(self):
+        """
+        Scenario: P0 may not give to anyone.
+        Verification:
+        - None is returned once the move budget is spent.
+        """
+        cycle = find_single_cycle(self.players, lambda src, dst: self.players[0] in (src, dst), 50)
+
+        self.assertIsNone(cycle)
+
+
+if __name__ == '__main__':
+    unittest.main()
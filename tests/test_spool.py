@@ -0,0 +1,79 @@
+import mailbox
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+
+from secret_santa.mailer import Contact, MessageRenderer, OutgoingEmail
+from secret_santa.spool import write_spool
+
+SENDER = Contact("Père Noël", "santa@example.com")
+
+
+def _emails(count):
+    return [OutgoingEmail(Contact(f"Player{i}", f"player{i}@example.com"), SENDER, "Subject", f"Body {i}")
+            for i in range(count)]
+
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.date = datetime(2024, 12, 1, 12, tzinfo=timezone.utc)
+        self.messages = MessageRenderer(date=self.date).render_all(_emails(5))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_renderer_shares_headers(self):
+        """
+        Messages of a batch carry their own recipient and body, and the same sender, subject and date.
+        """
+        self.assertEqual([m["To"] for m in self.messages], [f"Player{i} <player{i}@example.com>" for i in range(5)])
+        self.assertEqual([m.get_content() for m in self.messages], [f"Body {i}\n" for i in range(5)])
+        self.assertTrue(all(m["From"] == self.messages[0]["From"] for m in self.messages))
+        self.assertEqual(self.messages[0]["From"].addresses[0].display_name, "Père Noël")
+        self.assertEqual(self.messages[0]["Date"].datetime, self.date)
+
+    def test_renderer_matches_set_content(self):
+        """
+        Shortcut and regular content give the same bytes as set_content, for ASCII, long-lined and non-ASCII bodies.
+        """
+        renderer = MessageRenderer(date=self.date)
+        for body in ["", "Hello\r\nyou give to Bob\n", "x" * 100, "Joyeux Noël"]:
+            expected = EmailMessage()
+            expected["Subject"] = "Subject"
+            expected["Date"] = self.date
+            expected["From"] = "Père Noël <santa@example.com>"
+            expected["To"] = "Player1 <player1@example.com>"
+            expected.set_content(body)
+            message = renderer.render(Contact("Player1", "player1@example.com"), SENDER, "Subject", body)
+            self.assertEqual(message.as_bytes(), expected.as_bytes())
+
+    def test_formats(self):
+        """
+        Every format holds all the messages, in order for mbox and eml.
+        """
+        path = os.path.join(self.directory.name, "out.mbox")
+        self.assertEqual(write_spool(self.messages, path, "mbox"), 5)
+        self.assertEqual([m["To"] for m in mailbox.mbox(path)], [m["To"] for m in self.messages])
+
+        path = os.path.join(self.directory.name, "maildir")
+        self.assertEqual(write_spool(self.messages, path, "maildir"), 5)
+        self.assertEqual(sorted(m["To"] for m in mailbox.Maildir(path)), sorted(m["To"] for m in self.messages))
+
+        path = os.path.join(self.directory.name, "eml")
+        self.assertEqual(write_spool(self.messages, path, "eml"), 5)
+        names = sorted(os.listdir(path))
+        self.assertEqual(names[0], "000001.eml")
+        with open(os.path.join(path, names[-1]), "rb") as f:
+            self.assertEqual(BytesParser(policy=policy.default).parse(f).get_content(), "Body 4\n")
+
+        with self.assertRaises(ValueError):
+            write_spool(self.messages, path, "pst")
+
+
+if __name__ == '__main__':
+    unittest.main()
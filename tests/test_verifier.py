@@ -0,0 +1,138 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from main import verify_main
+from secret_santa.secret_santa.gift_graph import NGiftGraph
+from secret_santa.secret_santa.incompatibility import Incompatibility
+from secret_santa.secret_santa.player import Player
+from secret_santa.secret_santa.verifier import InvalidAssignmentError, verify_assignment_file, verify_assignments
+
+
+class TestVerifier(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.players = [Player(name, f"{name.lower().replace(' ', '.')}@example.com")
+                        for name in ("Ann Lee", "Bob", "Cy and Di", "Dan", "Eve", "Fay")]
+
+    def _write(self, name, lines):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+        return path
+
+    def test_reports_every_violation(self):
+        """
+        Scenario: a draw breaking an incompatibility, a group, the gift counts and with a 2-cycle.
+        Verification:
+        - Each broken constraint is reported, with the players involved.
+        """
+        pa, pb, pc, pd, pe, pf = self.players
+        assignments = {pa: {pb}, pb: {pa}, pc: {pd}, pd: {pe}, pe: {pd, pf}}
+        report = verify_assignments(assignments, self.players, {Incompatibility(pc, pd)}, 1,
+                                    groups=[{pd, pe}])
+
+        self.assertFalse(report.ok)
+        self.assertEqual(report.gifts, 6)
+        self.assertEqual(report.counts(), {"incompatible": 1, "same_group": 2, "2cycle": 2, "gives": 2,
+                                           "receives": 2})
+        two_cycles = [v.players for v in report.violations if v.kind == "2cycle"]
+        self.assertEqual(two_cycles, [[pa, pb], [pd, pe]])
+        self.assertIn("1 players give no gift: Fay", [str(v) for v in report.violations])
+
+    def test_single_cycle(self):
+        pa, pb, pc, pd, pe, pf = self.players
+        two_loops = {pa: {pb}, pb: {pc}, pc: {pa}, pd: {pe}, pe: {pf}, pf: {pd}}
+        report = verify_assignments(two_loops, self.players, set(), 1, single_cycle=True)
+        self.assertEqual(report.counts(), {"not_single_cycle": 1})
+        one_loop = {pa: {pb}, pb: {pc}, pc: {pd}, pd: {pe}, pe: {pf}, pf: {pa}}
+        self.assertTrue(verify_assignments(one_loop, self.players, set(), 1, single_cycle=True).ok)
+        with self.assertRaisesRegex(ValueError, "exactly one gift"):
+            verify_assignments(one_loop, self.players, set(), 2, single_cycle=True)
+
+    def test_files(self):
+        """
+        Scenario: the same draw logged as plain lines and as JSON lines, names including spaces and "and".
+        Verification:
+        - Both are read back and valid.
+        - Unreadable lines and unknown players are reported with their line numbers.
+        """
+        pa, pb, pc, pd, pe, pf = self.players
+        assignments = {src: [self.players[(i + 1) % 6], self.players[(i + 2) % 6]] for i, src in enumerate(self.players)}
+        plain = self._write("draw.log", ["# Draw 1"] + [f"{src.name} {dsts[0].name} and {dsts[1].name}"
+                                                        for src, dsts in assignments.items()])
+        structured = self._write("draw.jsonl", [json.dumps({"santa": src.name, "recipients": [d.name for d in dsts]})
+                                                for src, dsts in assignments.items()])
+        for path in (plain, structured):
+            [report] = verify_assignment_file(path, self.players, set(), 2)
+            self.assertTrue(report.ok, report.format())
+            self.assertEqual(report.gifts, 12)
+
+        broken = self._write("broken.jsonl", ['{"santa": "Ann Lee"', json.dumps({"santa": "Zed", "recipients": []})])
+        [report] = verify_assignment_file(broken, self.players, set(), 2)
+        self.assertEqual([(v.kind, v.location) for v in report.violations[:2]],
+                         [("unreadable", f"{broken}:1"), ("unknown_player", f"{broken}:2")])
+
+    def test_draws_of_a_log(self):
+        """
+        Scenario: a log of two draws under "# Draw" headers, as written by --draws, the second one broken.
+        Verification:
+        - Each draw gets its own report, named after its header.
+        - Only the broken gift of the second draw is reported, no player is listed twice.
+        """
+        pa, pb, pc, pd, pe, pf = self.players
+        lines = ["# Draw 1"] + [f"{src.name} {self.players[(i + 1) % 6].name}" for i, src in enumerate(self.players)]
+        lines += ["# Draw 2"] + [f"{src.name} {self.players[(i + 2) % 6].name}" for i, src in enumerate(self.players)]
+        path = self._write("draws.log", lines)
+
+        reports = verify_assignment_file(path, self.players, {Incompatibility(pa, pc)}, 1)
+
+        self.assertEqual([report.draw for report in reports], ["Draw 1", "Draw 2"])
+        self.assertTrue(reports[0].ok, reports[0].format())
+        self.assertEqual([(v.kind, v.location) for v in reports[1].violations], [("incompatible", f"{path}:9")])
+        self.assertTrue(reports[1].format().startswith("Draw 2: 6 gifts between 6 players: 1 violations"))
+
+    def test_rejects_shared_names(self):
+        """
+        Players sharing a name cannot be told apart in a log, which is refused up front.
+        """
+        path = self._write("draw.log", [])
+        with self.assertRaisesRegex(ValueError, "Several players are named Bob"):
+            verify_assignment_file(path, self.players + [Player("Bob", "bob@example.org")], set(), 1)
+
+    def test_verify_command_usage_errors(self):
+        """
+        Scenario: the verify command on a missing log, then with --single-cycle on a 2-gift roster.
+        Verification:
+        - Both end as usage errors naming the problem, without a traceback or hanging.
+        """
+        roster = self._write("roster.json", [json.dumps({
+            "giftNumber": 2, "players": [{"name": p.name, "email": p.email} for p in self.players]})])
+        log = self._write("draw.log", [f"{src.name} {self.players[(i + 1) % 6].name} and "
+                                       f"{self.players[(i + 2) % 6].name}" for i, src in enumerate(self.players)])
+        for args, message in (([roster, os.path.join(self.directory.name, "missing.log")], "No such file"),
+                              (["--single-cycle", roster, log], "exactly one gift")):
+            stderr = io.StringIO()
+            with redirect_stderr(stderr), self.assertRaises(SystemExit) as context:
+                verify_main(args)
+            self.assertEqual(context.exception.code, 2)
+            self.assertIn(message, stderr.getvalue())
+
+    def test_graph_raises(self):
+        """
+        NGiftGraph.verify_assignments raises with the report, whether or not assertions are enabled.
+        """
+        pa, pb = self.players[:2]
+        graph = NGiftGraph(self.players, set(), number_of_gifts=1, allow_2cycles=False)
+        graph.assignments[pa], graph.assignments[pb] = {pb}, {pa}
+        with self.assertRaises(InvalidAssignmentError) as raised:
+            graph.verify_assignments()
+        self.assertIn("2cycle", raised.exception.report.counts())
+
+
+if __name__ == '__main__':
+    unittest.main()